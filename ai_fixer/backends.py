@@ -0,0 +1,345 @@
+# ai_fixer/backends.py
+import atexit
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+from ai_fixer.model_gateway import get_gateway, set_model_backend
+from ai_fixer.response_cache import ResponseCache
+
+# A backend is any callable model_name -> model, where the model has a
+# Gemini-compatible `generate_content(prompt, generation_config=..., stream=...)`
+# returning an object with `.text` (or, when streaming, an iterable of them).
+# `ModelGateway.model` / `gemini.load_model` go through the installed backend.
+ModelFactory = Callable[[str], Any]
+
+DEFAULT_ARCHIVE = ".pestcontrol/model_archive.jsonl.gz"
+ARCHIVE_VERSION = 1
+
+
+class ReplayMiss(KeyError):
+    """A replayed run sent a prompt that is not in the archive."""
+
+
+def _between(text: str, start: str, end: str) -> str:
+    return text.split(start, 1)[-1].split(end, 1)[0] if start in text else ""
+
+
+def loose_key(model_name: str, prompt: str) -> str:
+    """
+    Key that ignores run-to-run noise: only the instructions and the buggy
+    snippet count, not pytest output, temp paths or earlier attempts. Used
+    when a replayed prompt has no exact match.
+    """
+    head = prompt.split("===== CONTEXT START =====", 1)[0]
+    snippet = _between(prompt, "[BUGGY_CODE_SNIPPET]", "[/BUGGY_CODE_SNIPPET]")
+    h = hashlib.sha256()
+    for part in (model_name, head, snippet):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _usage(prompt_tokens: int | None, output_tokens: int | None) -> SimpleNamespace | None:
+    if prompt_tokens is None and output_tokens is None:
+        return None
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+
+
+def _decode_member(raw: bytes, start: int, chunk_size: int):
+    """Decode the gzip member at raw[start:]; returns (output, decoder, end of input fed, ok)."""
+    decoder = zlib.decompressobj(wbits=31)  # exactly one gzip member
+    parts: List[bytes] = []
+    offset = start
+    try:
+        while offset < len(raw) and not decoder.eof:
+            parts.append(decoder.decompress(raw[offset:offset + chunk_size]))
+            offset = min(offset + chunk_size, len(raw))
+    except zlib.error:
+        return b"".join(parts), decoder, offset, False
+    return b"".join(parts), decoder, offset, True
+
+
+def _gzip_members(raw: bytes, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """
+    Decompressed contents of each gzip member in raw, one at a time. A
+    truncated or corrupt member (e.g. from a run that crashed while
+    recording) yields what could be decoded, and reading resumes at the
+    next member header instead of stopping there.
+    """
+    pos = 0
+    while True:
+        start = raw.find(GZIP_MAGIC, pos)
+        if start < 0:
+            return
+        output, decoder, offset, ok = _decode_member(raw, start, chunk_size)
+        if not ok:
+            # a failing call returns nothing, so redo this member a byte at a time
+            # to keep everything decodable before the damage
+            output, decoder, offset, ok = _decode_member(raw, start, 1)
+        yield output
+        if decoder.eof:
+            pos = offset - len(decoder.unused_data)
+        else:
+            pos = start + 1
+
+
+def load_archive(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """
+    Entries of a model archive, oldest first. Each run appends its own gzip
+    member; a member cut short by a crash keeps the entries flushed before
+    it, and the members appended by later runs are still read.
+    """
+    try:
+        raw = Path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for member in _gzip_members(raw):
+        for line in member.decode("utf-8", errors="replace").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # half-written last line of a truncated member
+            if isinstance(entry, dict) and "key" in entry and "loose_key" in entry:
+                entries.append(entry)
+    return entries
+
+
+# ----------------------------
+# Record
+# ----------------------------
+
+class ArchiveWriter:
+    """
+    Appends entries to a gzip'd JSONL archive through one long-lived stream, so
+    similar prompts compress against each other. Every entry is flushed, so an
+    interrupted run keeps all entries up to the last one written.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = gzip.open(self.path, "ab")  # one new gzip member per run; see load_archive
+        atexit.register(self.close)
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RecordingModel:
+    def __init__(self, backend: "RecordingBackend", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+        self.inner = backend.inner(model_name)
+
+    def generate_content(self, prompt: str, generation_config: Dict[str, Any] | None = None,
+                         stream: bool = False, **kwargs):
+        started = time.perf_counter()
+        response = self.inner.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        if stream:
+            return self._recorded_stream(response, prompt, generation_config, started)
+        usage = getattr(response, "usage_metadata", None)
+        self.backend.save(self.model_name, prompt, generation_config, response.text, usage,
+                          time.perf_counter() - started, complete=True)
+        return response
+
+    def _recorded_stream(self, chunks, prompt, generation_config, started) -> Iterator[Any]:
+        parts: List[str] = []
+        usage = None
+        complete = False
+        try:
+            for chunk in chunks:
+                parts.append(getattr(chunk, "text", "") or "")
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+            complete = True
+        finally:
+            # also saved when the consumer stops early: replay then hands back
+            # exactly what this run saw (a finished JSON object, or an aborted one)
+            self.backend.save(self.model_name, prompt, generation_config, "".join(parts), usage,
+                              time.perf_counter() - started, complete=complete)
+
+
+class RecordingBackend:
+    """
+    Passes every request to `inner` (Gemini by default) and appends the prompt
+    and response to an archive that `ReplayBackend` can serve later.
+
+    Args:
+        archive: Path of the gzip'd JSONL archive (appended to)
+        inner: Backend that actually answers; defaults to the gateway's Gemini models
+        store_prompts: Keep full prompts in the archive (useful for debugging
+            incidents; without them only the lookup keys are kept)
+    """
+
+    def __init__(self, archive: Union[str, Path] = DEFAULT_ARCHIVE,
+                 inner: ModelFactory | None = None, store_prompts: bool = True):
+        self.inner = inner or (lambda model_name: get_gateway().gemini_model(model_name))
+        self.store_prompts = store_prompts
+        self.writer = ArchiveWriter(archive)
+
+    def __call__(self, model_name: str) -> RecordingModel:
+        return RecordingModel(self, model_name)
+
+    def save(self, model_name: str, prompt: str, generation_config: Dict[str, Any] | None, text: str,
+             usage: Any, latency_s: float, complete: bool) -> None:
+        entry = {
+            "version": ARCHIVE_VERSION,
+            "key": ResponseCache.key(model_name, generation_config or {}, prompt),
+            "loose_key": loose_key(model_name, prompt),
+            "model": model_name,
+            "text": text,
+            "complete": complete,
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "output_tokens": getattr(usage, "candidates_token_count", None),
+            "latency_s": round(latency_s, 3),
+        }
+        if self.store_prompts:
+            entry["prompt"] = prompt
+        self.writer.write(entry)
+
+
+# ----------------------------
+# Replay
+# ----------------------------
+
+class _Queue:
+    """Recorded answers for one key, handed out in order; the last one repeats."""
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self.next = 0
+
+    def take(self) -> Dict[str, Any]:
+        entry = self.entries[min(self.next, len(self.entries) - 1)]
+        self.next += 1
+        return entry
+
+
+class ReplayModel:
+    def __init__(self, backend: "ReplayBackend", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, generation_config: Dict[str, Any] | None = None,
+                         stream: bool = False, **kwargs):
+        entry = self.backend.lookup(self.model_name, prompt, generation_config)
+        if entry is None:
+            fallback = self.backend.fallback
+            if fallback is None:
+                raise ReplayMiss(f"No recorded response for this {self.model_name} prompt in "
+                                 f"{self.backend.archive}; record it first or set model_backend.on_miss: gemini")
+            return fallback(self.model_name).generate_content(
+                prompt, generation_config=generation_config, stream=stream, **kwargs)
+        response = SimpleNamespace(text=entry["text"],
+                                   usage_metadata=_usage(entry.get("prompt_tokens"), entry.get("output_tokens")))
+        return iter([response]) if stream else response
+
+
+class ReplayBackend:
+    """
+    Serves recorded responses with no latency and no network access.
+
+    Prompts are matched exactly first (same key as the response cache), then
+    by `loose_key`, so a replayed run still finds its answers when only the
+    pytest output or scratch paths in the prompt differ.
+
+    Args:
+        archive: Archive written by `RecordingBackend`
+        fallback: Backend for prompts with no recording; None raises `ReplayMiss`
+    """
+
+    def __init__(self, archive: Union[str, Path] = DEFAULT_ARCHIVE, fallback: ModelFactory | None = None):
+        self.archive = Path(archive)
+        if not self.archive.exists():
+            raise FileNotFoundError(f"No model archive at {self.archive}; run with model_backend.mode: record first")
+        self.fallback = fallback
+        # replayed answers cost no quota; only a live fallback needs the rate limiter
+        self.rate_limited = fallback is not None
+        self._exact: Dict[str, _Queue] = defaultdict(_Queue)
+        self._loose: Dict[str, _Queue] = defaultdict(_Queue)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loose_hits = 0
+        self.misses = 0
+        for entry in load_archive(self.archive):
+            self._exact[entry["key"]].entries.append(entry)
+            self._loose[entry["loose_key"]].entries.append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(q.entries) for q in self._exact.values())
+
+    def __call__(self, model_name: str) -> ReplayModel:
+        return ReplayModel(self, model_name)
+
+    def lookup(self, model_name: str, prompt: str, generation_config: Dict[str, Any] | None) -> Dict[str, Any] | None:
+        exact = ResponseCache.key(model_name, generation_config or {}, prompt)
+        with self._lock:
+            if exact in self._exact:
+                self.hits += 1
+                return self._exact[exact].take()
+            loose = loose_key(model_name, prompt)
+            if loose in self._loose:
+                self.loose_hits += 1
+                return self._loose[loose].take()
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "loose_hits": self.loose_hits, "misses": self.misses}
+
+
+# ----------------------------
+# Process-wide setup
+# ----------------------------
+
+def configure_model_backend(config: Dict[str, Any] | None) -> ModelFactory | None:
+    """
+    Install the model backend from a config block: {mode, archive, on_miss, store_prompts}.
+
+    mode: "gemini" (default), "record" (Gemini, archiving every exchange) or
+    "replay" (archive only; on_miss: "error" or "gemini").
+    """
+    config = config or {}
+    mode = config.get("mode", "gemini")
+    archive = config.get("archive", DEFAULT_ARCHIVE)
+    if mode == "gemini":
+        backend = None
+    elif mode == "record":
+        backend = RecordingBackend(archive, store_prompts=bool(config.get("store_prompts", True)))
+        print(f"🎙️ Recording model responses to {archive}")
+    elif mode == "replay":
+        on_miss = config.get("on_miss", "error")
+        if on_miss not in ("error", "gemini"):
+            raise ValueError(f"model_backend.on_miss must be 'error' or 'gemini', got {on_miss!r}")
+        fallback = (lambda model_name: get_gateway().gemini_model(model_name)) if on_miss == "gemini" else None
+        backend = ReplayBackend(archive, fallback=fallback)
+        print(f"⏯️ Replaying {len(backend)} recorded model response(s) from {archive}")
+    else:
+        raise ValueError(f"model_backend.mode must be 'gemini', 'record' or 'replay', got {mode!r}")
+    set_model_backend(backend)
+    return backend
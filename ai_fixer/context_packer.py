@@ -0,0 +1,249 @@
+# ai_fixer/context_packer.py
+import ast
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+_default_budget = 6000
+
+
+def set_default_budget(tokens: int | None) -> None:
+    """Set the token budget `running_gemini` uses for [REPO_FILES] (None/0 = unlimited)."""
+    global _default_budget
+    _default_budget = int(tokens or 0)
+
+
+def default_budget() -> int:
+    return _default_budget
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text or "") / 4)
+
+
+@dataclass
+class PackStats:
+    budget: int
+    tokens_before: int = 0
+    tokens_after: int = 0
+    duplicates_skipped: List[str] = field(default_factory=list)
+    sliced: List[str] = field(default_factory=list)
+    truncated: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "budget": self.budget,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "duplicates_skipped": self.duplicates_skipped,
+            "sliced": self.sliced,
+            "truncated": self.truncated,
+            "dropped": self.dropped,
+        }
+
+
+def referenced_names(sources: Iterable[str]) -> Set[str]:
+    """Identifiers used by the given sources (AST when it parses, a regex scan otherwise)."""
+    names: Set[str] = set()
+    for src in sources:
+        if not src:
+            continue
+        try:
+            tree = ast.parse(src)
+        except SyntaxError:
+            names.update(IDENT_RE.findall(src))
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                names.add(node.id)
+            elif isinstance(node, ast.Attribute):
+                names.add(node.attr)
+            elif isinstance(node, ast.alias):
+                names.add((node.asname or node.name).split(".")[0])
+                names.add(node.name.split(".")[-1])
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+    return names
+
+
+DEF_RE = re.compile(r"^(?:async\s+)?(?:def|class)\s+([A-Za-z_][A-Za-z0-9_]*)", re.M)
+
+
+def defined_names(source: str) -> Set[str]:
+    """Top-level functions/classes defined by source (regex scan if it does not parse)."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return set(DEF_RE.findall(source))
+    return {n.name for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+
+
+def _node_span(node: ast.AST) -> Tuple[int, int]:
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    return start, node.end_lineno
+
+
+def slice_module(source: str, keep: Set[str], exclude: Set[str] = frozenset()) -> Tuple[str, bool]:
+    """
+    Reduce a module to the top-level definitions in `keep` (minus `exclude`).
+
+    Imports and simple module-level assignments are kept; every other function
+    or class is replaced by a one-line marker. Returns (text, kept_any_definition).
+    Sources that do not parse are returned unchanged.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return source, True
+
+    lines = source.splitlines()
+    out: List[str] = []
+    omitted: List[Tuple[str, int]] = []  # run of consecutive omitted definitions
+    kept_any = False
+    cursor = 1
+
+    def flush_omitted():
+        if omitted:
+            names = ", ".join(name for name, _ in omitted[:5]) + (", ..." if len(omitted) > 5 else "")
+            total = sum(n for _, n in omitted)
+            out.append(f"# ... {len(omitted)} definition(s) omitted ({total} lines): {names}")
+            omitted.clear()
+
+    for node in tree.body:
+        start, end = _node_span(node)
+        gap = lines[cursor - 1:start - 1]  # comments/blank lines between nodes
+        cursor = end + 1
+        chunk = lines[start - 1:end]
+        wanted = True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            wanted = node.name in keep and node.name not in exclude
+            if isinstance(node, ast.ClassDef) and not wanted and node.name not in exclude:
+                # keep a class when one of its methods is referenced
+                wanted = any(
+                    isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef)) and m.name in keep
+                    for m in node.body
+                )
+            kept_any = kept_any or wanted
+        if wanted:
+            flush_omitted()
+            out.extend(gap)
+            out.extend(chunk)
+        else:
+            suffix = " (in snippet)" if node.name in exclude else ""
+            omitted.append((node.name + suffix, end - start + 1))
+    flush_omitted()
+    out.extend(lines[cursor - 1:])
+    return "\n".join(out), kept_any
+
+
+# issue snippets usually arrive wrapped in ``` fences (with or without a language tag)
+FENCE_RE = re.compile(r"```[A-Za-z0-9_+-]*[ \t]*(?=\n)|```")
+
+
+def strip_fences(text: str) -> str:
+    return FENCE_RE.sub("", text or "")
+
+
+def snippet_code(text: str) -> str:
+    """
+    The code of an issue snippet as a file would hold it: fences and the blank
+    lines they leave at either end removed, ending in exactly one newline.
+    This is the base that fixes are diffed and edit scripts applied against.
+    """
+    code = strip_fences(text).strip("\n")
+    return code + "\n" if code else ""
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", strip_fences(text)).strip()
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    kept: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line + "\n")
+        if used + cost > tokens:
+            break
+        kept.append(line)
+        used += cost
+    omitted = len(text.splitlines()) - len(kept)
+    if omitted:
+        kept.append(f"# ... truncated to fit the context budget ({omitted} more lines)")
+    return "\n".join(kept)
+
+
+def pack_context(repo_files: Dict[str, str],
+                 code_snippet: str,
+                 test_sources: Iterable[str] = (),
+                 failure_text: str = "",
+                 budget_tokens: int | None = None) -> Tuple[Dict[str, str], PackStats]:
+    """
+    Fit the context files into a token budget.
+
+    - Files that duplicate the focal snippet are skipped (or keep only what
+      the snippet does not already show).
+    - Parseable Python files are sliced down to the top-level symbols that the
+      snippet, the failing tests or the failure report reference.
+    - Files are added most-relevant first; the first one that does not fit is
+      truncated and the rest are dropped.
+
+    Returns:
+        tuple: (packed {path: content}, PackStats)
+    """
+    budget = default_budget() if budget_tokens is None else int(budget_tokens or 0)
+    stats = PackStats(budget=budget)
+    stats.tokens_before = sum(estimate_tokens(c) for c in repo_files.values())
+
+    snippet_norm = _normalize(code_snippet)
+    snippet_defs = defined_names(strip_fences(code_snippet))
+    wanted = referenced_names([strip_fences(code_snippet), *test_sources]) | set(IDENT_RE.findall(failure_text or ""))
+
+    candidates: List[Tuple[int, str, str]] = []
+    for path, content in (repo_files or {}).items():
+        duplicate = bool(snippet_norm) and snippet_norm in _normalize(content)
+        if duplicate and _normalize(content) == snippet_norm:
+            stats.duplicates_skipped.append(path)
+            continue
+        packed = content
+        if path.endswith(".py"):
+            packed, kept_any = slice_module(content, wanted, exclude=snippet_defs if duplicate else set())
+            if duplicate and not kept_any:
+                stats.duplicates_skipped.append(path)
+                continue
+            if packed != content:
+                stats.sliced.append(path)
+        relevance = len(wanted & referenced_names([packed]))
+        candidates.append((relevance, path, packed))
+
+    # keep the caller's order among equally relevant files
+    candidates.sort(key=lambda c: -c[0])
+    result: Dict[str, str] = {}
+    used = 0
+    for _, path, packed in candidates:
+        cost = estimate_tokens(packed)
+        if not budget or used + cost <= budget:
+            result[path] = packed
+            used += cost
+        elif budget - used > 50:
+            result[path] = _truncate_to_tokens(packed, budget - used)
+            used += estimate_tokens(result[path])
+            stats.truncated.append(path)
+        else:
+            stats.dropped.append(path)
+
+    # restore the original file order for a stable prompt
+    result = {path: result[path] for path in repo_files if path in result}
+    stats.tokens_after = used
+    return result, stats
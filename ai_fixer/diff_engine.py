@@ -0,0 +1,163 @@
+# ai_fixer/diff_engine.py
+import argparse
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
+
+from ai_fixer.patience_diff import matcher_for
+from ai_fixer.run_records import load_run_records
+
+# In-process replacement for `git diff --no-index a b`: same headers, hunk
+# ranges, function context and "\ No newline at end of file" markers, with
+# no process spawn. Hunks come from `patience_diff.matcher_for` (difflib for
+# small inputs, patience diff for large ones), so they can differ from git's
+# Myers diff in where a change is anchored, never in what it changes.
+
+FILE_MODE = "100644"
+NO_NEWLINE = "\\ No newline at end of file\n"
+FUNCNAME_MAX = 80  # git truncates the hunk-header function context to 80 bytes
+
+
+def blob_id(text: str) -> str:
+    """The object id git would give this content (`git hash-object`)."""
+    data = text.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _range(start: int, stop: int) -> str:
+    # same convention as git / difflib.unified_diff hunk headers
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    if not length:
+        start -= 1
+    return f"{start + 1},{length}"
+
+
+def _funcname(lines: Sequence[str], before: int) -> str:
+    """git's default hunk context: the closest earlier line starting with a letter, '_' or '$'."""
+    for k in range(before - 1, -1, -1):
+        line = lines[k]
+        if line[:1].isalpha() or line[:1] in ("_", "$"):
+            return line.encode("utf-8")[:FUNCNAME_MAX].decode("utf-8", errors="ignore").rstrip()
+    return ""
+
+
+def _emit(prefix: str, lines: Sequence[str]) -> Iterator[str]:
+    for line in lines:
+        if line.endswith("\n"):
+            yield prefix + line
+        else:
+            yield prefix + line + "\n"
+            yield NO_NEWLINE
+
+
+def iter_unified_diff(original: str, fixed: str, a_path: str = "original", b_path: str = "fixed",
+                      context: int = 3) -> Iterator[str]:
+    """
+    Lines (each ending in "\\n") of a git-style unified diff from original to
+    fixed, generated hunk by hunk so large diffs can be written out without
+    building the whole text. Yields nothing when the contents are equal.
+    """
+    if original == fixed:
+        return
+    a = original.splitlines(keepends=True)
+    b = fixed.splitlines(keepends=True)
+    yield f"diff --git a/{a_path} b/{b_path}\n"
+    yield f"index {blob_id(original)[:7]}..{blob_id(fixed)[:7]} {FILE_MODE}\n"
+    yield f"--- a/{a_path}\n"
+    yield f"+++ b/{b_path}\n"
+    # compare without line endings so a missing final newline is one changed line, as in git
+    a_keys = [line.rstrip("\n") if line.endswith("\n") else line + "\0" for line in a]
+    b_keys = [line.rstrip("\n") if line.endswith("\n") else line + "\0" for line in b]
+    for group in matcher_for(a_keys, b_keys).get_grouped_opcodes(context):
+        first, last = group[0], group[-1]
+        header = f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@"
+        func = _funcname(a, first[1])
+        yield f"{header} {func}\n" if func else header + "\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from _emit(" ", a[i1:i2])
+                continue
+            if tag in ("replace", "delete"):
+                yield from _emit("-", a[i1:i2])
+            if tag in ("replace", "insert"):
+                yield from _emit("+", b[j1:j2])
+
+
+def unified_diff(original: str, fixed: str, a_path: str = "original", b_path: str = "fixed",
+                 context: int = 3) -> str:
+    """The whole diff as one string ("" when the contents are equal)."""
+    return "".join(iter_unified_diff(original, fixed, a_path, b_path, context))
+
+
+def write_diff(out_path: Union[str, Path], original: str, fixed: str, a_path: str = "original",
+               b_path: str = "fixed", context: int = 3) -> Path:
+    """Stream a diff into out_path (written to a temp file, then renamed into place)."""
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_path.parent, prefix=f".{out_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(iter_unified_diff(original, fixed, a_path, b_path, context))
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return out_path
+
+
+def diff_files(original_file: Union[str, Path], fixed_file: Union[str, Path], out_path: Union[str, Path],
+               context: int = 3) -> Path:
+    """`git diff --no-index original_file fixed_file > out_path`, in process."""
+    original = Path(original_file).read_text(encoding="utf-8")
+    fixed = Path(fixed_file).read_text(encoding="utf-8")
+    return write_diff(out_path, original, fixed, str(original_file), str(fixed_file), context)
+
+
+# ----------------------------
+# Batch
+# ----------------------------
+
+def finished_issues(proposed_dir: Union[str, Path] = "proposed_fixes") -> Iterator[Tuple[int, str, str, str]]:
+    """
+    (issue number, file path, original code, fixed code) of the latest run of
+    every issue with a run record. Records written before the original code
+    was recorded fall back to the repo file they name; those without either
+    are skipped.
+    """
+    for path in sorted(Path(proposed_dir).glob("issue_*.jsonl")):
+        records = load_run_records(path)
+        if not records:
+            continue
+        latest = records[-1]
+        file_path = (latest.get("paths") or {}).get("original_file") or path.stem
+        original = latest.get("original_code")
+        if original is None and Path(file_path).is_file():
+            original = Path(file_path).read_text(encoding="utf-8")
+        if original is None or latest.get("patch") is None:
+            continue
+        yield int(latest.get("issue", path.stem.split("issue_")[-1])), file_path, original, latest["patch"]
+
+
+def write_diffs(issues: Iterable[Tuple[int, str, str, str]],
+                proposed_dir: Union[str, Path] = "proposed_fixes") -> List[Path]:
+    """Write proposed_dir/issue_N.diff for each (issue number, file path, original, fixed)."""
+    return [
+        write_diff(Path(proposed_dir) / f"issue_{number}.diff", original, fixed, file_path, file_path)
+        for number, file_path, original, fixed in issues
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate the .diff of every finished issue from its run records.")
+    parser.add_argument("proposed_dir", nargs="?", default="proposed_fixes")
+    args = parser.parse_args()
+    written = write_diffs(finished_issues(args.proposed_dir), args.proposed_dir)
+    print(f"📝 Wrote {len(written)} diff(s) to {args.proposed_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# ai_fixer/edit_script.py
+from typing import Any, Dict, List, Tuple
+
+
+class EditApplyError(ValueError):
+    """An edit script could not be anchored to the original code."""
+
+
+def _matches(lines: List[str], at: int, expected: List[str], loose: bool) -> bool:
+    if at < 0 or at + len(expected) > len(lines):
+        return False
+    for have, want in zip(lines[at:at + len(expected)], expected):
+        if (have.strip() != want.strip()) if loose else (have.rstrip() != want.rstrip()):
+            return False
+    return True
+
+
+def locate_edit(lines: List[str], edit: Dict[str, Any], fuzz: int = 3) -> Tuple[int, int]:
+    """
+    Resolve one edit to a 0-based, end-exclusive [start, stop) slice of lines.
+
+    The model's 1-based inclusive `start`/`end` are trusted only when the
+    edit's `original` text is found there; otherwise the text is searched
+    within +-fuzz lines (exact, then ignoring indentation) and finally across
+    the whole file if it occurs exactly once.
+    """
+    if not isinstance(edit, dict):
+        raise EditApplyError(f"edit is not an object: {edit!r}")
+    try:
+        start = int(edit["start"])
+        end = int(edit.get("end", start))
+    except (KeyError, TypeError, ValueError) as e:
+        raise EditApplyError(f"edit has no usable start/end: {edit!r}") from e
+
+    expected = (edit.get("original") or "").splitlines()
+    if not expected:
+        # pure insertion (end < start) or an unanchored replacement: trust the numbers
+        lo, hi = start - 1, max(end, start - 1)
+        if lo < 0 or hi > len(lines):
+            raise EditApplyError(f"edit range {start}-{end} is outside the file ({len(lines)} lines)")
+        return lo, hi
+
+    for loose in (False, True):
+        for delta in sorted(range(-fuzz, fuzz + 1), key=abs):
+            at = start - 1 + delta
+            if _matches(lines, at, expected, loose):
+                return at, at + len(expected)
+
+    hits = [i for i in range(len(lines)) if _matches(lines, i, expected, loose=True)]
+    if len(hits) == 1:
+        return hits[0], hits[0] + len(expected)
+    where = "not found" if not hits else f"ambiguous ({len(hits)} matches)"
+    raise EditApplyError(f"original text for edit {start}-{end} {where}")
+
+
+def apply_edits(original: str, edits: List[Dict[str, Any]],
+                fuzz: int = 3) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Apply replacement hunks [{start, end, original, replacement}] to original.
+
+    All edits are located against the unmodified text first, checked for
+    overlap, then applied bottom-up so earlier line numbers stay valid.
+
+    Returns:
+        tuple: (fixed text, LineNumberRangesToEdit entries) where each range is
+               where the edit was actually anchored in original (1-based,
+               inclusive; end < start for a pure insertion), in file order
+    """
+    if not isinstance(edits, list):
+        raise EditApplyError(f"edit script is not a list: {type(edits).__name__}")
+    if not edits:
+        raise EditApplyError("edit script is empty")
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise EditApplyError(f"edit is not an object: {edit!r}")
+    lines = original.splitlines()
+    located = sorted((locate_edit(lines, e, fuzz) + (e,) for e in edits), key=lambda t: t[0])
+    for (lo1, hi1, _), (lo2, hi2, _) in zip(located, located[1:]):
+        if lo2 < hi1:
+            raise EditApplyError(f"edits overlap at lines {lo2 + 1}-{hi1}")
+
+    for lo, hi, edit in reversed(located):
+        replacement = edit.get("replacement")
+        if replacement is None:
+            raise EditApplyError(f"edit at line {lo + 1} has no replacement")
+        lines[lo:hi] = str(replacement).splitlines()
+    trailing = "\n" if original.endswith("\n") else ""
+    ranges = [{"start": lo + 1, "end": hi, "reason": edit.get("reason", "")} for lo, hi, edit in located]
+    return "\n".join(lines) + trailing, ranges
@@ -0,0 +1,79 @@
+# ai_fixer/fingerprint.py
+import ast
+import hashlib
+import re
+import threading
+from typing import Any, Dict, List, Tuple
+
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def fingerprint(code: str) -> str:
+    """
+    Hash of the candidate's normalized AST: comments, whitespace, docstrings
+    and formatting do not change it. Code that does not parse falls back to
+    its text with comments and whitespace removed.
+    """
+    try:
+        normalized = ast.dump(_strip_docstrings(ast.parse(code or "")), annotate_fields=False)
+    except (SyntaxError, ValueError):
+        normalized = re.sub(r"\s+", "", re.sub(r"#[^\n]*", "", code or ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TriedCandidates:
+    """Thread-safe per-issue record of candidate fingerprints already generated (and their results)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any] | None] = {}
+        self._codes: List[str] = []
+        self.duplicates = 0
+
+    def add(self, code: str) -> Tuple[str, bool]:
+        """Register code; returns (fingerprint, is_new). A repeat counts as a duplicate."""
+        fp = fingerprint(code)
+        with self._lock:
+            if fp in self._results:
+                self.duplicates += 1
+                return fp, False
+            self._results[fp] = None
+            self._codes.append(code)
+            return fp, True
+
+    def record(self, fp: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[fp] = result
+
+    def result(self, fp: str) -> Dict[str, Any] | None:
+        """Test result of an earlier candidate with this fingerprint (None if untested/in flight)."""
+        with self._lock:
+            return self._results.get(fp)
+
+    def recent(self, n: int = 3) -> List[str]:
+        with self._lock:
+            return self._codes[-n:]
+
+
+_settings: Dict[str, Any] = {"enabled": True, "max_regenerations": 2, "temperature_step": 0.3}
+
+
+def configure_dedupe(config: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Set dedupe options from a config block: {enabled, max_regenerations, temperature_step}."""
+    config = config or {}
+    _settings["enabled"] = bool(config.get("enabled", True))
+    _settings["max_regenerations"] = int(config.get("max_regenerations", 2))
+    _settings["temperature_step"] = float(config.get("temperature_step", 0.3))
+    return dict(_settings)
+
+
+def dedupe_settings() -> Dict[str, Any]:
+    return dict(_settings)
@@ -1,12 +1,29 @@
 # ai_fixer/gemini.py
 import os
+import atexit
 import json
 import re
+import hashlib
+import difflib
 import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Union, Dict, Any, Tuple
-from dotenv import load_dotenv
 import google.generativeai as genai
+from ai_fixer.stages import stage
+from ai_fixer.model_gateway import get_gateway
+from ai_fixer.response_cache import ResponseCache, default_cache
+from ai_fixer.pytest_pool import get_pytest_pool
+from ai_fixer.junit_digest import parse_junit, format_digest
+from ai_fixer.context_packer import pack_context, snippet_code, estimate_tokens
+from ai_fixer.edit_script import apply_edits, EditApplyError
+from ai_fixer.stream_json import StreamingJSONObject, StreamSchemaError
+from ai_fixer.static_gate import check_candidate, gate_settings
+from ai_fixer.metrics import span, record as record_span
+from ai_fixer.pipeline_types import BugReport, Candidate, artifacts_enabled, write_candidate_artifacts
 
 
 # ----------------------------
@@ -14,36 +31,255 @@ import google.generativeai as genai
 # ----------------------------
 
 def load_model(model_name: str = "gemini-2.5-flash") -> genai.GenerativeModel:
-    """Configure the API from environment and return a Gemini model instance."""
-    load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("❌ No GEMINI_API_KEY found in environment/.env")
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel(model_name)
+    """Return the model for model_name: Gemini (configured once per process) or the installed record/replay backend."""
+    return get_gateway().model(model_name)
 
 
 def run_pytest(pytest_targets: List[str] | None = None,
-               extra_args: List[str] | None = None) -> Tuple[int, str]:
+               extra_args: List[str] | None = None,
+               *,
+               cwd: Union[str, Path, None] = None,
+               junit_path: Union[str, Path] = "pytest_report.xml",
+               maxfail: int | None = None) -> Tuple[int, str]:
     """
     Run pytest and return (exit_code, combined_output).
     Writes a JUnit XML for structured parsing if you want later.
+    Pass a per-issue `junit_path` (and `cwd` for an overlay workspace) when
+    several runs may happen at once. Uses the warm pytest pool when one is
+    configured. Runs every selected test unless `maxfail` is given, so the
+    JUnit digest sees the whole failure set.
     """
-    args = ["pytest", "-q", "--disable-warnings", "--maxfail=1", "--color=no", "--junitxml=pytest_report.xml"]
+    args = ["pytest", "-q", "--disable-warnings", "--color=no",
+            f"--junitxml={os.path.abspath(junit_path)}"]
+    if maxfail:
+        args.append(f"--maxfail={maxfail}")
     if extra_args:
         args.extend(extra_args)
     if pytest_targets:
         args.extend(pytest_targets)
 
-    proc = subprocess.run(args, capture_output=True, text=True)
+    pool = get_pytest_pool()
+    with span("run_pytest", pooled=pool is not None):
+        if pool is not None:
+            result = pool.run(args[1:], cwd=cwd)
+            return result["exit_code"], (result["output"] or "").strip()
+
+        proc = subprocess.run(args, capture_output=True, text=True, cwd=cwd)
     output = (proc.stdout or "") + "\n" + (proc.stderr or "")
     return proc.returncode, output.strip()
 
 
+# Run durations change on every run; masking them keeps identical failures
+# producing identical prompts (and therefore response-cache hits).
+_DURATION_RE = re.compile(r"\bin \d+(?:\.\d+)?s\b")
+
+
 def condense_pytest_output(text: str, tail_lines: int = 160) -> str:
     # Keep the prompt compact: include last N lines of the pytest output but show top traceback.
-    lines = (text or "").splitlines()
-    return "\n".join(lines[-tail_lines:]) if len(lines) > tail_lines else (text or "")
+    text = _DURATION_RE.sub("in <duration>", text or "")
+    lines = text.splitlines()
+    return "\n".join(lines[-tail_lines:]) if len(lines) > tail_lines else text
+
+
+def summarize_pytest_run(output: str, junit_path: Union[str, Path, None] = None) -> str:
+    """
+    Compact failure report for the prompt: the JUnit digest (failing test ids,
+    messages, deepest frame, duplicates folded) when the XML has test cases,
+    otherwise the tail of the raw output (e.g. for import/collection crashes).
+    """
+    digest = parse_junit(junit_path) if junit_path else None
+    if digest is not None and digest.tests:
+        return format_digest(digest)
+    return condense_pytest_output(output, tail_lines=160)
+
+
+# Keys the model must return for each response mode
+REQUIRED_KEYS = {
+    "full": ["SuggestedFixedCode", "ExplanationOfFix", "LineNumberRangesToEdit"],
+    "edits": ["Edits", "ExplanationOfFix"],
+}
+
+# Optional keys the model may also send; anything else aborts a streamed response
+OPTIONAL_KEYS = {
+    "full": [],
+    "edits": ["LineNumberRangesToEdit"],
+}
+# The field holding the code, checked as soon as it has streamed in
+CODE_KEYS = {"full": "SuggestedFixedCode", "edits": "Edits"}
+
+_response_mode = "full"
+_streaming = True
+_stream_attempts = 2
+# static gate on streamed code while the rest of the response arrives; started on first use
+_precheck_workers = 2
+_precheck_executor: ThreadPoolExecutor | None = None
+_precheck_lock = threading.Lock()
+
+
+def set_response_mode(mode: str) -> None:
+    """Default response mode for `running_gemini`: "full" (whole file) or "edits" (hunks only)."""
+    global _response_mode
+    if mode not in REQUIRED_KEYS:
+        raise ValueError(f"Unknown response mode: {mode!r} (expected one of {sorted(REQUIRED_KEYS)})")
+    _response_mode = mode
+
+
+def set_streaming(enabled: bool, attempts: int = 2, precheck_workers: int | None = None) -> None:
+    """
+    Stream model responses (parsed incrementally) and allow `attempts` tries per
+    request. `precheck_workers` sizes the pool that checks streamed code early;
+    give it one thread per model request that can be in flight.
+    """
+    global _streaming, _stream_attempts, _precheck_workers
+    _streaming = bool(enabled)
+    _stream_attempts = max(1, int(attempts))
+    if precheck_workers:
+        shutdown_prechecks()
+        _precheck_workers = max(1, int(precheck_workers))
+
+
+def _prechecks() -> ThreadPoolExecutor:
+    global _precheck_executor
+    with _precheck_lock:
+        if _precheck_executor is None:
+            _precheck_executor = ThreadPoolExecutor(max_workers=_precheck_workers, thread_name_prefix="precheck")
+        return _precheck_executor
+
+
+@atexit.register
+def shutdown_prechecks() -> None:
+    """Stop the precheck threads (the next streamed response starts a new pool)."""
+    global _precheck_executor
+    with _precheck_lock:
+        executor, _precheck_executor = _precheck_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _precheck_field(mode: str, value: Any, base_code: str, test_sources: List[str]) -> List[str]:
+    if mode == "edits":
+        try:
+            value, _ = apply_edits(base_code, value)
+        except EditApplyError as e:
+            return [f"edit script: {e}"]
+    if not isinstance(value, str):
+        return [f"{CODE_KEYS[mode]} is not a string"]
+    if not gate_settings()["enabled"]:
+        return []
+    return check_candidate(value, base_code, test_sources)
+
+
+def stream_json_response(model_name: str,
+                         prompt: str,
+                         generation_config: Dict[str, Any],
+                         mode: str,
+                         on_value=None) -> Tuple[Dict[str, Any], str]:
+    """
+    Stream one response and parse it as it arrives.
+
+    Off-schema keys, malformed values and missing required keys raise
+    StreamSchemaError as soon as they are seen; the rest of the stream is then
+    abandoned: closing the gateway's generator cancels the request where the
+    SDK allows it, and otherwise only stops reading it.
+
+    Returns:
+        tuple: (parsed dict, raw text)
+    """
+    parser = StreamingJSONObject(
+        allowed_keys=REQUIRED_KEYS[mode] + OPTIONAL_KEYS[mode],
+        required_keys=REQUIRED_KEYS[mode],
+        on_value=on_value,
+    )
+    chunks: List[str] = []
+    parse_wall = parse_cpu = 0.0
+    stream = get_gateway().stream(model_name, prompt, generation_config)
+    try:
+        for chunk in stream:
+            chunks.append(chunk)
+            wall0, cpu0 = time.perf_counter(), time.thread_time()
+            parser.feed(chunk)
+            parse_wall += time.perf_counter() - wall0
+            parse_cpu += time.thread_time() - cpu0
+            if parser.done:
+                break
+    finally:
+        stream.close()
+        # parsing is interleaved with the stream; record the time spent inside the parser
+        record_span("extract_json", parse_wall, parse_cpu, streamed=True, chunks=len(chunks))
+    return parser.close(), "".join(chunks)
+
+
+# Baseline results keyed by (code + test file hash, test targets). The baseline only
+# depends on the unmodified code and tests, so retries and parallel candidates can
+# share one run. Bounded (least recently used first out) for long-lived processes.
+BASELINE_CACHE_SIZE = 128
+_baseline_results: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[int, str]]" = OrderedDict()
+_baseline_locks: Dict[Tuple[str, Tuple[str, ...]], threading.Lock] = {}
+_baseline_guard = threading.Lock()
+
+
+def _file_bytes(path: Path) -> List[Tuple[str, bytes]]:
+    """(path, contents) of a file, or of every .py file under a directory; [] if missing."""
+    if path.is_dir():
+        return [(str(p), p.read_bytes()) for p in sorted(path.rglob("*.py")) if p.is_file()]
+    if path.is_file():
+        return [(str(path), path.read_bytes())]
+    return []
+
+
+def baseline_key(code_texts: List[str], pytest_targets: List[str] | None,
+                 source_files: List[str] | None = None) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Key of a baseline run: the given code texts plus the on-disk bytes of the
+    test targets and source_files (what pytest actually imports), so edited
+    tests or code never reuse a stale result.
+    """
+    digest = hashlib.sha256()
+    for text in code_texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    paths = [t.split("::", 1)[0] for t in pytest_targets or []] + [f for f in source_files or [] if f]
+    for path in paths:
+        for name, data in _file_bytes(Path(path)):
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(data)
+            digest.update(b"\0")
+    return digest.hexdigest(), tuple(pytest_targets or [])
+
+
+def run_baseline_pytest(code_texts: List[str],
+                        pytest_targets: List[str] | None,
+                        junit_path: Union[str, Path] = "pytest_report.xml",
+                        source_files: List[str] | None = None) -> Tuple[int, str]:
+    """
+    Memoized `run_pytest` for the unmodified code; returns (exit_code, summary)
+    where summary comes from `summarize_pytest_run`.
+
+    Concurrent callers with the same key wait for a single run instead of
+    starting their own.
+    """
+    key = baseline_key(code_texts, pytest_targets, source_files)
+    with _baseline_guard:
+        if key in _baseline_results:
+            _baseline_results.move_to_end(key)
+            return _baseline_results[key]
+        key_lock = _baseline_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        with _baseline_guard:
+            cached = _baseline_results.get(key)
+        if cached is not None:
+            return cached
+        with stage("baseline"):
+            exit_code, output = run_pytest(pytest_targets, junit_path=junit_path)
+        result = (exit_code, summarize_pytest_run(output, junit_path))
+        with _baseline_guard:
+            _baseline_results[key] = result
+            while len(_baseline_results) > BASELINE_CACHE_SIZE:
+                _baseline_results.popitem(last=False)
+            # later callers find the result; waiters already hold this lock
+            _baseline_locks.pop(key, None)
+        return result
 
 
 def build_prompt_for_pytest(
@@ -53,21 +289,53 @@ def build_prompt_for_pytest(
     description: str | None,
     pytest_targets: List[str] | None,
     exit_code: int,
+    previous_candidate: str | None = None,
+    response_mode: str = "full",
+    already_tried: List[str] | None = None,
 ) -> str:
     repo_blob = "\n".join(
         f"- PATH: {path}\n<FILE>\n{content}\n</FILE>"
         for path, content in (repo_files or {}).items()
     )
 
-    return f"""
-You are an automated code repair agent working with a Python project that uses pytest.
-You will receive:
-- The buggy code snippet (one focal file),
-- A user-provided description of what they think the bug is or what's happening
-- A condensed pytest failure report from the current run,
-- A small selection of other repository files for context.
-
-Your job:
+    # On retries the failure report comes from testing the previous candidate
+    previous_blob = ""
+    report_source = "the current run"
+    if previous_candidate is not None:
+        report_source = "testing the PREVIOUS_CANDIDATE below (it did not pass; do not repeat it)"
+        previous_blob = f"""
+[PREVIOUS_CANDIDATE]
+{previous_candidate}
+[/PREVIOUS_CANDIDATE]
+"""
+
+    # Fixes that were generated before (as diffs against the snippet); asking for something new
+    if already_tried:
+        diffs = "\n".join(f"--- attempt {n} ---\n{d}" for n, d in enumerate(already_tried, start=1))
+        previous_blob += f"""
+[ALREADY_TRIED]
+These fixes were already proposed and did not pass. Propose a DIFFERENT fix.
+{diffs}
+[/ALREADY_TRIED]
+"""
+
+    if response_mode == "edits":
+        # Only the changed hunks come back, so output size tracks the fix, not the file
+        code_snippet = "\n".join(f"{n:>4}| {line}" for n, line in enumerate(code_snippet.splitlines(), start=1))
+        job = """Your job:
+1) Fix the buggy code so that **pytest passes**, changing as few lines as possible.
+2) Explain succinctly what was wrong and why your fix is correct.
+3) Return JSON ONLY, using EXACTLY these keys:
+   - "Edits": array of replacement hunks against the ORIGINAL buggy snippet
+     (line numbers are shown as "N| " prefixes, which are NOT part of the code), each:
+        {"start": <int>, "end": <int>, "original": <exact lines start..end, without prefixes>,
+         "replacement": <new lines>, "reason": <short string>}
+     start/end are 1-based and inclusive; to insert without replacing, use end = start - 1
+     and an empty "original".
+   - "ExplanationOfFix": string (≤ 10 bullet points or a short paragraph)
+"""
+    else:
+        job = """Your job:
 1) Produce a corrected version of the buggy code so that **pytest passes**.
 2) Explain succinctly what was wrong and why your fix is correct.
 3) Identify the line-number range(s) to edit in the ORIGINAL buggy snippet (1-based, inclusive).
@@ -75,8 +343,18 @@ Your job:
    - "SuggestedFixedCode": string (the full fixed file contents)
    - "ExplanationOfFix": string (≤ 10 bullet points or a short paragraph)
    - "LineNumberRangesToEdit": array of objects, each with:
-        {{"start": <int>, "end": <int>, "reason": <short string>}}
+        {"start": <int>, "end": <int>, "reason": <short string>}
+"""
 
+    return f"""
+You are an automated code repair agent working with a Python project that uses pytest.
+You will receive:
+- The buggy code snippet (one focal file),
+- A user-provided description of what they think the bug is or what's happening
+- A condensed pytest failure report from {report_source},
+- A small selection of other repository files for context.
+
+{job}
 DO NOT include markdown fences, commentary, or any fields other than those keys.
 
 ===== CONTEXT START =====
@@ -95,7 +373,7 @@ DO NOT include markdown fences, commentary, or any fields other than those keys.
 [PYTEST_FAILURE_REPORT_SNIPPET]
 {pytest_output_snippet}
 [/PYTEST_FAILURE_REPORT_SNIPPET]
-
+{previous_blob}
 [DESCRIPTION]
 {(description or "").strip()}
 [/DESCRIPTION]
@@ -130,109 +408,193 @@ def extract_json(text: str) -> Dict[str, Any]:
 # ----------------------------
 
 def running_gemini(
-    original_code_path: Union[str, Path],
-    context_files: List[str],
-    description_path: Union[str, Path],
-    test_files: Union[str, List[str]],
+    report: BugReport,
     *,
     model_name: str = "gemini-2.5-flash",
     temperature: float = 0.0,
-) -> Dict[str, Any]:
+    out_dir: Union[str, Path, None] = None,
+    cache: ResponseCache | None = None,
+    previous_failure: Dict[str, Any] | None = None,
+    context_budget: int | None = None,
+    response_mode: str | None = None,
+    already_tried: List[str] | None = None,
+) -> Candidate:
     """
-    Orchestrate the full step:
-      - read inputs (from parameters only),
-      - run pytest & condense,
-      - build prompt,
-      - call Gemini,
-      - parse JSON,
-      - write fixed_code.txt, why.txt, patch.txt, code.txt,
-      - write combined_patch.json,
-      - return combined JSON.
+    Orchestrate the full step for one parsed bug report:
+      - run pytest & summarize (JUnit digest),
+      - pack context & build prompt,
+      - call Gemini (or hit the response cache), parsing the streamed JSON
+        incrementally and running the static gate on the code as soon as it arrives,
+      - parse JSON (and apply the edit script in "edits" mode),
+      - return the proposed fix as a `Candidate`.
+
+    Nothing is read back from disk between steps. When artifacts are enabled
+    (see `pipeline_types.configure_artifacts`) code.txt, fixed_code.txt,
+    why.txt, patch.txt and combined_patch.json are also written to `out_dir`
+    (default: the report's folder), and their paths are in `candidate.artifacts`.
+    The baseline run's JUnit XML always goes to `out_dir`.
+
+    Responses are looked up in `cache` (default: the process-wide cache from
+    `configure_response_cache`) before calling the model; a hit skips the
+    network call entirely.
+
+    On retries pass `previous_failure` ({"code", "exit_code", "output"} of the
+    candidate that was just validated): the baseline run is skipped and the
+    prompt shows that candidate's failure instead. Baseline runs themselves
+    are memoized per code hash and test-target set.
+
+    Context files are packed into `context_budget` tokens (default: see
+    `context_packer.set_default_budget`); the tokens saved are recorded in
+    `candidate.context_tokens`.
+
+    With `response_mode="edits"` (default: see `set_response_mode`) the model
+    returns only replacement hunks, which are applied to the snippet here; if
+    they cannot be anchored the step falls back to a full-file request.
+
+    `already_tried` lists earlier candidate codes for this issue; their diffs
+    are added to the prompt so the model proposes something different.
     """
-    # ---- Validate & read inputs ----
-    original_code_path = Path(original_code_path)
-    if not original_code_path.exists():
-        raise FileNotFoundError(f"original_code_path not found: {original_code_path.resolve()}")
-    code_snippet = original_code_path.read_text(encoding="utf-8").strip()
-
-    description = ""
-    description_path = Path(description_path)
-    if description_path.exists():
-        description = description_path.read_text(encoding="utf-8").strip()
-
-    repo_files: Dict[str, str] = {}
-    for fp in (context_files or []):
-        p = Path(fp)
-        repo_files[str(p)] = p.read_text(encoding="utf-8") if p.exists() else ""
-
-    if isinstance(test_files, str):
-        pytest_targets = [test_files]
+    # ---- Inputs (context and test files are read once per report) ----
+    code_snippet = report.code_snippet.strip()
+    description = report.description
+    repo_files = report.context_sources()
+    pytest_targets = list(report.test_cases)
+
+    out_dir = Path(out_dir if out_dir is not None else report.folder)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---- Run pytest (or reuse the last candidate's run) & summarize ----
+    previous_candidate = None
+    if previous_failure is not None:
+        exit_code = previous_failure["exit_code"]
+        pytest_output_snippet = condense_pytest_output(previous_failure["output"], tail_lines=160)
+        previous_candidate = previous_failure["code"]
     else:
-        pytest_targets = list(test_files or [])
-
-    # ---- Run pytest & condense ----
-    exit_code, pytest_output = run_pytest(pytest_targets)
-    pytest_output_snippet = condense_pytest_output(pytest_output, tail_lines=160)
-
-    # ---- Build prompt & call model ----
-    prompt = build_prompt_for_pytest(
-        code_snippet=code_snippet,
-        pytest_output_snippet=pytest_output_snippet,
-        repo_files=repo_files,
-        description=description,
-        pytest_targets=pytest_targets,
-        exit_code=exit_code,
+        exit_code, pytest_output_snippet = run_baseline_pytest(
+            [code_snippet, *repo_files.values()], pytest_targets,
+            junit_path=out_dir / "pytest_report.xml",
+            source_files=[report.code_path],
+        )
+
+    # ---- Pack context files into the token budget ----
+    test_sources = report.test_sources()
+    packed_files, pack_stats = pack_context(
+        repo_files, code_snippet,
+        test_sources=test_sources,
+        failure_text=pytest_output_snippet,
+        budget_tokens=context_budget,
     )
 
-    model = load_model(model_name=model_name)
+    # ---- Build prompt, call model, parse JSON ----
+    cache = cache if cache is not None else default_cache()
+    mode = response_mode or _response_mode
+    if mode not in REQUIRED_KEYS:
+        raise ValueError(f"Unknown response mode: {mode!r}")
     generation_config = {
         "temperature": temperature,
         "response_mime_type": "application/json",
     }
-    response = model.generate_content(prompt, generation_config=generation_config)
-    raw_text = response.text or ""
 
-    # ---- Parse JSON from model ----
-    data = extract_json(raw_text)
-    for key in ["SuggestedFixedCode", "ExplanationOfFix", "LineNumberRangesToEdit"]:
-        if key not in data:
-            raise ValueError(f"JSON missing required key: {key}")
-
-    fixed_code = data["SuggestedFixedCode"]
+    base_code = snippet_code(code_snippet)
+    tried_diffs = [
+        "\n".join(difflib.unified_diff(base_code.splitlines(), code.splitlines(), lineterm="", n=1)) or "(no change)"
+        for code in already_tried or []
+    ]
+    prechecks: List[Any] = []  # future for the static gate of the current response
+    # estimated (chars / 4) tokens over every request this step made
+    usage = {"model_calls": 0, "cache_hits": 0, "prompt_tokens": 0, "response_tokens": 0}
+
+    def ask(mode: str):
+        with span("build_prompt", mode=mode) as prompt_span:
+            prompt = build_prompt_for_pytest(
+                code_snippet=base_code if mode == "edits" else code_snippet,
+                pytest_output_snippet=pytest_output_snippet,
+                repo_files=packed_files,
+                description=description,
+                pytest_targets=pytest_targets,
+                exit_code=exit_code,
+                previous_candidate=previous_candidate,
+                response_mode=mode,
+                already_tried=tried_diffs,
+            )
+            prompt_span["estimated_tokens"] = estimate_tokens(prompt)
+            prompt_span["context_tokens_saved"] = pack_stats.tokens_saved
+        cache_key = ResponseCache.key(model_name, generation_config, prompt)
+        raw_text = cache.get(cache_key) if cache is not None else None
+        cache_hit = raw_text is not None
+        prechecks.clear()
+
+        def on_value(key, value):
+            # Start checking the code while the explanation is still streaming
+            if key == CODE_KEYS[mode]:
+                prechecks.append(_prechecks().submit(_precheck_field, mode, value, base_code, test_sources))
+
+        if cache_hit:
+            with span("extract_json", cache_hit=True):
+                data = extract_json(raw_text)
+        elif _streaming:
+            for attempt in range(1, _stream_attempts + 1):
+                try:
+                    with stage("model"):
+                        data, raw_text = stream_json_response(model_name, prompt, generation_config, mode,
+                                                              on_value=on_value)
+                    break
+                except StreamSchemaError as e:
+                    prechecks.clear()
+                    if attempt == _stream_attempts:
+                        raise ValueError(f"Model response rejected: {e}") from e
+                    print(f"⛔ Aborted streamed response ({e}); retrying ({attempt}/{_stream_attempts - 1})")
+        else:
+            with stage("model"):
+                response = get_gateway().generate(model_name, prompt, generation_config)
+            raw_text = response.text or ""
+            with span("extract_json"):
+                data = extract_json(raw_text)
+
+        usage["model_calls"] += 0 if cache_hit else 1
+        usage["prompt_tokens"] += estimate_tokens(prompt)
+        usage["response_tokens"] += estimate_tokens(raw_text)
+        usage["cache_hits"] += 1 if cache_hit else 0
+
+        for key in REQUIRED_KEYS[mode]:
+            if key not in data:
+                raise ValueError(f"JSON missing required key: {key}")
+        if not prechecks:
+            on_value(CODE_KEYS[mode], data[CODE_KEYS[mode]])
+
+        def commit():
+            # Only cache usable responses that pass the static gate, so a bad reply is retried next time
+            if cache is not None and not cache_hit:
+                cache.put(cache_key, raw_text)
+        return data, commit
+
+    data, commit = ask(mode)
+    if mode == "edits":
+        try:
+            # ranges are where the edits were anchored, not the line numbers the model claimed
+            fixed_code, ranges = apply_edits(base_code, data["Edits"])
+        except EditApplyError as e:
+            print(f"↩️ Edit script could not be applied ({e}); falling back to full-file mode")
+            mode = "full"
+            data, commit = ask(mode)
+    if mode == "full":
+        fixed_code = data["SuggestedFixedCode"]
+        ranges = data["LineNumberRangesToEdit"]  # list[{start,end,reason}]
     explanation = data["ExplanationOfFix"]
-    ranges = data["LineNumberRangesToEdit"]  # list[{start,end,reason}]
-
-    # ---- Write artifacts to "." ----
-    out_dir = Path(".")
-
-    code_copy_path = out_dir / "code.txt"          # local copy for downstream tools
-    fixed_code_path = out_dir / "fixed_code.txt"
-    why_path = out_dir / "why.txt"
-    patch_path = out_dir / "patch.txt"
-
-    code_copy_path.write_text(code_snippet, encoding="utf-8")
-    fixed_code_path.write_text(fixed_code, encoding="utf-8")
-    why_path.write_text(explanation, encoding="utf-8")
-
-    patch_lines = []
-    for r in (ranges or []):
-        patch_lines.append(f"start_line: {r.get('start', '')}")
-        patch_lines.append(f"end_line: {r.get('end', '')}")
-    patch_lines.append(f"why: {explanation.strip()}")
-    patch_path.write_text("\n".join(patch_lines), encoding="utf-8")
-
-    # ---- Combined JSON (paths only) ----
-    combined = {
-        "original_code_path": str(code_copy_path),
-        "fixed_code_path": str(fixed_code_path),
-        "patch_path": str(patch_path),
-        "why_path": str(why_path),
-        "context_files": list(repo_files.keys()),     # paths only
-        "pytest_test_files": pytest_targets,          # tests passed in
-    }
-
-    combined_json_path = out_dir / "combined_patch.json"
-    combined_json_path.write_text(json.dumps(combined, indent=2), encoding="utf-8")
-
-    return combined
+    static_gate = prechecks[0].result() if prechecks else []
+    if not static_gate:
+        commit()
+
+    candidate = Candidate(
+        code=fixed_code,
+        explanation=explanation,
+        ranges=list(ranges or []),
+        response_mode=mode,                 # "edits" unless it fell back to "full"
+        static_gate=static_gate,
+        tokens=usage,
+        context_tokens=pack_stats.as_dict(),
+    )
+    if artifacts_enabled():
+        candidate.artifacts = write_candidate_artifacts(candidate, report, out_dir)
+    return candidate
 
@@ -0,0 +1,159 @@
+# ai_fixer/job_queue.py
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path        TEXT PRIMARY KEY,
+    priority    REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    state       TEXT NOT NULL,          -- queued | running | done | failed
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    updated_at  REAL NOT NULL,
+    error       TEXT,
+    stamp       TEXT                    -- mtime/size of the file when queued (see file_stamp)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state);
+"""
+
+
+def file_stamp(path: str | Path) -> str | None:
+    """Cheap change marker for a report file ("mtime_ns:size"); None if it is gone."""
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def report_priority(report_path: str | Path, label_priority: Dict[str, float] | None) -> float | None:
+    """
+    Priority of a bug report from its GitHub labels: the highest weight among
+    its labels in label_priority (0 when none match). Returns None when the
+    file is not (yet) readable JSON, e.g. while it is still being written.
+    """
+    try:
+        with open(report_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    weights = {str(k).lower(): float(v) for k, v in (label_priority or {}).items()}
+    names = [str(label.get("name", "")).lower() for label in data.get("labels") or [] if isinstance(label, dict)]
+    return max((weights.get(name, 0.0) for name in names), default=0.0)
+
+
+class JobQueue:
+    """
+    Persistent priority queue of bug reports to process, backed by SQLite.
+
+    Jobs survive restarts: anything that was running when the daemon stopped
+    is queued again by `recover()`. `claim()` hands out the job with the
+    highest priority, where waiting jobs gain `age_boost_per_hour` points per
+    hour so low-priority reports are not starved.
+    """
+
+    def __init__(self, db_path: str | Path = ".pestcontrol/jobs.sqlite3", age_boost_per_hour: float = 10.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.age_boost_per_s = age_boost_per_hour / 3600.0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "stamp" not in columns:  # queue created before stamps were stored
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN stamp TEXT")
+        self._lock = threading.Lock()
+
+    def enqueue(self, path: str, priority: float = 0.0, stamp: str | None = None) -> bool:
+        """
+        Queue a report. A path that is already queued or running is left alone;
+        a finished one is queued again only if the file changed since it was
+        queued (its `file_stamp` differs, e.g. the same file name reused by a
+        new issue), so rescans do not retry reports that are still on disk.
+        Returns True if the job was (re)queued.
+        """
+        now = time.time()
+        if stamp is None:
+            stamp = file_stamp(path)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO jobs(path, priority, enqueued_at, state, attempts, updated_at, stamp) "
+                "VALUES (?, ?, ?, 'queued', 0, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET priority = excluded.priority, enqueued_at = excluded.enqueued_at, "
+                "state = 'queued', attempts = 0, updated_at = excluded.updated_at, error = NULL, "
+                "stamp = excluded.stamp "
+                "WHERE jobs.state IN ('done', 'failed') AND jobs.stamp IS NOT excluded.stamp",
+                (path, priority, now, now, stamp),
+            )
+            return cur.rowcount > 0
+
+    def claim(self) -> str | None:
+        """Mark the most urgent queued job as running and return its path (None if the queue is empty)."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT path FROM jobs WHERE state = 'queued' "
+                "ORDER BY priority + (? - enqueued_at) * ? DESC, enqueued_at ASC LIMIT 1",
+                (now, self.age_boost_per_s),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE path = ?",
+                (now, row[0]),
+            )
+            return row[0]
+
+    def complete(self, path: str, ok: bool, error: str | None = None, max_attempts: int = 1,
+                 retry: bool = True) -> str:
+        """
+        Record a job's outcome; failed jobs are queued again until max_attempts
+        (never with retry=False, for reports that cannot succeed as they are).
+        Returns the new state.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE path = ?", (path,)).fetchone()
+            if ok:
+                state = "done"
+            else:
+                state = "queued" if retry and row and row[0] < max_attempts else "failed"
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE path = ?",
+                (state, error, time.time(), path),
+            )
+            return state
+
+    def recover(self) -> int:
+        """Queue jobs left 'running' by a previous process again; returns how many."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET state = 'queued', updated_at = ? WHERE state = 'running'", (time.time(),)
+            ).rowcount
+
+    def depth(self) -> int:
+        """Number of jobs waiting to be claimed."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def jobs(self, state: str | None = None) -> List[Dict[str, Any]]:
+        sql = "SELECT path, priority, enqueued_at, state, attempts, updated_at, error, stamp FROM jobs"
+        args: tuple = ()
+        if state:
+            sql += " WHERE state = ?"
+            args = (state,)
+        with self._lock:
+            cur = self._conn.execute(sql + " ORDER BY enqueued_at", args)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+# ai_fixer/junit_digest.py
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+
+# "path/to/file.py:14: AssertionError" (long tb) or "path/to/file.py:14: in test_x" (short tb)
+FRAME_RE = re.compile(r"^(?P<file>\S+\.py):(?P<line>\d+):\s*(?P<what>.*)$")
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+THIRD_PARTY_MARKERS = ("site-packages", "dist-packages", "/lib/python")
+
+
+@dataclass
+class FailureEntry:
+    """One distinct failure; identical tracebacks from several tests are folded into it."""
+    kind: str                      # "failure" or "error"
+    message: str                   # assertion / exception message (a few lines)
+    frame: str                     # deepest relevant "file:line"
+    source: str                    # source line at that frame, if known
+    test_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class JUnitDigest:
+    tests: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    failures: List[FailureEntry] = field(default_factory=list)
+
+    def counts(self) -> Dict[str, int]:
+        return {"tests": self.tests, "passed": self.passed, "failed": self.failed,
+                "errors": self.errors, "skipped": self.skipped}
+
+
+def deepest_frame(text: str) -> Tuple[str, str]:
+    """
+    Return ("file:line", source line) for the deepest frame in a pytest
+    traceback, preferring project files over third-party ones.
+    """
+    frames = []
+    pending_source = ""
+    lines = (text or "").splitlines()
+    for idx, line in enumerate(lines):
+        if line.lstrip().startswith(">"):
+            pending_source = line.lstrip()[1:].strip()
+            continue
+        m = FRAME_RE.match(line.strip())
+        if not m:
+            continue
+        source = pending_source
+        if m.group("what").startswith("in ") and idx + 1 < len(lines):
+            source = lines[idx + 1].strip()
+        frames.append((f"{m.group('file')}:{m.group('line')}", source))
+        pending_source = ""
+    if not frames:
+        return "", ""
+    project = [f for f in frames if not any(mark in f[0] for mark in THIRD_PARTY_MARKERS)]
+    return (project or frames)[-1]
+
+
+def _message(element: ET.Element, max_lines: int = 4) -> str:
+    message = element.get("message") or ""
+    if not message:
+        # fall back to the "E   ..." lines of the traceback
+        message = "\n".join(
+            ln.strip()[1:].strip() for ln in (element.text or "").splitlines() if ln.strip().startswith("E ")
+        )
+    lines = [ln.rstrip() for ln in message.splitlines() if ln.strip()]
+    return "\n".join(lines[:max_lines])
+
+
+def parse_junit(path: Union[str, Path]) -> JUnitDigest | None:
+    """Parse a pytest JUnit XML file into a JUnitDigest; None if missing or unreadable."""
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+
+    digest = JUnitDigest()
+    folded: Dict[Tuple[str, str, str], FailureEntry] = {}
+    for case in root.iter("testcase"):
+        digest.tests += 1
+        test_id = f"{case.get('classname', '')}::{case.get('name', '')}".lstrip(":")
+        problem = case.find("failure")
+        kind = "failure"
+        if problem is None:
+            problem = case.find("error")
+            kind = "error"
+        if problem is None:
+            if case.find("skipped") is not None:
+                digest.skipped += 1
+            else:
+                digest.passed += 1
+            continue
+
+        if kind == "failure":
+            digest.failed += 1
+        else:
+            digest.errors += 1
+        message = _message(problem)
+        frame, source = deepest_frame(problem.text or "")
+        # Same place + same message shape (numbers masked) => same root cause
+        key = (kind, frame, NUMBER_RE.sub("N", message.splitlines()[0] if message else ""))
+        entry = folded.get(key)
+        if entry is None:
+            entry = folded[key] = FailureEntry(kind=kind, message=message, frame=frame, source=source)
+            digest.failures.append(entry)
+        entry.test_ids.append(test_id)
+    return digest
+
+
+def format_digest(digest: JUnitDigest, max_entries: int = 10, max_ids: int = 5) -> str:
+    """Render a digest as a compact prompt section."""
+    lines = [
+        f"{digest.tests} tests: {digest.passed} passed, {digest.failed} failed, "
+        f"{digest.errors} errors, {digest.skipped} skipped"
+    ]
+    for n, entry in enumerate(digest.failures[:max_entries], start=1):
+        label = "FAILED" if entry.kind == "failure" else "ERROR"
+        ids = ", ".join(entry.test_ids[:max_ids])
+        if len(entry.test_ids) > max_ids:
+            ids += f", … (+{len(entry.test_ids) - max_ids} more)"
+        fold = f" x{len(entry.test_ids)}" if len(entry.test_ids) > 1 else ""
+        lines.append(f"[{n}] {label}{fold} {ids}")
+        if entry.frame:
+            lines.append(f"    at {entry.frame}" + (f": {entry.source}" if entry.source else ""))
+        for msg_line in entry.message.splitlines():
+            lines.append(f"    {msg_line}")
+    hidden = len(digest.failures) - max_entries
+    if hidden > 0:
+        lines.append(f"... {hidden} more distinct failure(s) omitted")
+    return "\n".join(lines)
@@ -0,0 +1,225 @@
+# ai_fixer/metrics.py
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+try:
+    import resource  # POSIX only; peak RSS is omitted elsewhere
+except ImportError:
+    resource = None
+
+DEFAULT_METRICS_PATH = ".pestcontrol/metrics.jsonl"
+
+# issue being processed by the current thread/task; copied into every span
+current_issue: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_issue", default=None)
+
+_settings: Dict[str, Any] = {
+    "enabled": True,
+    "path": DEFAULT_METRICS_PATH,
+    "max_mb": 20.0,     # rotate the file once it is this big
+    "keep": 3,          # rotated files kept (metrics.jsonl.1 is the newest)
+}
+_write_lock = threading.Lock()
+
+
+def configure_metrics(config: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Set metrics options from a config block: {enabled, path, max_mb, keep}."""
+    config = config or {}
+    _settings["enabled"] = bool(config.get("enabled", True))
+    _settings["path"] = str(config.get("path", DEFAULT_METRICS_PATH))
+    _settings["max_mb"] = float(config.get("max_mb", 20.0))
+    _settings["keep"] = max(0, int(config.get("keep", 3)))
+    return dict(_settings)
+
+
+def rotated_paths(path: str | Path, keep: int | None = None) -> List[Path]:
+    """
+    The metrics file followed by its rotated predecessors, newest first: the
+    first `keep` of them, or every one that exists when keep is None.
+    """
+    path = Path(path)
+    paths = [path]
+    n = 1
+    while keep is None or n <= keep:
+        older = path.with_name(f"{path.name}.{n}")
+        if keep is None and not older.exists():
+            break
+        paths.append(older)
+        n += 1
+    return paths
+
+
+def _rotate(path: Path) -> None:
+    paths = rotated_paths(path, _settings["keep"])
+    if len(paths) == 1:
+        path.unlink(missing_ok=True)
+        return
+    for newer, older in reversed(list(zip(paths, paths[1:]))):
+        if newer.exists():
+            os.replace(newer, older)  # the oldest one is overwritten, i.e. dropped
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def record(name: str, wall_s: float, cpu_s: float | None = None, **attrs: Any) -> None:
+    """Append one span to the metrics file (no-op when metrics are disabled)."""
+    if not _settings["enabled"]:
+        return
+    entry = {
+        "span": name,
+        "issue": current_issue.get(),
+        "thread": threading.current_thread().name,
+        "start": (datetime.now() - timedelta(seconds=wall_s)).isoformat(timespec="milliseconds"),
+        "wall_s": round(wall_s, 6),
+        "cpu_s": None if cpu_s is None else round(cpu_s, 6),
+        "peak_rss_mb": peak_rss_mb(),
+        **{k: v for k, v in attrs.items() if v is not None},
+    }
+    path = Path(_settings["path"])
+    line = json.dumps(entry, default=str) + "\n"
+    with _write_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+            size = f.tell()
+        if _settings["max_mb"] and size > _settings["max_mb"] * 1024 * 1024:
+            _rotate(path)
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    """
+    Time a block: wall time, this thread's CPU time and peak RSS are recorded
+    when it exits. The yielded dict can be filled with extra attributes
+    (e.g. prompt_tokens / output_tokens) before the block ends.
+    """
+    if not _settings["enabled"]:
+        yield dict(attrs)
+        return
+    fields = dict(attrs)
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    try:
+        yield fields
+    except GeneratorExit:
+        # a streaming generator closed by its consumer (e.g. once the JSON was complete)
+        fields.setdefault("closed_early", True)
+        raise
+    except BaseException as e:
+        fields.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        record(name, time.perf_counter() - wall0, time.thread_time() - cpu0, **fields)
+
+
+def usage_tokens(response: Any) -> Dict[str, int | None]:
+    """Prompt/output token counts from a Gemini response's usage_metadata, if it has one."""
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+    }
+
+
+# ----------------------------
+# Reading (dashboard / benchmarks)
+# ----------------------------
+
+def _reversed_lines(path: Path, block: int = 64 * 1024) -> Iterator[bytes]:
+    """Lines of a file, last first, reading backwards in blocks (so only the tail is read)."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        rest = b""
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            lines = (f.read(end - start) + rest).split(b"\n")
+            rest = lines.pop(0)  # may continue in the previous block
+            yield from reversed(lines)
+            end = start
+        yield rest
+
+
+def _finished_at(span: Dict[str, Any]) -> datetime | None:
+    # spans are written when they end, so the end time follows file order
+    try:
+        return datetime.fromisoformat(span["start"]) + timedelta(seconds=span.get("wall_s") or 0.0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_spans(path: str | Path = DEFAULT_METRICS_PATH, limit: int | None = 100_000,
+               since: datetime | None = None) -> List[Dict[str, Any]]:
+    """
+    The last `limit` spans (all if None) that finished after `since` (any
+    time if None), oldest first, from a metrics file and its rotated
+    predecessors. The files are read from the end, so a short window or a
+    small limit costs a short read however large the history is.
+    """
+    spans: List[Dict[str, Any]] = []
+    for file in rotated_paths(path):
+        for line in _reversed_lines(file):
+            if not line.strip():
+                continue
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None:
+                finished = _finished_at(span)
+                if finished is not None and finished < since:
+                    return spans[::-1]
+            spans.append(span)
+            if limit and len(spans) >= limit:
+                return spans[::-1]
+    return spans[::-1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(spans: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-span-name totals and wall-time percentiles, slowest (by total wall time) first."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        groups.setdefault(s.get("span", "?"), []).append(s)
+    rows = []
+    for name, items in groups.items():
+        walls = [s.get("wall_s") or 0.0 for s in items]
+        rows.append({
+            "span": name,
+            "count": len(items),
+            "total_wall_s": round(sum(walls), 3),
+            "p50_wall_s": round(percentile(walls, 0.50), 4),
+            "p95_wall_s": round(percentile(walls, 0.95), 4),
+            "total_cpu_s": round(sum(s.get("cpu_s") or 0.0 for s in items), 3),
+            "prompt_tokens": sum(s.get("prompt_tokens") or 0 for s in items),
+            "output_tokens": sum(s.get("output_tokens") or 0 for s in items),
+            "peak_rss_mb": max((s.get("peak_rss_mb") or 0.0 for s in items), default=0.0),
+            "errors": sum(1 for s in items if s.get("error")),
+        })
+    rows.sort(key=lambda r: -r["total_wall_s"])
+    return rows
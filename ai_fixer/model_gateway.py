@@ -0,0 +1,243 @@
+# ai_fixer/model_gateway.py
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+import google.generativeai as genai
+from google.api_core import exceptions as gexc
+
+from ai_fixer.metrics import span, usage_tokens
+
+
+# Provider errors that mean "slow down / try again", not "your request is wrong".
+RETRYABLE_ERRORS = (
+    gexc.ResourceExhausted,     # 429 quota / rate limit
+    gexc.TooManyRequests,
+    gexc.ServiceUnavailable,    # 503
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError,
+)
+
+
+def cancel_stream(response: Any) -> bool:
+    """
+    Cancel a streamed `generate_content` call that is abandoned early, so the
+    server stops generating (and billing) the rest. The SDK's response has no
+    public cancel; its underlying api_core stream (gRPC or REST) does, and
+    plain generators (local stand-ins) are closed. Returns False when nothing
+    could be cancelled, i.e. the request only stopped being read.
+    """
+    for target in (response, getattr(response, "_iterator", None)):
+        for method in ("cancel", "close"):
+            stop = getattr(target, method, None)
+            if callable(stop):
+                try:
+                    stop()
+                except Exception:
+                    return False
+                return True
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ModelGateway:
+    """
+    Long-lived, thread-safe access point for Gemini.
+
+    The API is configured once and one `GenerativeModel` is kept per model name.
+    Every request passes a token-bucket rate limiter and a concurrency cap, and
+    quota/availability errors are retried with jittered exponential backoff.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = 60,
+                 burst: int | None = None,
+                 max_concurrency: int = 4,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst or max_concurrency)
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._configured = False
+        self._models: Dict[str, genai.GenerativeModel] = {}
+
+    def _configure(self) -> None:
+        if self._configured:
+            return
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ No GEMINI_API_KEY found in environment/.env")
+        genai.configure(api_key=api_key)
+        self._configured = True
+
+    def model(self, model_name: str) -> genai.GenerativeModel:
+        """Return the model for model_name from the installed backend, or Gemini by default."""
+        if _model_backend is not None:
+            return _model_backend(model_name)
+        return self.gemini_model(model_name)
+
+    def gemini_model(self, model_name: str) -> genai.GenerativeModel:
+        """Return the shared Gemini model instance for model_name, configuring the API on first use."""
+        with self._lock:
+            self._configure()
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def generate(self, model_name: str, prompt: str, generation_config: Dict[str, Any], **kwargs):
+        """Rate-limited, concurrency-capped `generate_content` with retries on quota errors."""
+        model = self.model(model_name)
+        for attempt in range(self.max_retries + 1):
+            if _rate_limited():
+                self.bucket.acquire()
+            try:
+                with self.slots, span("generate_content", model=model_name, attempt=attempt) as call:
+                    response = model.generate_content(prompt, generation_config=generation_config, **kwargs)
+                    call.update(usage_tokens(response))
+                    return response
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"⏳ {type(e).__name__} from {model_name}; retrying in {delay:.1f}s "
+                      f"({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def stream(self, model_name: str, prompt: str, generation_config: Dict[str, Any], **kwargs):
+        """
+        Streaming `generate_content`: yields text chunks as they arrive.
+
+        The concurrency slot is held until the stream is exhausted or closed.
+        Closing the generator early cancels the underlying request when the
+        SDK allows it (see `cancel_stream`; recorded as `cancelled` on the
+        span). Retryable errors are only retried before the first chunk has
+        been yielded.
+        """
+        model = self.model(model_name)
+        for attempt in range(self.max_retries + 1):
+            if _rate_limited():
+                self.bucket.acquire()
+            yielded = False
+            try:
+                with self.slots, span("generate_content", model=model_name, attempt=attempt, stream=True) as call:
+                    t0 = time.perf_counter()
+                    response = model.generate_content(prompt, generation_config=generation_config,
+                                                      stream=True, **kwargs)
+                    finished = False
+                    try:
+                        for chunk in response:
+                            if getattr(chunk, "usage_metadata", None) is not None:
+                                call.update(usage_tokens(chunk))  # the last chunk carries the totals
+                            text = getattr(chunk, "text", "") or ""
+                            if text:
+                                if not yielded:
+                                    call["first_chunk_s"] = round(time.perf_counter() - t0, 6)
+                                yielded = True
+                                yield text
+                        finished = True
+                    finally:
+                        if not finished:
+                            call["cancelled"] = cancel_stream(response)
+                return
+            except RETRYABLE_ERRORS as e:
+                if yielded or attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"⏳ {type(e).__name__} from {model_name}; retrying in {delay:.1f}s "
+                      f"({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    async def agenerate(self, model_name: str, prompt: str, generation_config: Dict[str, Any], **kwargs):
+        """Async wrapper around `generate`; the blocking call runs in a worker thread."""
+        return await asyncio.to_thread(self.generate, model_name, prompt, generation_config, **kwargs)
+
+
+_gateway: ModelGateway | None = None
+_gateway_lock = threading.Lock()
+_model_backend: Callable[[str], Any] | None = None
+
+
+def set_model_backend(factory: Callable[[str], Any] | None) -> None:
+    """
+    Serve model lookups from factory(model_name) instead of Gemini, e.g. a local
+    stand-in for benchmarks or a replay archive (see `ai_fixer.backends`). The
+    returned object only needs a Gemini-compatible
+    `generate_content(prompt, generation_config=..., stream=...)`. Pass None to
+    go back to Gemini. Retries and metrics still apply; the rate limiter is
+    skipped when the factory has `rate_limited = False`.
+    """
+    global _model_backend
+    _model_backend = factory
+
+
+def get_model_backend() -> Callable[[str], Any] | None:
+    return _model_backend
+
+
+def _rate_limited() -> bool:
+    return getattr(_model_backend, "rate_limited", True)
+
+
+def configure_model_gateway(config: Dict[str, Any] | None) -> ModelGateway:
+    """
+    Replace the process-wide gateway using a config block:
+    {requests_per_minute, burst, max_concurrency, max_retries, base_delay_s, max_delay_s}.
+    """
+    global _gateway
+    config = config or {}
+    gateway = ModelGateway(
+        requests_per_minute=float(config.get("requests_per_minute", 60)),
+        burst=config.get("burst"),
+        max_concurrency=int(config.get("max_concurrency", 4)),
+        max_retries=int(config.get("max_retries", 5)),
+        base_delay=float(config.get("base_delay_s", 1.0)),
+        max_delay=float(config.get("max_delay_s", 30.0)),
+    )
+    with _gateway_lock:
+        _gateway = gateway
+    return gateway
+
+
+def get_gateway() -> ModelGateway:
+    """Return the process-wide gateway, creating one with defaults on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = ModelGateway()
+        return _gateway
@@ -0,0 +1,129 @@
+# ai_fixer/patience_diff.py
+import difflib
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+Opcode = Tuple[str, int, int, int, int]
+
+# Above this many lines (a + b) difflib's SequenceMatcher gets slow; use patience instead.
+PATIENCE_THRESHOLD = 2000
+
+
+def _intern(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """Map lines to small ints so comparisons are hash lookups, not string compares."""
+    ids: Dict[str, int] = {}
+    return [ids.setdefault(x, len(ids)) for x in a], [ids.setdefault(x, len(ids)) for x in b]
+
+
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Lines unique in both ranges, reduced to their longest increasing subsequence (patience sort)."""
+    count_a: Dict[int, int] = {}
+    pos_a: Dict[int, int] = {}
+    for i in range(alo, ahi):
+        count_a[a[i]] = count_a.get(a[i], 0) + 1
+        pos_a[a[i]] = i
+    count_b: Dict[int, int] = {}
+    pos_b: Dict[int, int] = {}
+    for j in range(blo, bhi):
+        count_b[b[j]] = count_b.get(b[j], 0) + 1
+        pos_b[b[j]] = j
+    pairs = sorted(
+        (pos_a[x], pos_b[x]) for x, n in count_a.items() if n == 1 and count_b.get(x) == 1
+    )
+    if not pairs:
+        return []
+
+    tails: List[int] = []        # smallest b-index ending an increasing run of each length
+    tail_idx: List[int] = []     # index into pairs for those tails
+    back: List[int] = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        back[k] = tail_idx[pos - 1] if pos else -1
+    lis = []
+    k = tail_idx[-1]
+    while k != -1:
+        lis.append(pairs[k])
+        k = back[k]
+    return lis[::-1]
+
+
+def _matches(a: List[int], b: List[int], max_fallback: int = 250_000) -> List[Tuple[int, int]]:
+    """Matched (i, j) line pairs between a and b, in order."""
+    out: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # common prefix / suffix
+        head = []
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            head.append((alo, blo))
+            alo += 1
+            blo += 1
+        tail = []
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            tail.append((ahi, bhi))
+        out.extend(head)
+        out.extend(tail)
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            bounds = [(alo - 1, blo - 1), *anchors, (ahi, bhi)]
+            out.extend(anchors)
+            for (i0, j0), (i1, j1) in zip(bounds, bounds[1:]):
+                if i1 - i0 > 1 and j1 - j0 > 1:
+                    stack.append((i0 + 1, i1, j0 + 1, j1))
+        elif (ahi - alo) * (bhi - blo) <= max_fallback:
+            # no unique lines left (e.g. repeated boilerplate): a small exact LCS is affordable
+            sm = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, n in sm.get_matching_blocks():
+                out.extend((alo + i + k, blo + j + k) for k in range(n))
+        # else: leave the region as a plain replace
+    out.sort()
+    return out
+
+
+def patience_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """SequenceMatcher-style opcodes computed with patience diff (near-linear on real code)."""
+    ia, ib = _intern(a, b)
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for mi, mj in _matches(ia, ib) + [(len(a), len(b))]:
+        if mi > i and mj > j:
+            opcodes.append(("replace", i, mi, j, mj))
+        elif mi > i:
+            opcodes.append(("delete", i, mi, j, j))
+        elif mj > j:
+            opcodes.append(("insert", i, i, j, mj))
+        if mi < len(a) and mj < len(b):
+            if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == mi and opcodes[-1][4] == mj:
+                tag, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, mi + 1, j1, mj + 1))
+            else:
+                opcodes.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return opcodes
+
+
+class PatienceMatcher(difflib.SequenceMatcher):
+    """SequenceMatcher whose opcodes come from patience diff (grouping etc. is inherited)."""
+
+    def get_opcodes(self):
+        if self.opcodes is None:
+            self.opcodes = patience_opcodes(self.a, self.b)
+        return self.opcodes
+
+
+def matcher_for(a: Sequence[str], b: Sequence[str]) -> difflib.SequenceMatcher:
+    """difflib for small inputs (same output as before), patience diff for large ones."""
+    if len(a) + len(b) > PATIENCE_THRESHOLD:
+        return PatienceMatcher(None, a, b, autojunk=False)
+    return difflib.SequenceMatcher(None, a, b)
@@ -0,0 +1,214 @@
+# ai_fixer/pipeline_types.py
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bug_report_extractor.bug_report_parser import MAPPING, parse_bug_report, safe_write
+
+# Objects handed from one pipeline stage to the next:
+#   extract  -> BugReport
+#   model    -> Candidate
+#   validate -> ValidationResult
+# Files on disk are optional debugging artifacts (see `configure_artifacts`),
+# not the way stages talk to each other.
+
+_settings: Dict[str, Any] = {"enabled": False}
+
+
+def configure_artifacts(config: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Set artifact options from a config block: {enabled}."""
+    config = config or {}
+    _settings["enabled"] = bool(config.get("enabled", False))
+    return dict(_settings)
+
+
+def artifacts_enabled() -> bool:
+    return _settings["enabled"]
+
+
+def _lines(text: str, placeholder: str) -> List[str]:
+    if not text or text.startswith(placeholder):
+        return []
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+@dataclass
+class BugReport:
+    """The fields of one issue, as parsed from its GitHub JSON."""
+
+    issue: str                  # e.g. "issue_59"
+    folder: str                 # scratch directory for this issue (candidates, JUnit XML)
+    code_snippet: str
+    code_path: str              # repo-relative path of the file to fix
+    description: str = ""
+    test_cases: List[str] = field(default_factory=list)
+    context_files: List[str] = field(default_factory=list)
+    _context: Dict[str, str] | None = field(default=None, repr=False, compare=False)
+    _tests: List[str] | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_fields(cls, issue: str, folder: str, fields: Dict[str, str]) -> "BugReport":
+        """Build a report from `parse_bug_report` output (missing fields become empty)."""
+        code_path = _lines(fields.get("code_with_error_path", ""), "# No code")
+        return cls(
+            issue=issue,
+            folder=folder,
+            code_snippet=(fields.get("code_with_error") or "").strip(),
+            code_path=code_path[0] if code_path else "",
+            description=(fields.get("description_of_the_bug") or "").strip(),
+            test_cases=_lines(fields.get("test_cases", ""), "# No tests"),
+            context_files=_lines(fields.get("context_files", ""), "# No context"),
+        )
+
+    @classmethod
+    def from_json(cls, json_file: str | Path, out_root: str | Path = "extracted_reports") -> "BugReport":
+        """Parse a bug report JSON; its scratch folder is out_root/<file name>."""
+        issue = os.path.splitext(os.path.basename(json_file))[0]
+        return cls.from_fields(issue, os.path.join(out_root, issue), parse_bug_report(str(json_file)))
+
+    @classmethod
+    def from_dir(cls, folder: str | Path) -> "BugReport":
+        """Load a report from a directory written by `extract_bug_report` (or `write`)."""
+        fields = {}
+        for key, (filename, _) in MAPPING.items():
+            path = Path(folder) / filename
+            fields[key] = path.read_text(encoding="utf-8") if path.exists() else ""
+        return cls.from_fields(os.path.basename(os.path.normpath(folder)), str(folder), fields)
+
+    @property
+    def issue_number(self) -> int:
+        return int(self.issue.split("issue_")[-1])
+
+    @property
+    def has_code(self) -> bool:
+        return bool(self.code_snippet) and not self.code_snippet.startswith("# No code")
+
+    @property
+    def skip_tests(self) -> bool:
+        return not self.test_cases
+
+    def context_sources(self) -> Dict[str, str]:
+        """Contents of the context files (read once per report; missing files are empty)."""
+        if self._context is None:
+            self._context = {
+                str(Path(fp)): Path(fp).read_text(encoding="utf-8") if Path(fp).exists() else ""
+                for fp in self.context_files
+            }
+        return self._context
+
+    def test_sources(self) -> List[str]:
+        """Contents of the test files behind the pytest targets (read once per report)."""
+        if self._tests is None:
+            sources = []
+            for target in self.test_cases:
+                tp = Path(target.split("::", 1)[0])
+                if tp.is_file():
+                    sources.append(tp.read_text(encoding="utf-8"))
+            self._tests = sources
+        return self._tests
+
+    def write(self) -> str:
+        """Artifact sink: write the extracted fields as .txt files into `folder`."""
+        os.makedirs(self.folder, exist_ok=True)
+        values = {
+            "description_of_the_bug": self.description,
+            "test_cases": "\n".join(self.test_cases),
+            "code_with_error": self.code_snippet,
+            "code_with_error_path": self.code_path,
+            "context_files": "\n".join(self.context_files),
+        }
+        for key, (filename, default) in MAPPING.items():
+            safe_write(self.folder, filename, values[key], default)
+        return self.folder
+
+
+@dataclass
+class Candidate:
+    """One model-proposed fix for a BugReport."""
+
+    code: str                   # full fixed file contents
+    explanation: str
+    ranges: List[Dict[str, Any]] = field(default_factory=list)  # [{start, end, reason}], 1-based
+    response_mode: str = "full"
+    static_gate: List[str] = field(default_factory=list)      # rejection reasons ([] = ok)
+    tokens: Dict[str, int] = field(default_factory=dict)      # estimated prompt/response tokens, calls, cache hits
+    context_tokens: Dict[str, Any] = field(default_factory=dict)
+    artifacts: Dict[str, str] = field(default_factory=dict)   # artifact name -> path, when written
+
+    def _bound(self, key: str, pick) -> int:
+        values = []
+        for r in self.ranges:
+            try:
+                values.append(int(r.get(key)))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        if not values:
+            raise ValueError(f"Candidate has no usable line ranges to edit: {self.ranges!r}")
+        return pick(values)
+
+    @property
+    def start_line(self) -> int:
+        """First edited line (1-based) over all ranges."""
+        return self._bound("start", min)
+
+    @property
+    def end_line(self) -> int:
+        """Last edited line (1-based) over all ranges."""
+        return self._bound("end", max)
+
+
+@dataclass
+class ValidationResult:
+    """Outcome of running a candidate against the issue's tests."""
+
+    returncode: int | None      # None if the run was cancelled
+    output: str = ""
+    test_counts: Dict[str, int] = field(default_factory=dict)
+    duration_s: float = 0.0
+
+    @property
+    def passed(self) -> bool:
+        return self.returncode == 0
+
+
+def write_candidate_artifacts(candidate: Candidate, report: BugReport, out_dir: str | Path) -> Dict[str, str]:
+    """
+    Artifact sink: write code.txt, fixed_code.txt, why.txt, patch.txt and
+    combined_patch.json for one candidate into out_dir. Returns name -> path.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "original_code": out_dir / "code.txt",
+        "fixed_code": out_dir / "fixed_code.txt",
+        "why": out_dir / "why.txt",
+        "patch": out_dir / "patch.txt",
+        "combined": out_dir / "combined_patch.json",
+    }
+    paths["original_code"].write_text(report.code_snippet, encoding="utf-8")
+    paths["fixed_code"].write_text(candidate.code, encoding="utf-8")
+    paths["why"].write_text(candidate.explanation, encoding="utf-8")
+
+    patch_lines = []
+    for r in candidate.ranges:
+        patch_lines.append(f"start_line: {r.get('start', '')}")
+        patch_lines.append(f"end_line: {r.get('end', '')}")
+    patch_lines.append(f"why: {candidate.explanation.strip()}")
+    paths["patch"].write_text("\n".join(patch_lines), encoding="utf-8")
+
+    combined = {
+        "original_code_path": str(paths["original_code"]),
+        "fixed_code_path": str(paths["fixed_code"]),
+        "patch_path": str(paths["patch"]),
+        "why_path": str(paths["why"]),
+        "context_files": report.context_files,
+        "pytest_test_files": report.test_cases,
+        "context_tokens": candidate.context_tokens,
+        "tokens": candidate.tokens,
+        "response_mode": candidate.response_mode,
+        "static_gate": candidate.static_gate,
+    }
+    paths["combined"].write_text(json.dumps(combined, indent=2), encoding="utf-8")
+    return {name: str(path) for name, path in paths.items()}
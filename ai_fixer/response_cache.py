@@ -0,0 +1,173 @@
+# ai_fixer/response_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of raw model responses.
+
+    Entries are keyed by a hash of (model name, generation config, prompt) and
+    stored one file per key. Lookups reject entries created more than
+    `max_age_s` ago; eviction drops entries unused for that long, then the
+    least recently used ones until the cache is back under LOW_WATER of both
+    `max_entries` and `max_bytes`. A file's mtime records its last use.
+
+    The entry count and total size are kept up to date by `put`, so the
+    directory is only scanned when a limit is exceeded or every RESCAN_EVERY
+    puts (to expire old entries and pick up other processes' writes).
+    """
+
+    LOW_WATER = 0.9
+    RESCAN_EVERY = 100
+
+    def __init__(self,
+                 cache_dir: Union[str, Path] = ".pestcontrol/response_cache",
+                 max_entries: int = 1000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 max_age_s: float = 7 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._count: int | None = None  # unknown until the first scan
+        self._bytes = 0
+        self._puts_since_scan = 0
+
+    @staticmethod
+    def key(model_name: str, generation_config: Dict[str, Any], prompt: str) -> str:
+        payload = json.dumps(
+            {"model": model_name, "config": generation_config, "prompt": prompt},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response text for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if self.max_age_s and time.time() - entry["created"] > self.max_age_s:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            text = entry["text"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used for LRU eviction
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store text under key (atomic write-and-rename), then evict if over budget."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = None
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"text": text, "created": time.time()}, f)
+            size = f.tell()
+        os.replace(tmp, path)
+        with self._lock:
+            if self._count is not None:
+                if replaced is None:
+                    self._count += 1
+                self._bytes += size - (replaced or 0)
+                self._puts_since_scan += 1
+            scan = (self._count is None or self._puts_since_scan >= self.RESCAN_EVERY
+                    or self._count > self.max_entries or self._bytes > self.max_bytes)
+        if scan:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Apply the age limit and, if a size limit is exceeded, shrink to
+        LOW_WATER of the limits. Returns the number of entries removed.
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+            removed = 0
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                if self.max_age_s and now - st.st_mtime > self.max_age_s:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+                else:
+                    entries.append((st.st_mtime, st.st_size, path))
+
+            entries.sort()  # oldest first
+            total = sum(size for _, size, _ in entries)
+            if len(entries) > self.max_entries or total > self.max_bytes:
+                # go below the limits so the next few puts do not trigger another scan
+                max_entries = int(self.max_entries * self.LOW_WATER)
+                max_bytes = int(self.max_bytes * self.LOW_WATER)
+                evict_to = 0
+                while evict_to < len(entries) and (len(entries) - evict_to > max_entries or total > max_bytes):
+                    _, size, path = entries[evict_to]
+                    path.unlink(missing_ok=True)
+                    total -= size
+                    evict_to += 1
+                removed += evict_to
+                del entries[:evict_to]
+
+            self._count, self._bytes, self._puts_since_scan = len(entries), total, 0
+            self.evictions += removed
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_default_cache: ResponseCache | None = None
+
+
+def configure_response_cache(config: Dict[str, Any] | None) -> ResponseCache | None:
+    """
+    Install the process-wide cache used by `running_gemini` from a config block:
+    {enabled, dir, max_entries, max_mb, max_age_days}. Returns the cache (or None).
+    """
+    global _default_cache
+    config = config or {}
+    if not config.get("enabled", True):
+        _default_cache = None
+        return None
+    _default_cache = ResponseCache(
+        cache_dir=config.get("dir", ".pestcontrol/response_cache"),
+        max_entries=int(config.get("max_entries", 1000)),
+        max_bytes=int(float(config.get("max_mb", 64)) * 1024 * 1024),
+        max_age_s=float(config.get("max_age_days", 7)) * 24 * 3600,
+    )
+    return _default_cache
+
+
+def default_cache() -> ResponseCache | None:
+    return _default_cache
@@ -0,0 +1,80 @@
+# ai_fixer/run_records.py
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+try:
+    import fcntl  # POSIX: also serialize writers in other processes
+except ImportError:
+    fcntl = None
+
+RECORD_VERSION = 1
+
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def record_path(issue_number: int, out_dir: Union[str, Path] = "proposed_fixes") -> Path:
+    return Path(out_dir) / f"issue_{issue_number}.jsonl"
+
+
+@contextmanager
+def _locked(path: Path):
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(str(path.resolve()), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        # lock the directory itself, so no lock files are left next to the reports
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            fcntl.flock(dir_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(dir_fd)  # releases the flock
+
+
+def append_run_record(path: Union[str, Path], record: Dict[str, Any]) -> Path:
+    """
+    Add one JSON record to a .jsonl file.
+
+    The line is appended in a single write and fsynced, under a lock, so
+    concurrent writers cannot interleave. A reader racing the write may see
+    a partial last line, which `load_run_records` skips.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = (json.dumps({"version": RECORD_VERSION, **record}, default=str) + "\n").encode("utf-8")
+    with _locked(path):
+        with open(path, "ab+") as f:
+            # a writer that died mid-line must not glue its fragment to this record
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+    return path
+
+
+def load_run_records(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """All records in a .jsonl file, oldest first; unreadable lines are skipped."""
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return records
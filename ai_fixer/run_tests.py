@@ -1,169 +1,422 @@
 from colorama import Fore, Back, Style, init
-import json, shutil, subprocess, os, tempfile, sys
+import contextvars, json, shutil, subprocess, os, tempfile, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from ai_fixer.gemini import running_gemini
+from ai_fixer.gemini import running_gemini, summarize_pytest_run
+from ai_fixer.junit_digest import parse_junit
+from ai_fixer.stages import stage
+from ai_fixer.workspace import candidate_dir, overlay_workspace, isolated_env
+from ai_fixer.pytest_pool import get_pytest_pool
+from ai_fixer.static_gate import gate_settings
+from ai_fixer.fingerprint import TriedCandidates, dedupe_settings
+from ai_fixer.run_records import append_run_record, record_path
+from ai_fixer.metrics import span
+from ai_fixer.diff_engine import write_diff
+from ai_fixer.context_packer import snippet_code
+from ai_fixer.sharding import plan_shards, record_timings, run_shards
+from ai_fixer.pipeline_types import BugReport, ValidationResult
 import json
 from datetime import datetime
 
+GATE_REJECTED = -1 # returncode of a candidate the static gate rejected (never tested)
+DUPLICATE = -2 # returncode of a candidate identical to one already tried (never tested)
+UNTESTED = (GATE_REJECTED, DUPLICATE)
+
 #helper for diffs
-def save_diff(original_file: str, fixed_file: str, issue_number: int) -> str:
+def save_diff(original_code: str, fixed_code: str, issue_number: int, file_path: str = "") -> str:
     """
-    Generate a unified diff between original and fixed file,
-    save it under proposed_fixes/issue_{n}.diff
+    Generate a git-style unified diff between the original and fixed code
+    (in process, no `git diff` subprocess), save it under proposed_fixes/issue_{n}.diff
 
     Args:
-        original_file (str): Path to buggy file
-        fixed_file (str): Path to AI-fixed file
+        original_code (str): Buggy code
+        fixed_code (str): AI-fixed code
         issue_number (int): GitHub issue number
+        file_path (str): Repo-relative path shown in the diff headers
 
     Returns:
         str: Path to the saved diff file
     """
-    Path("proposed_fixes").mkdir(exist_ok=True)
-
     out_path = f"proposed_fixes/issue_{issue_number}.diff"
+    label = file_path or f"issue_{issue_number}"
 
-    result = subprocess.run(
-        ["git", "diff", "--no-index", original_file, fixed_file],
-        capture_output=True,
-        text=True
-    )
-
-    Path(out_path).write_text(result.stdout, encoding="utf-8")
+    with span("save_diff", issue_number=issue_number):
+        write_diff(out_path, original_code, fixed_code, label, label)
 
     return out_path
 
-#! takes gemini input, runs tests, delivers correct output
-def tester(num_loops, manual, folder_path, skip_tests): # int num loops, bool manual y/n, file_path dir
-    success = False
+def fan_out_temperatures(fan_out: int, max_temperature: float = 0.8) -> list:
+    """Spread `fan_out` sampling temperatures from 0.0 up to max_temperature."""
+    if fan_out <= 1:
+        return [0.0]
+    step = max_temperature / (fan_out - 1)
+    return [round(k * step, 2) for k in range(fan_out)]
 
-    #! opening gemini input, first call
-    original_code_path = os.path.join(folder_path, "code_with_error.txt")
-    context_files_path = os.path.join(folder_path, "context_files.txt")
-    description_path = os.path.join(folder_path, "description_of_the_bug.txt")
-    test_cases_path = os.path.join(folder_path, "test_cases.txt")
-    original_file = os.path.join(folder_path, "code_with_error_path.txt")
+def _pytest_runner(workspace, run, use_pool=True):
+    """run(args, cancel_event) -> (returncode, output) for pytest in workspace (warm pool or subprocess)."""
+    pool = get_pytest_pool() if use_pool else None
+    run["pooled"] = pool is not None
 
-    with open(test_cases_path, "r", encoding="utf-8") as f:
-        test_cases = [line.strip() for line in f if line.strip()]
+    def run_pytest(args, cancel_event):
+        if pool is not None:
+            outcome = pool.run(args, cwd=workspace, cancel_event=cancel_event)
+            return outcome["exit_code"], outcome["output"]
+        proc = subprocess.Popen(
+            ["pytest", *args],
+            stdout = subprocess.PIPE,
+            stderr = subprocess.STDOUT,
+            text = True,
+            cwd = workspace,
+            env = isolated_env())
+        while True:
+            try:
+                output, _ = proc.communicate(timeout=0.2)
+                return proc.returncode, output or ""
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set():
+                    proc.kill()
+                    proc.communicate()
+                    return None, ""
+    return run_pytest
 
-    with open(context_files_path, "r", encoding="utf-8") as f:
-        context_files = [line.strip() for line in f if line.strip()]
+def validate_candidate(orig_file, fixed_code_out, tests, cancel_event=None, junit_path=None):
+    """
+    Run the tests against an overlay of the repo with orig_file replaced.
 
-    with open(original_file, "r", encoding="utf-8") as f:
-        original_file_path = f.readline().strip()
+    When sharding is enabled and earlier runs of these tests took long enough,
+    the tests are split into duration-balanced shards run in parallel (see
+    `ai_fixer.sharding`); the result looks the same as a single run.
 
-    combined_json = running_gemini(original_code_path, context_files, description_path, test_cases)
-    input_data = combined_json
+    Args:
+        orig_file (str): Repo-relative path of the file being fixed
+        fixed_code_out (str): Candidate contents for that file
+        tests (list): pytest targets
+        cancel_event (threading.Event): When set, the pytest run is killed
+        junit_path (str): Where to write the run's JUnit XML (optional)
 
-    #! begin looping the patch iterations
-    num_runs = 1
-    for i in range(num_loops):
-        #! get new gemini input on following runs
-        if i > 0:
-            combined_json = running_gemini(original_code_path, context_files, description_path, test_cases)
-            input_data = combined_json
-        
-        tests = input_data["pytest_test_files"]
-        fixed_code = input_data["fixed_code_path"] #whole fixed code
-        patch_path = input_data["patch_path"]
-
-        patch_data = {}
-        with open(patch_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    patch_data[key.strip()] = value.strip()
-
-        raw_start = patch_data.get("start_line", patch_data.get("start_line"))
-        raw_end   = patch_data.get("end_line",   patch_data.get("end_line"))
-
-        if raw_start is None or raw_end is None:
-            raise ValueError(f"patch.txt missing start/end lines. Got keys: {list(patch_data.keys())}")
-
-        start_line = int(raw_start) - 1  # 0-based
-        end_line   = int(raw_end)   - 1
-        why = patch_data.get("why", "")
-
-        #! if not given tests to run code with, suggest patch anyways
-        try:
-            result = subprocess.run(
-                ["git", "diff", "--no-index", orig_file, fixed_code],
-                capture_output=True,
-                text=True
-            )
-            patch_text = result.stdout
-        except Exception:
-            patch_text = None
-
-        if not patch_text:
-            patch_text = Path(fixed_code).read_text(encoding="utf-8") if Path(fixed_code).exists() else ""
-            
-        if skip_tests:
-            if manual:
-                print(f"{Fore.YELLOW} No test cases provided. Running in patch-only mode.{Style.RESET_ALL}")
+    Returns:
+        ValidationResult: returncode is None if the run was cancelled; output is
+        the summarized run (JUnit digest when junit_path is given)
+    """
+    started = time.monotonic()
 
-            break
+    def result(returncode, output):
+        counts = {}
+        if junit_path and returncode is not None:
+            record_timings(tests, junit_path)
+            output = summarize_pytest_run(output, junit_path)
+            digest = parse_junit(junit_path)
+            counts = digest.counts() if digest is not None else {}
+        return ValidationResult(returncode, output, counts, round(time.monotonic() - started, 3))
+
+    with stage("validate"), overlay_workspace({orig_file: fixed_code_out}) as workspace, \
+            span("tester_pytest") as run:
+        if cancel_event is not None and cancel_event.is_set():
+            run["cancelled"] = True
+            return result(None, "")
+        run_pytest = _pytest_runner(workspace, run)
+        #! rootdir pinned to the overlay so test ids match across shards, collection and timings
+        args = ["--tb=short", "-p", "no:cacheprovider", f"--rootdir={workspace}"]
+        shards = plan_shards(tests, run_pytest, workspace)
+        if shards:
+            run["shards"] = len(shards)
+            #! shards use the warm pool only when it has a worker per shard; otherwise they would
+            #! queue behind each other, so they run as plain pytest processes instead
+            pool = get_pytest_pool()
+            shard_runner = run_pytest if pool is not None and pool.size >= len(shards) \
+                else _pytest_runner(workspace, run, use_pool=False)
+            returncode, output = run_shards(shards, shard_runner, args, workspace, cancel_event,
+                                            os.path.abspath(junit_path) if junit_path else None)
+        else:
+            if junit_path:
+                args.append(f"--junitxml={os.path.abspath(junit_path)}")
+            returncode, output = run_pytest([*tests, *args], cancel_event)
+        if returncode is None:
+            run["cancelled"] = True
+        else:
+            run["exit_code"] = returncode
+        return result(returncode, output)
 
-        #! save original file, temporaily overwrite with fixed code to run tests, restore
-        with open(fixed_code, "r", encoding="utf-8") as f:
-            fixed_code_out = f.read()
-        
-        orig_file = original_file_path # relative path from repo root
-
-        shutil.copy(orig_file, orig_file + ".bak")
-        with open(orig_file, "w", encoding="utf-8") as f:
-            f.write(fixed_code_out)
-
-        result = subprocess.run(
-            ["pytest", *tests, "--tb=short"],
-            capture_output = True,
-            text = True)
-        shutil.move(orig_file + ".bak", orig_file)
-
-        #! if the test suite passes, success -> go to output
-        if result.returncode == 0:
-            success = True
+#! generates one candidate, optionally tests it; returns everything the report needs
+def _run_candidate(index, temperature, report, skip_tests, cancel_event=None, previous=None, tried=None):
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    #! static gate: broken candidates are regenerated right away instead of costing a test run
+    #! dedupe: a fix identical (by AST) to one already tried is regenerated hotter, listing what was tried
+    feedback = _as_previous_failure(previous)
+    rejections = []
+    duplicates = 0
+    gate_left = gate_settings()["max_regenerations"]
+    dedupe = dedupe_settings()
+    if not dedupe["enabled"]:
+        tried = None
+    dup_left = dedupe["max_regenerations"]
+    already_tried = None
+    fingerprint = None
+    tokens = {}
+    started = time.monotonic()
+    while True:
+        proposal = running_gemini(report, temperature=temperature, out_dir=candidate_dir(report.folder, index),
+                                  previous_failure=feedback, already_tried=already_tried)
+        for key, value in proposal.tokens.items():
+            tokens[key] = tokens.get(key, 0) + value
+        context_tokens = proposal.context_tokens  # context packer stats of the prompt actually sent
+        reasons = proposal.static_gate
+        code = proposal.code
+        duplicate = False
+        if reasons:
+            rejections.append("; ".join(reasons))
+            print(f"{Fore.YELLOW}Static gate rejected candidate #{index} (attempt {len(rejections)}): "
+                  f"{rejections[-1]}{Style.RESET_ALL}")
+            if gate_left == 0:
+                break
+            gate_left -= 1
+            feedback = {
+                "code": code,
+                "exit_code": "not run (rejected by static checks)",
+                "output": "Static checks rejected this candidate before running pytest:\n"
+                          + "\n".join(f"- {r}" for r in reasons),
+            }
+        elif tried is not None:
+            fingerprint, is_new = tried.add(code)
+            duplicate = not is_new
+            if not duplicate:
+                break
+            duplicates += 1
+            print(f"{Fore.YELLOW}Candidate #{index} repeats an earlier fix; not re-testing it{Style.RESET_ALL}")
+            if dup_left == 0:
+                break
+            dup_left -= 1
+            temperature = round(min(1.0, temperature + dedupe["temperature_step"]), 2)
+            already_tried = tried.recent()
+        else:
             break
-        pass
-        num_runs += 1
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+    candidate = {
+        "index": index,
+        "temperature": temperature,
+        "code": code, #whole fixed code
+        "fixed_file": proposal.artifacts.get("fixed_code", ""),
+        "start_line": proposal.start_line - 1,  # 0-based
+        "end_line": proposal.end_line - 1,
+        "why": proposal.explanation,
+        "returncode": None,
+        "output": "",
+        "test_counts": {},
+        "gate_rejections": rejections,
+        "duplicates": duplicates,
+        "tokens": tokens,
+        "context_tokens": context_tokens,
+        "timings": {"generate_s": round(time.monotonic() - started, 3)},
+    }
+
+    if skip_tests:
+        return candidate
+
+    if reasons:
+        #! still broken after regenerating: fail it without a pytest run
+        candidate["returncode"] = GATE_REJECTED
+        candidate["output"] = "Static checks rejected this candidate:\n" + "\n".join(f"- {r}" for r in reasons)
+        return candidate
+
+    if duplicate:
+        #! still a repeat after regenerating: reuse the earlier verdict instead of re-testing
+        earlier = tried.result(fingerprint) or {}
+        candidate["returncode"] = DUPLICATE
+        candidate["output"] = earlier.get("output", "")
+        return candidate
+
+    #! run tests against an overlay of the repo with the fixed code swapped in (real tree untouched)
+    #! structured digest: compact failure summary for the next prompt + pass/fail counts for the report
+    junit_path = os.path.join(candidate_dir(report.folder, index), "candidate_report.xml")
+    result = validate_candidate(report.code_path, code, report.test_cases, cancel_event, junit_path)
+    candidate["returncode"] = result.returncode
+    candidate["output"] = result.output
+    candidate["test_counts"] = result.test_counts
+    candidate["timings"]["validate_s"] = result.duration_s
+    if tried is not None and fingerprint is not None and candidate["returncode"] is not None:
+        tried.record(fingerprint, {"returncode": candidate["returncode"], "output": candidate["output"]})
+    return candidate
+
+#! a failed candidate becomes the feedback for the next prompt (no extra baseline run)
+def _as_previous_failure(candidate):
+    if candidate is None or candidate.get("returncode") in (None, 0):
+        return None
+    exit_code = candidate["returncode"]
+    if exit_code == GATE_REJECTED:
+        exit_code = "not run (rejected by static checks)"
+    elif exit_code == DUPLICATE:
+        exit_code = "not run (same fix as an earlier candidate)"
+    return {"code": candidate["code"], "exit_code": exit_code, "output": candidate["output"]}
+
+#! races fan_out candidates (varied temperature); first passing one wins, the rest are cancelled
+#! (model calls already in flight are allowed to finish, but their candidates are never tested)
+def _race_candidates(round_index, fan_out, max_temperature, report, previous=None, tried=None):
+    cancel_event = threading.Event()
+    temperatures = fan_out_temperatures(fan_out, max_temperature)
+    finished = []
+    winner = None
+    with ThreadPoolExecutor(max_workers=fan_out, thread_name_prefix="candidate") as pool:
+        futures = [
+            #! each candidate runs in a copy of this context so its metrics spans keep the issue name
+            pool.submit(contextvars.copy_context().run, _run_candidate,
+                        round_index * fan_out + k, t, report, False, cancel_event, previous, tried)
+            for k, t in enumerate(temperatures)
+        ]
+        for fut in as_completed(futures):
+            try:
+                candidate = fut.result()
+            except Exception as e:
+                print(f"{Fore.YELLOW}Candidate failed to generate: {e}{Style.RESET_ALL}")
+                continue
+            if candidate is None or candidate["returncode"] is None:
+                continue
+            finished.append(candidate)
+            if candidate["returncode"] == 0:
+                winner = candidate
+                cancel_event.set()
+                for other in futures:
+                    other.cancel()
+                break
+    return winner, finished
+
+#! takes gemini input, runs tests, delivers correct output
+def tester(num_loops, manual, folder_path, skip_tests, fan_out=1, max_temperature=0.8, report=None): # int num loops, bool manual y/n, file_path dir
+    success = False
+    run_started = time.monotonic()
+
+    #! gemini input: the parsed report from the pipeline, or the extracted .txt files in folder_path
+    if report is None:
+        report = BugReport.from_dir(folder_path)
+    orig_file = report.code_path # relative path from repo root
+
+    #! begin looping the patch iterations (fan_out candidates per iteration)
+    num_runs = 0
+    candidate = None
+    tested = [] # every validated candidate, for the report
+    tried_fixes = TriedCandidates() # AST fingerprints of every fix generated for this issue
+    for i in range(num_loops):
+        if skip_tests or fan_out <= 1:
+            latest = _run_candidate(i, 0.0, report, skip_tests, previous=candidate, tried=tried_fixes)
+            candidate = latest
+            if skip_tests:
+                if manual:
+                    print(f"{Fore.YELLOW} No test cases provided. Running in patch-only mode.{Style.RESET_ALL}")
+                break
+            num_runs += latest["returncode"] not in UNTESTED
+            tested.append(latest)
+            #! if the test suite passes, success -> go to output
+            if latest["returncode"] == 0:
+                success = True
+                break
+        else:
+            winner, finished = _race_candidates(i, fan_out, max_temperature, report, previous=candidate,
+                                                tried=tried_fixes)
+            num_runs += sum(c["returncode"] not in UNTESTED for c in finished)
+            tested.extend(finished)
+            if winner is not None:
+                candidate = winner
+                success = True
+                break
+            if finished:
+                candidate = finished[-1]
+
+    if candidate is None:
+        raise RuntimeError(f"No candidate fix could be generated for {folder_path}")
+
+    start_line = candidate["start_line"]
+    why = candidate["why"]
+    patch_text = candidate["code"]
+    issue_number = report.issue_number
 
     #! output files: success or fail, tested num patches, patch contents, original code, fixed code, and why buggy
     output_path = os.path.basename(folder_path) + ".txt"
-    save_diff(original_code_path, fixed_code, issue_number=int(folder_path.split("issue_")[-1]))
+    #! diff against the snippet without its Markdown fences, so the .diff applies to the repo file
+    original_code = snippet_code(report.code_snippet)
+    diff_path = save_diff(original_code, patch_text, issue_number, file_path=orig_file)
 
-    patch_text = ""
-    with open(fixed_code, "r", encoding="utf-8") as f:
-        patch_text = f.read()
-    patch_text = Path(fixed_code).read_text(encoding="utf-8")
-
-    report = {
+    summary = {
         "original_file": orig_file,                     # just path
-        "fixed_file": fixed_code if Path(fixed_code).exists() else "",
+        "fixed_file": candidate["fixed_file"],
         "status": "Success" if success else ("Skipped tests" if skip_tests else "Fail"),
         "start_line": start_line,
         "why": why,
         "patch": patch_text,
+        "tests": "; ".join(
+            f"#{c['index']} {c['test_counts'].get('passed', 0)}/{c['test_counts'].get('tests', 0)} passed"
+            for c in tested if c["test_counts"]
+        ),
+        "gate_rejections": sum(len(c.get("gate_rejections", [])) for c in tested or [candidate]),
+        "duplicates_avoided": tried_fixes.duplicates,
         "timestamp": datetime.now().isoformat()
     }
 
     with open(output_path, "a", encoding="utf-8") as f:
         f.write("=== REPORT START ===\n")
-        f.write(f"Original: {report['original_file']}\n")
-        f.write(f"Fixed: {report['fixed_file']}\n")
-        f.write(f"Status: {report['status']}\n")
-        f.write(f"Line: {report['start_line']}\n")
-        f.write(f"Why: {report['why']}\n")
+        f.write(f"Original: {summary['original_file']}\n")
+        f.write(f"Fixed: {summary['fixed_file']}\n")
+        f.write(f"Status: {summary['status']}\n")
+        f.write(f"Line: {summary['start_line']}\n")
+        if summary["tests"]:
+            f.write(f"Tests: {summary['tests']}\n")
+        if summary["gate_rejections"]:
+            f.write(f"Static gate: {summary['gate_rejections']} candidate(s) rejected before testing\n")
+        if summary["duplicates_avoided"]:
+            f.write(f"Duplicates: {summary['duplicates_avoided']} repeated fix(es) not re-tested\n")
+        f.write(f"Why: {summary['why']}\n")
         f.write("Patch:\n")
-        f.write(f"{report['patch']}\n")
-        f.write(f"Timestamp: {report['timestamp']}\n")
+        f.write(f"{summary['patch']}\n")
+        f.write(f"Timestamp: {summary['timestamp']}\n")
         f.write("=== REPORT END ===\n\n")
 
+    #! structured record of this run (the dashboard reads these before the text report)
+    append_run_record(record_path(issue_number), {
+        "issue": issue_number,
+        "status": summary["status"],
+        "iterations": i + 1,
+        "patches_tested": num_runs,
+        "start_line": start_line + 1, # 1-based, as proposed by the model
+        "end_line": candidate["end_line"] + 1,
+        "why": why,
+        "original_code": original_code,
+        "patch": patch_text,
+        "candidates": [
+            {
+                "index": c["index"],
+                "temperature": c["temperature"],
+                "returncode": c["returncode"],
+                "test_counts": c["test_counts"],
+                "gate_rejections": c.get("gate_rejections", []),
+                "duplicates": c.get("duplicates", 0),
+                "timings": c.get("timings", {}),
+                "tokens": c.get("tokens", {}),
+                "context_tokens": c.get("context_tokens", {}),
+            }
+            for c in (tested or [candidate])
+        ],
+        "duplicates_avoided": tried_fixes.duplicates,
+        "timings": {"total_s": round(time.monotonic() - run_started, 3)},
+        "tokens": {
+            **{key: sum(c.get("tokens", {}).get(key, 0) for c in (tested or [candidate]))
+               for key in ("model_calls", "cache_hits", "prompt_tokens", "response_tokens")},
+            "context_tokens_saved": sum(c.get("context_tokens", {}).get("tokens_saved", 0)
+                                        for c in (tested or [candidate])),
+        },
+        "paths": {
+            "original_file": orig_file,
+            "report": os.path.join("proposed_fixes", output_path),
+            "diff": diff_path,
+        },
+        "timestamp": summary["timestamp"],
+    })
+
     #! prints to terminal if manual selected
     if manual:
         if success: 
             print(Fore.GREEN + Style.BRIGHT + "Generated fix successful!" + Style.RESET_ALL)
-            print(Fore.YELLOW + f"Tested {num_runs} patches." + Style.RESET_ALL)
+            print(Fore.YELLOW + f"Tested {num_runs} patches ({tried_fixes.duplicates} duplicate(s) avoided)." + Style.RESET_ALL)
             print(Fore.CYAN + Style.BRIGHT + "Suggested patch:" + Style.RESET_ALL)
             width = shutil.get_terminal_size().columns
             print(Fore.CYAN + f"line {start_line}" + "-" * (width - 8) + Style.RESET_ALL + "\n")
@@ -175,6 +428,8 @@ def tester(num_loops, manual, folder_path, skip_tests): # int num loops, bool ma
 
         else: 
             print(Fore.RED + Style.BRIGHT + "All generated fixes failed. :(" + Style.RESET_ALL)
-            print(Fore.YELLOW + f"Tested {num_runs} patches." + Style.RESET_ALL)
+            print(Fore.YELLOW + f"Tested {num_runs} patches ({tried_fixes.duplicates} duplicate(s) avoided)." + Style.RESET_ALL)
+            if summary["tests"]:
+                print(Fore.YELLOW + f"Per-candidate results: {summary['tests']}" + Style.RESET_ALL)
             
     return output_path
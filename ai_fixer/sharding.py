@@ -0,0 +1,281 @@
+# ai_fixer/sharding.py
+import heapq
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# A runner is `run(pytest_args, cancel_event) -> (returncode, output)`, with
+# returncode None when cancelled; run_tests.validate_candidate passes one that
+# runs pytest in the candidate's overlay (warm pool or subprocess).
+Runner = Callable[[List[str], Any], Tuple[int | None, str]]
+
+DEFAULT_TIMINGS = ".pestcontrol/test_timings.json"
+NO_TESTS_COLLECTED = 5  # pytest exit code
+
+_settings: Dict[str, Any] = {
+    "enabled": False,
+    "workers": 0,            # 0 = one shard per CPU core
+    "min_suite_s": 5.0,      # selections that took less than this last time run unsharded
+    "fail_fast": True,
+    "timings_path": DEFAULT_TIMINGS,
+}
+
+
+def configure_sharding(config: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Set sharding options from a config block: {enabled, workers, min_suite_s, fail_fast, timings_path}."""
+    global _timings
+    config = config or {}
+    _settings["enabled"] = bool(config.get("enabled", False))
+    _settings["workers"] = int(config.get("workers", 0) or 0)
+    _settings["min_suite_s"] = float(config.get("min_suite_s", 5.0))
+    _settings["fail_fast"] = bool(config.get("fail_fast", True))
+    _settings["timings_path"] = config.get("timings_path", DEFAULT_TIMINGS)
+    _timings = TestTimings(_settings["timings_path"]) if _settings["enabled"] else None
+    _collected.clear()
+    return dict(_settings)
+
+
+def sharding_settings() -> Dict[str, Any]:
+    return dict(_settings)
+
+
+def shard_workers() -> int:
+    return _settings["workers"] or os.cpu_count() or 1
+
+
+# ----------------------------
+# Timings from previous runs
+# ----------------------------
+
+def selection_key(targets: Sequence[str]) -> str:
+    return "\n".join(sorted(targets))
+
+
+def junit_key(nodeid: str) -> str:
+    """The "classname::name" pytest writes to JUnit XML for a node id (see junit_digest)."""
+    names = nodeid.split("::")
+    names[0] = re.sub(r"\.py$", "", names[0].replace("/", "."))
+    return f"{'.'.join(names[:-1])}::{names[-1]}"
+
+
+def junit_durations(path: str | Path) -> Dict[str, float]:
+    """Seconds per test ("classname::name") in a JUnit XML file; {} if missing or unreadable."""
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return {}
+    durations = {}
+    for case in root.iter("testcase"):
+        try:
+            durations[f"{case.get('classname', '')}::{case.get('name', '')}"] = float(case.get("time") or 0.0)
+        except ValueError:
+            continue
+    return durations
+
+
+class TestTimings:
+    """
+    Per-test durations of earlier runs, per test selection, kept in a JSON
+    file. New measurements are blended into the old ones (half each) so one
+    slow run on a busy machine does not reshape every later plan.
+    """
+    __test__ = False  # not a pytest class, despite the name
+
+    def __init__(self, path: str | Path = DEFAULT_TIMINGS):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] | None = None
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def durations(self, targets: Sequence[str]) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._load().get(selection_key(targets), {}))
+
+    def record(self, targets: Sequence[str], durations: Dict[str, float]) -> None:
+        if not durations:
+            return
+        with self._lock:
+            known = self._load().setdefault(selection_key(targets), {})
+            for test, seconds in durations.items():
+                known[test] = round((known[test] + seconds) / 2 if test in known else seconds, 4)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._data, f)
+            os.replace(tmp, self.path)
+
+
+_timings: TestTimings | None = None
+
+
+def record_timings(targets: Sequence[str], junit_path: str | Path) -> None:
+    """Remember how long each test of this selection took (no-op unless sharding is enabled)."""
+    if _timings is not None:
+        _timings.record(targets, junit_durations(junit_path))
+
+
+# ----------------------------
+# Planning
+# ----------------------------
+
+# (targets, test file stamps) -> node ids; collection is paid once per selection, not per candidate
+_collected: Dict[Tuple[Tuple[str, ...], Tuple[Tuple[str, int, int], ...]], List[str]] = {}
+_collected_lock = threading.Lock()
+
+
+def _stamps(targets: Sequence[str]) -> Tuple[Tuple[str, int, int], ...]:
+    stamps = []
+    for target in targets:
+        path = target.split("::", 1)[0]
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+def collect_node_ids(targets: Sequence[str], run: Runner, rootdir: str) -> List[str]:
+    """Node ids of the tests the targets select ([] if collection fails)."""
+    key = (tuple(targets), _stamps(targets))
+    with _collected_lock:
+        if key in _collected:
+            return _collected[key]
+    returncode, output = run(["--collect-only", "-q", f"--rootdir={rootdir}", "-p", "no:cacheprovider", *targets],
+                             None)
+    if returncode != 0:
+        return []
+    node_ids = [line.strip() for line in output.splitlines() if "::" in line and not line.startswith(" ")]
+    with _collected_lock:
+        _collected[key] = node_ids
+    return node_ids
+
+
+def balance(node_ids: Sequence[str], durations: Dict[str, float], shards: int) -> List[List[str]]:
+    """
+    Split tests into at most `shards` groups of about equal total duration
+    (longest test first onto the least loaded shard). Tests with no timing
+    count as the average known test. Each shard keeps collection order.
+    """
+    known = [durations[junit_key(n)] for n in node_ids if junit_key(n) in durations]
+    default = sum(known) / len(known) if known else 1.0
+    order = {n: k for k, n in enumerate(node_ids)}
+    weighted = sorted(node_ids, key=lambda n: durations.get(junit_key(n), default), reverse=True)
+    loads = [(0.0, k) for k in range(max(1, min(shards, len(node_ids))))]
+    groups: List[List[str]] = [[] for _ in loads]
+    for node_id in weighted:
+        load, k = heapq.heappop(loads)
+        groups[k].append(node_id)
+        heapq.heappush(loads, (load + durations.get(junit_key(node_id), default), k))
+    return [sorted(group, key=order.__getitem__) for group in groups if group]
+
+
+def plan_shards(targets: Sequence[str], run: Runner, rootdir: str) -> List[List[str]]:
+    """
+    Shards for this selection, or [] to run it unsharded: sharding is off,
+    there is no earlier timing, the selection is too quick to be worth the
+    extra processes, or collection failed (e.g. the candidate does not import).
+    """
+    if _timings is None:
+        return []
+    durations = _timings.durations(targets)
+    workers = shard_workers()
+    if workers < 2 or sum(durations.values()) < _settings["min_suite_s"]:
+        return []
+    node_ids = collect_node_ids(targets, run, rootdir)
+    if len(node_ids) < 2:
+        return []
+    return balance(node_ids, durations, workers)
+
+
+# ----------------------------
+# Running
+# ----------------------------
+
+class _EitherEvent:
+    """Looks set once any of the given events is (what the pytest runners poll)."""
+
+    def __init__(self, *events):
+        self.events = [e for e in events if e is not None]
+
+    def is_set(self) -> bool:
+        return any(e.is_set() for e in self.events)
+
+
+def merge_junit(paths: Sequence[str | Path], out_path: str | Path) -> None:
+    """Combine the shards' JUnit files into one <testsuites> document."""
+    root = ET.Element("testsuites")
+    for path in paths:
+        try:
+            shard_root = ET.parse(path).getroot()
+        except (OSError, ET.ParseError):
+            continue
+        root.extend(list(shard_root) if shard_root.tag == "testsuites" else [shard_root])
+    ET.ElementTree(root).write(out_path, encoding="utf-8", xml_declaration=True)
+
+
+def run_shards(shards: List[List[str]], run: Runner, args: List[str], rootdir: str,
+               cancel_event=None, junit_path: str | None = None) -> Tuple[int | None, str]:
+    """
+    Run each shard as its own pytest process, concurrently. With fail_fast the
+    first failing shard cancels the rest (and each shard stops at its first
+    failure). Returns (returncode, output) like a single run: 0 only if every
+    shard that ran tests passed and at least one did, None if cancelled from
+    outside.
+    """
+    fail_fast = _settings["fail_fast"]
+    stop = threading.Event()
+    scratch = tempfile.mkdtemp(prefix="pestcontrol-shards-")
+    results: Dict[int, Tuple[int | None, str]] = {}
+    try:
+        def run_shard(k: int, node_ids: List[str]):
+            shard_args = [*node_ids, *args, f"--rootdir={rootdir}", f"--junitxml={os.path.join(scratch, f'{k}.xml')}"]
+            if fail_fast:
+                shard_args.append("-x")
+            return run(shard_args, _EitherEvent(cancel_event, stop))
+
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard") as pool:
+            futures = {pool.submit(run_shard, k, node_ids): k for k, node_ids in enumerate(shards)}
+            for fut in as_completed(futures):
+                k = futures[fut]
+                results[k] = fut.result()
+                if fail_fast and results[k][0] not in (0, None, NO_TESTS_COLLECTED):
+                    stop.set()
+
+        if cancel_event is not None and cancel_event.is_set():
+            return None, ""
+        finished = sorted(k for k, (code, _) in results.items() if code is not None)
+        if junit_path:
+            merge_junit([os.path.join(scratch, f"{k}.xml") for k in finished], junit_path)
+        # a shard that collected nothing is fine as long as another one ran tests;
+        # if none did, the run fails like an unsharded run that found no tests
+        ran = [results[k][0] for k in finished if results[k][0] != NO_TESTS_COLLECTED]
+        failed = [code for code in ran if code != 0]
+        if failed:
+            returncode = failed[0]
+        elif ran:
+            returncode = 0
+        else:
+            returncode = NO_TESTS_COLLECTED if finished else None
+        output = "\n".join(f"===== shard {k + 1}/{len(shards)} ({len(shards[k])} tests) =====\n{results[k][1]}"
+                           for k in finished)
+        cancelled = len(shards) - len(finished)
+        if cancelled:
+            output += f"\nStopped at the first failure: {cancelled} other shard(s) cancelled.\n"
+        return returncode, output
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,44 @@
+# ai_fixer/stages.py
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+
+# Pipeline stages, in the order an issue moves through them.
+STAGES = ("extract", "baseline", "model", "validate", "report")
+
+_lock = threading.Lock()
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def configure_stage_limits(limits: Dict[str, int] | None) -> None:
+    """
+    Set the maximum number of concurrent workers allowed inside each stage.
+
+    Stages that are not listed (or have a limit <= 0) run unbounded.
+    Calling this again replaces the previous limits.
+    """
+    unknown = set(limits or {}) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stage(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _semaphores.clear()
+        for name, limit in (limits or {}).items():
+            if limit and int(limit) > 0:
+                _semaphores[name] = threading.BoundedSemaphore(int(limit))
+
+
+@contextmanager
+def stage(name: str):
+    """Hold a slot in the named stage for the duration of the block."""
+    with _lock:
+        sem = _semaphores.get(name)
+    if sem is None:
+        yield
+        return
+    sem.acquire()
+    try:
+        yield
+    finally:
+        sem.release()
+
@@ -0,0 +1,210 @@
+# ai_fixer/static_gate.py
+import ast
+import builtins
+import difflib
+import re
+from typing import Any, Dict, Iterable, List, Set
+
+BUILTIN_NAMES = set(dir(builtins)) | {"__file__", "__name__", "__doc__", "__spec__", "__package__",
+                                      "__loader__", "__path__", "__builtins__", "__annotations__"}
+
+# whole-line comments models leave where they elided part of the file, e.g.
+# "# ... rest of the file ...", "# (unchanged)", "# existing code here"; the
+# comment must be nothing but the elision, so "# keep existing code path" passes
+PLACEHOLDER_RE = re.compile(
+    r"^\s*#[\s.…]*\(?\s*(?:"
+    r"\.\.\.|…"
+    r"|(?:the )?rest of (?:the )?(?:file|code|module|class|function|implementation)"
+    r"(?: (?:remains|stays|is) (?:the same|unchanged))?"
+    r"|remaining (?:code|functions|methods)(?: unchanged)?"
+    r"|(?:code |everything else |other functions )?unchanged"
+    r"|(?:code )?omitted for brevity"
+    r"|same as (?:before|original|above)"
+    r"|(?:existing|previous|original|other) code(?: here| goes here| unchanged| remains(?: the same| unchanged)?)?"
+    r")\s*\)?[\s.…:-]*$",
+    re.I,
+)
+
+_settings: Dict[str, Any] = {"enabled": True, "max_regenerations": 2}
+
+
+def configure_static_gate(config: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Set the gate options from a config block: {enabled, max_regenerations}."""
+    config = config or {}
+    _settings["enabled"] = bool(config.get("enabled", True))
+    _settings["max_regenerations"] = int(config.get("max_regenerations", 2))
+    return dict(_settings)
+
+
+def gate_settings() -> Dict[str, Any]:
+    return dict(_settings)
+
+
+def _parse(source: str) -> ast.Module | None:
+    try:
+        return ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def unresolved_names(tree: ast.Module) -> Set[str]:
+    """
+    Names that are read but never bound anywhere in the module (nor builtins).
+
+    Scopes are flattened, so this only catches names that cannot resolve at
+    all, e.g. a typo or a helper the model forgot to define or import.
+    A star import disables the check.
+    """
+    bound: Set[str] = set(BUILTIN_NAMES)
+    loaded: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.alias):
+            if node.name == "*":
+                return set()
+            bound.add(node.asname or node.name.split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            bound.add(node.rest)
+    return loaded - bound
+
+
+def top_level_definitions(tree: ast.Module) -> Dict[str, ast.AST]:
+    """Top-level functions, classes and simply-assigned names, in source order."""
+    defs: Dict[str, ast.AST] = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defs[node.name] = node
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    defs[target.id] = node
+    return defs
+
+
+def imported_by_tests(test_sources: Iterable[str]) -> Set[str]:
+    """Names the tests import (`from m import f`) or reach through a module (`m.f`)."""
+    names: Set[str] = set()
+    for src in test_sources:
+        tree = _parse(src or "")
+        if tree is None:
+            continue
+        modules: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom):
+                names.update(a.name for a in node.names if a.name != "*")
+            elif isinstance(node, ast.Import):
+                modules.update((a.asname or a.name).split(".")[0] for a in node.names)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in modules:
+                names.add(node.attr)
+    return names
+
+
+def signature(node: ast.AST) -> str:
+    """Parameter names and kinds of a function (defaults and annotations ignored)."""
+    a = node.args
+    parts = [p.arg for p in a.posonlyargs] + (["/"] if a.posonlyargs else [])
+    parts += [p.arg for p in a.args]
+    if a.vararg:
+        parts.append("*" + a.vararg.arg)
+    elif a.kwonlyargs:
+        parts.append("*")
+    parts += [p.arg for p in a.kwonlyargs]
+    if a.kwarg:
+        parts.append("**" + a.kwarg.arg)
+    return f"({', '.join(parts)})"
+
+
+def check_candidate(code: str, original: str = "", test_sources: Iterable[str] = ()) -> List[str]:
+    """
+    Cheap in-process checks on a candidate file before it is worth a pytest run.
+
+    Returns a list of human-readable rejection reasons (empty = passes):
+      - the code must parse and compile,
+      - it must not read names that are bound nowhere (beyond what the
+        original already failed to resolve),
+      - functions/classes the tests import must still exist, with unchanged
+        parameters when they are functions,
+      - it must not look truncated (placeholder comments, or the tail of the
+        original's definitions missing).
+    """
+    if not isinstance(code, str) or not code.strip():
+        return ["candidate is empty"]
+    try:
+        tree = ast.parse(code)
+        compile(tree, "<candidate>", "exec")
+    except (SyntaxError, ValueError) as e:
+        where = f" (line {e.lineno})" if getattr(e, "lineno", None) else ""
+        return [f"does not compile: {type(e).__name__}: {getattr(e, 'msg', e)}{where}"]
+
+    reasons: List[str] = []
+    original_tree = _parse(original or "")
+
+    missing = unresolved_names(tree)
+    if original_tree is not None:
+        missing -= unresolved_names(original_tree)
+    if missing:
+        reasons.append(f"unresolved name(s): {', '.join(sorted(missing))}")
+
+    if original_tree is not None:
+        old_defs = top_level_definitions(original_tree)
+        new_defs = top_level_definitions(tree)
+        for name in sorted(imported_by_tests(test_sources) & set(old_defs)):
+            old, new = old_defs[name], new_defs.get(name)
+            if new is None:
+                reasons.append(f"'{name}' is imported by the tests but no longer defined")
+            elif isinstance(old, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if not isinstance(new, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    reasons.append(f"'{name}' is imported by the tests but is no longer a function")
+                elif signature(old) != signature(new):
+                    reasons.append(f"signature of '{name}' changed: {signature(old)} -> {signature(new)}")
+
+        # truncation cuts the end of the file: the last definitions go missing
+        order = [n for n in old_defs if not isinstance(old_defs[n], (ast.Assign, ast.AnnAssign))]
+        tail = []
+        for name in reversed(order):
+            if name in new_defs:
+                break
+            tail.append(name)
+        if tail and len(code.splitlines()) < len((original or "").splitlines()):
+            reasons.append(f"looks truncated: missing trailing definition(s) {', '.join(reversed(tail))}")
+
+    placeholder = elided_region(code, original)
+    if placeholder:
+        reasons.append(f"looks truncated: placeholder comment {placeholder!r}")
+    return reasons
+
+
+def elided_region(code: str, original: str) -> str | None:
+    """
+    The first placeholder line (a PLACEHOLDER_RE comment or a bare `...`)
+    that stands where code of the original disappeared, or None. A placeholder the
+    original already had, or one added next to code that is still there, is
+    an ordinary comment.
+    """
+    if not original:
+        return None
+    old = [line.strip() for line in original.splitlines()]
+    new = [line.strip() for line in code.splitlines()]
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "replace":
+            continue
+        lost_code = any(line and not line.startswith("#") for line in old[i1:i2])
+        if not lost_code:
+            continue
+        for line in new[j1:j2]:
+            if PLACEHOLDER_RE.match(line) or (line == "..." and "..." not in old[i1:i2]):
+                return line
+    return None
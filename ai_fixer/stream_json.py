@@ -0,0 +1,144 @@
+# ai_fixer/stream_json.py
+import json
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class StreamSchemaError(ValueError):
+    """The streamed response is malformed or does not match the expected schema."""
+
+
+class StreamingJSONObject:
+    """
+    Incremental parser for a single top-level JSON object arriving in chunks.
+
+    Only the top level is tracked: each key is checked against `allowed_keys`
+    as soon as its name is complete, and each value is decoded (and passed to
+    `on_value(key, value)`) as soon as its last character arrives, so a bad
+    response is rejected before the rest of it has streamed. Text before the
+    opening brace (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self,
+                 allowed_keys: Iterable[str],
+                 required_keys: Iterable[str] = (),
+                 on_value: Callable[[str, Any], None] | None = None,
+                 max_preamble: int = 64):
+        self.allowed_keys = set(allowed_keys)
+        self.required_keys = list(required_keys)
+        self.on_value = on_value
+        self.max_preamble = max_preamble
+        self.data: Dict[str, Any] = {}
+        self.done = False
+
+        self._buf: List[str] = []       # current key or value text
+        self._state = "preamble"        # preamble, key_wait, key, colon, value, after_value
+        self._depth = 0                 # nesting inside the current value
+        self._in_string = False
+        self._escape = False
+        self._key = ""
+        self._skipped = 0
+
+    def feed(self, chunk: str) -> None:
+        for ch in chunk or "":
+            if self.done:
+                return
+            self._step(ch)
+
+    def close(self) -> Dict[str, Any]:
+        """Return the parsed object; raises StreamSchemaError if it is incomplete."""
+        if not self.done:
+            raise StreamSchemaError(f"response ended inside the JSON object (state: {self._state})")
+        return self.data
+
+    # ---- state machine ----
+
+    def _step(self, ch: str) -> None:
+        state = self._state
+        if state == "preamble":
+            if ch == "{":
+                self._state = "key_wait"
+            else:
+                self._skipped += 1
+                if self._skipped > self.max_preamble:
+                    raise StreamSchemaError("response does not start with a JSON object")
+        elif state == "key_wait":
+            if ch == '"':
+                self._state, self._buf = "key", ['"']
+            elif ch == "}":
+                self._finish()
+            elif not ch.isspace() and ch != ",":
+                raise StreamSchemaError(f"expected a key, got {ch!r}")
+        elif state == "key":
+            self._buf.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._key = json.loads("".join(self._buf))
+                if self._key not in self.allowed_keys:
+                    raise StreamSchemaError(f"unexpected key {self._key!r}")
+                self._state = "colon"
+        elif state == "colon":
+            if ch == ":":
+                self._state, self._buf = "value", []
+            elif not ch.isspace():
+                raise StreamSchemaError(f"expected ':' after {self._key!r}, got {ch!r}")
+        elif state == "value":
+            self._value_char(ch)
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "key_wait"
+            elif ch == "}":
+                self._finish()
+            elif not ch.isspace():
+                raise StreamSchemaError(f"expected ',' or '}}' after {self._key!r}, got {ch!r}")
+
+    def _value_char(self, ch: str) -> None:
+        if not self._buf and ch.isspace():
+            return
+        if self._in_string:
+            self._buf.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._emit()
+            return
+        if self._depth == 0 and self._buf and ch in ",}":
+            # end of a scalar (number / true / false / null)
+            self._emit()
+            self._step(ch)
+            return
+        self._buf.append(ch)
+        if ch == '"':
+            self._in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}":
+            self._depth -= 1
+            if self._depth == 0:
+                self._emit()
+            elif self._depth < 0:
+                raise StreamSchemaError(f"unbalanced brackets in {self._key!r}")
+
+    def _emit(self) -> None:
+        text = "".join(self._buf)
+        try:
+            value = json.loads(text)
+        except ValueError as e:
+            raise StreamSchemaError(f"value of {self._key!r} is not valid JSON: {e}") from e
+        self.data[self._key] = value
+        self._buf = []
+        self._state = "after_value"
+        if self.on_value is not None:
+            self.on_value(self._key, value)
+
+    def _finish(self) -> None:
+        missing = [k for k in self.required_keys if k not in self.data]
+        if missing:
+            raise StreamSchemaError(f"JSON missing required key(s): {', '.join(missing)}")
+        self.done = True
@@ -0,0 +1,128 @@
+# ai_fixer/watcher.py
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class PollingWatcher:
+    """Portable fallback: rescans the directory and reports new or modified files."""
+
+    def __init__(self, directory: str | Path, suffix: str = ".json", interval: float = 1.0):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self.interval = interval
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._next_scan = 0.0
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix) and entry.is_file():
+                        st = entry.stat()
+                        found[entry.path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return found
+
+    def poll(self, timeout: float) -> List[str]:
+        """Paths created or changed since the last call; waits up to timeout for the next scan."""
+        delay = self._next_scan - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+            if time.monotonic() < self._next_scan:
+                return []
+        self._next_scan = time.monotonic() + self.interval
+        current = self._scan()
+        changed = [path for path, stamp in current.items() if self._seen.get(path) != stamp]
+        self._seen = current
+        return sorted(changed)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watch on one directory, via ctypes (no extra dependency).
+
+    Reports files once they are fully written (IN_CLOSE_WRITE) or renamed into
+    the directory (IN_MOVED_TO, e.g. an atomic save). If the kernel event
+    queue overflows, the whole directory is reported so nothing is missed.
+    """
+
+    def __init__(self, directory: str | Path, suffix: str = ".json"):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f"inotify_add_watch failed for {self.directory}")
+
+    def _rescan(self) -> List[str]:
+        return sorted(str(p) for p in self.directory.glob(f"*{self.suffix}"))
+
+    def poll(self, timeout: float) -> List[str]:
+        """Paths written or moved into the directory, waiting up to timeout for the first event."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return []
+            raise
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return self._rescan()
+            if name.endswith(self.suffix):
+                path = str(self.directory / name)
+                if path not in paths:
+                    paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def watch_directory(directory: str | Path, suffix: str = ".json", poll_interval: float = 1.0):
+    """An inotify watcher on Linux, or a polling one when inotify is unavailable."""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory, suffix)
+        except (OSError, AttributeError) as e:  # AttributeError: libc without inotify symbols
+            print(f"⚠️ inotify unavailable ({e}); polling {directory} every {poll_interval}s")
+    return PollingWatcher(directory, suffix, poll_interval)
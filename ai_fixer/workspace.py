@@ -0,0 +1,92 @@
+# ai_fixer/workspace.py
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Union
+
+
+# Never mirrored into an overlay: VCS metadata, caches and our own scratch output.
+SKIP_NAMES = {".git", "__pycache__", ".pytest_cache", "extracted_reports"}
+
+
+def candidate_dir(issue_dir: Union[str, Path], index: int) -> Path:
+    """Return (and create) the scratch directory for one candidate of an issue."""
+    path = Path(issue_dir) / f"candidate_{index}"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _mirror(root: Path, src_dir: Path, dst_dir: Path, replacements: Dict[Path, str]) -> None:
+    """
+    Populate dst_dir with symlinks to src_dir's entries.
+
+    Directories that contain a replaced file are created for real (and mirrored
+    recursively) so the patched file can sit next to symlinks of its siblings.
+    """
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    for entry in os.scandir(src_dir):
+        if entry.name in SKIP_NAMES:
+            continue
+        rel = Path(entry.path).relative_to(root)
+        target = dst_dir / entry.name
+        if rel in replacements:
+            continue
+        if entry.is_dir(follow_symlinks=True) and any(rel in r.parents for r in replacements):
+            _mirror(root, Path(entry.path), target, replacements)
+        else:
+            os.symlink(os.path.abspath(entry.path), target)
+
+
+def build_overlay(dest: Union[str, Path],
+                  replacements: Dict[str, str],
+                  repo_root: Union[str, Path] = ".") -> Path:
+    """
+    Build a symlinked overlay of repo_root at dest with some files swapped out.
+
+    Only the directories on the path to a replaced file are materialized; every
+    other file and directory is a symlink back into the real checkout, so the
+    cost does not grow with the size of the tree.
+
+    Args:
+        dest (str | Path): Empty (or missing) directory to build the overlay in
+        replacements (dict): repo-relative path -> file contents to put there
+        repo_root (str | Path): Checkout to mirror
+
+    Returns:
+        Path: dest, ready to be used as a working directory for pytest
+    """
+    root = Path(repo_root).resolve()
+    dest = Path(dest)
+    normalized = {Path(os.path.normpath(p)): content for p, content in replacements.items()}
+    for rel in normalized:
+        if rel.is_absolute() or rel.parts[:1] == ("..",):
+            raise ValueError(f"Replacement path must be inside the repo: {rel}")
+
+    _mirror(root, root, dest, normalized)
+
+    for rel, content in normalized.items():
+        path = dest / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return dest
+
+
+@contextmanager
+def overlay_workspace(replacements: Dict[str, str],
+                      repo_root: Union[str, Path] = ".",
+                      prefix: str = "pestcontrol-"):
+    """Yield a throwaway overlay of the repo with `replacements` applied."""
+    tmp = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield build_overlay(tmp, replacements, repo_root=repo_root)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def isolated_env() -> Dict[str, str]:
+    """Environment for subprocesses run inside an overlay (no writes through symlinks)."""
+    env = dict(os.environ)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
@@ -0,0 +1,316 @@
+# benchmarks/corpus.py
+"""
+Synthetic bug corpus for the benchmark suite.
+
+Every case is a tiny module with one known bug, a pytest file that exposes it,
+and a GitHub-issue JSON in the same shape as `bug_reports/issue_59.json`. The
+known fix (and a plausible wrong fix) are kept so the fake model can answer.
+"""
+import json
+import textwrap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+CASES_DIR = "bench_cases"
+FIRST_ISSUE_NUMBER = 10_000
+
+
+@dataclass
+class BugTemplate:
+    name: str
+    description: str
+    buggy: str
+    fixed: str
+    wrong: str  # plausible but still failing fix
+    tests: str
+
+
+@dataclass
+class BenchCase:
+    case_id: str
+    issue_number: int
+    module_path: str  # repo-relative
+    test_path: str
+    buggy: str
+    fixed: str
+    wrong: str
+
+
+TEMPLATES: List[BugTemplate] = [
+    BugTemplate(
+        name="median",
+        description="median() returns the upper middle element for even-length lists instead of the average.",
+        buggy='''
+            def median(nums):
+                if not nums:
+                    raise ValueError("nums must be non-empty")
+                s = sorted(nums)
+                mid = len(s) // 2
+                return s[mid]
+        ''',
+        fixed='''
+            def median(nums):
+                if not nums:
+                    raise ValueError("nums must be non-empty")
+                s = sorted(nums)
+                mid = len(s) // 2
+                if len(s) % 2 == 0:
+                    return (s[mid - 1] + s[mid]) / 2
+                return s[mid]
+        ''',
+        wrong='''
+            def median(nums):
+                if not nums:
+                    raise ValueError("nums must be non-empty")
+                s = sorted(nums)
+                mid = len(s) // 2
+                return s[mid - 1]
+        ''',
+        tests='''
+            import pytest
+
+            def test_odd():
+                assert median([3, 1, 2]) == 2
+
+            def test_even():
+                assert median([1, 3, 2, 4]) == 2.5
+
+            def test_empty():
+                with pytest.raises(ValueError):
+                    median([])
+        ''',
+    ),
+    BugTemplate(
+        name="clamp",
+        description="clamp() returns the wrong bound when the value is out of range.",
+        buggy='''
+            def clamp(value, low, high):
+                if value < low:
+                    return high
+                if value > high:
+                    return low
+                return value
+        ''',
+        fixed='''
+            def clamp(value, low, high):
+                if value < low:
+                    return low
+                if value > high:
+                    return high
+                return value
+        ''',
+        wrong='''
+            def clamp(value, low, high):
+                return max(low, value)
+        ''',
+        tests='''
+            def test_inside():
+                assert clamp(5, 0, 10) == 5
+
+            def test_below():
+                assert clamp(-3, 0, 10) == 0
+
+            def test_above():
+                assert clamp(42, 0, 10) == 10
+        ''',
+    ),
+    BugTemplate(
+        name="running_total",
+        description="running_total() skips the last element of the list.",
+        buggy='''
+            def running_total(nums):
+                out = []
+                total = 0
+                for i in range(len(nums) - 1):
+                    total += nums[i]
+                    out.append(total)
+                return out
+        ''',
+        fixed='''
+            def running_total(nums):
+                out = []
+                total = 0
+                for n in nums:
+                    total += n
+                    out.append(total)
+                return out
+        ''',
+        wrong='''
+            def running_total(nums):
+                out = []
+                total = 0
+                for i in range(1, len(nums)):
+                    total += nums[i]
+                    out.append(total)
+                return out
+        ''',
+        tests='''
+            def test_empty():
+                assert running_total([]) == []
+
+            def test_values():
+                assert running_total([1, 2, 3]) == [1, 3, 6]
+
+            def test_single():
+                assert running_total([7]) == [7]
+        ''',
+    ),
+    BugTemplate(
+        name="is_palindrome",
+        description="is_palindrome() is case-sensitive and does not ignore spaces.",
+        buggy='''
+            def is_palindrome(text):
+                return text == text[::-1]
+        ''',
+        fixed='''
+            def is_palindrome(text):
+                cleaned = "".join(ch.lower() for ch in text if not ch.isspace())
+                return cleaned == cleaned[::-1]
+        ''',
+        wrong='''
+            def is_palindrome(text):
+                cleaned = text.lower()
+                return cleaned == cleaned[::-1]
+        ''',
+        tests='''
+            def test_simple():
+                assert is_palindrome("level")
+
+            def test_case():
+                assert is_palindrome("Level")
+
+            def test_spaces():
+                assert is_palindrome("Never odd or even")
+
+            def test_not():
+                assert not is_palindrome("pest control")
+        ''',
+    ),
+    BugTemplate(
+        name="chunk",
+        description="chunk() drops the final partial chunk.",
+        buggy='''
+            def chunk(items, size):
+                if size <= 0:
+                    raise ValueError("size must be positive")
+                return [items[i:i + size] for i in range(0, len(items) - size + 1, size)]
+        ''',
+        fixed='''
+            def chunk(items, size):
+                if size <= 0:
+                    raise ValueError("size must be positive")
+                return [items[i:i + size] for i in range(0, len(items), size)]
+        ''',
+        wrong='''
+            def chunk(items, size):
+                return [items[i:i + size] for i in range(0, len(items), size)]
+        ''',
+        tests='''
+            import pytest
+
+            def test_even_split():
+                assert chunk([1, 2, 3, 4], 2) == [[1, 2], [3, 4]]
+
+            def test_partial():
+                assert chunk([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+            def test_bad_size():
+                with pytest.raises(ValueError):
+                    chunk([1], 0)
+        ''',
+    ),
+    BugTemplate(
+        name="word_count",
+        description="word_count() counts 'The' and 'the' as different words.",
+        buggy='''
+            def word_count(text):
+                counts = {}
+                for word in text.split():
+                    counts[word] = counts.get(word, 0) + 1
+                return counts
+        ''',
+        fixed='''
+            def word_count(text):
+                counts = {}
+                for word in text.lower().split():
+                    counts[word] = counts.get(word, 0) + 1
+                return counts
+        ''',
+        wrong='''
+            def word_count(text):
+                counts = {}
+                for word in text.lower().split(" "):
+                    counts[word] = counts.get(word, 0) + 1
+                return counts
+        ''',
+        tests='''
+            def test_case_insensitive():
+                assert word_count("The cat the hat") == {"the": 2, "cat": 1, "hat": 1}
+
+            def test_whitespace():
+                assert word_count("a  b\\nb") == {"a": 1, "b": 2}
+        ''',
+    ),
+]
+
+
+def _code(template_text: str, case_id: str) -> str:
+    # the module docstring tags the case so the fake model can tell cases apart
+    return f'"""{case_id}"""\n' + textwrap.dedent(template_text).strip("\n") + "\n"
+
+
+def issue_json(case: BenchCase, description: str) -> Dict:
+    body = (
+        "### Is there an existing issue for this?\n\n- [x] I have searched the existing issues\n\n"
+        f"### Description of the bug\n\n{description}\n\n"
+        f"### Test cases\n\n{case.test_path}\n\n"
+        f"### Code with error\n\n```{case.buggy}```\n\n"
+        f"### Code with error path\n\n{case.module_path}\n\n"
+        f"### Context Files\n\n{case.module_path}\n\n"
+        "### Use AI-Powered fix\n\n- [x] Use AI powered fix"
+    )
+    return {
+        "number": case.issue_number,
+        "title": f"[Bug]: {case.case_id}",
+        "state": "open",
+        "labels": [{"name": "bug"}],
+        "body": body,
+    }
+
+
+def generate_corpus(root: str | Path, count: int, reports_dir: str = "bug_reports") -> List[BenchCase]:
+    """
+    Write `count` cases (cycling through TEMPLATES) under root/bench_cases and
+    their issue JSON under root/reports_dir. Returns the cases, fixes included.
+    """
+    root = Path(root)
+    cases_root = root / CASES_DIR
+    cases_root.mkdir(parents=True, exist_ok=True)
+    (cases_root / "__init__.py").write_text("", encoding="utf-8")
+    (root / reports_dir).mkdir(parents=True, exist_ok=True)
+
+    cases = []
+    for k in range(count):
+        template = TEMPLATES[k % len(TEMPLATES)]
+        case_id = f"bench_case_{k:04d}"
+        pkg = cases_root / case_id
+        pkg.mkdir(exist_ok=True)
+        (pkg / "__init__.py").write_text("", encoding="utf-8")
+        case = BenchCase(
+            case_id=case_id,
+            issue_number=FIRST_ISSUE_NUMBER + k,
+            module_path=f"{CASES_DIR}/{case_id}/{template.name}.py",
+            test_path=f"{CASES_DIR}/{case_id}/test_{template.name}.py",
+            buggy=_code(template.buggy, case_id),
+            fixed=_code(template.fixed, case_id),
+            wrong=_code(template.wrong, case_id),
+        )
+        (root / case.module_path).write_text(case.buggy, encoding="utf-8")
+        tests = f"from {CASES_DIR}.{case_id}.{template.name} import {template.name}\n\n" \
+                + textwrap.dedent(template.tests).strip("\n") + "\n"
+        (root / case.test_path).write_text(tests, encoding="utf-8")
+        report = root / reports_dir / f"issue_{case.issue_number}.json"
+        report.write_text(json.dumps(issue_json(case, template.description), indent=2), encoding="utf-8")
+        cases.append(case)
+    return cases
@@ -0,0 +1,127 @@
+# benchmarks/fake_model.py
+"""
+Deterministic local stand-in for a Gemini model.
+
+Answers the pipeline's prompts from the corpus' known fixes, in whichever
+response format the prompt asks for, after a configurable simulated latency.
+A seeded fraction of answers are deliberately wrong so retries, dedupe and
+the static gate are exercised. No network access is needed.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterable, List
+
+from benchmarks.corpus import BenchCase
+
+CASE_RE = re.compile(r"bench_case_\d+")
+
+
+def _response(text: str, prompt_tokens: int | None = None, output_tokens: int | None = None) -> SimpleNamespace:
+    usage = None
+    if prompt_tokens is not None:
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class FakeModel:
+    """Implements the `generate_content` subset the pipeline uses (plain and streamed)."""
+
+    def __init__(self, backend: "FakeBackend", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, generation_config: Dict | None = None, stream: bool = False, **kwargs):
+        backend = self.backend
+        rng = random.Random(backend.draw_seed(prompt, generation_config))
+        latency = max(0.0, backend.latency_s + rng.uniform(-backend.jitter_s, backend.jitter_s))
+        wrong = rng.random() < backend.wrong_rate
+        text = backend.answer(prompt, wrong)
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        backend.count_call(prompt_tokens, output_tokens, wrong)
+        if not stream:
+            time.sleep(latency)
+            return _response(text, prompt_tokens, output_tokens)
+        return self._stream(text, latency, prompt_tokens, output_tokens)
+
+    def _stream(self, text: str, latency: float, prompt_tokens: int, output_tokens: int) -> Iterable[SimpleNamespace]:
+        # a third of the latency before the first chunk, the rest spread over the chunks
+        chunks = [text[i:i + self.backend.chunk_chars] for i in range(0, len(text), self.backend.chunk_chars)] or [""]
+        time.sleep(latency / 3)
+        per_chunk = (latency - latency / 3) / len(chunks)
+        for k, chunk in enumerate(chunks):
+            last = k == len(chunks) - 1
+            yield _response(chunk, prompt_tokens if last else None, output_tokens if last else None)
+            time.sleep(per_chunk)
+
+
+class FakeBackend:
+    """
+    Model factory for `ai_fixer.model_gateway.set_model_backend`.
+
+    Args:
+        cases: Corpus cases, used to look up the fix for a prompt
+        wrong_rate: Probability that an answer is a plausible but wrong fix
+        latency_s / jitter_s: Simulated model latency (uniform +- jitter)
+        seed: Makes the wrong/right draws and latencies reproducible
+    """
+
+    def __init__(self, cases: List[BenchCase], wrong_rate: float = 0.3, latency_s: float = 0.5,
+                 jitter_s: float = 0.1, seed: int = 0, chunk_chars: int = 80):
+        self.cases = {c.case_id: c for c in cases}
+        self.wrong_rate = wrong_rate
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.seed = seed
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.wrong_answers = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name: str) -> FakeModel:
+        return FakeModel(self, model_name)
+
+    def draw_seed(self, prompt: str, generation_config: Dict | None) -> int:
+        # same prompt + config -> same draw, whatever order the threads run in
+        key = f"{self.seed}\0{json.dumps(generation_config or {}, sort_keys=True)}\0{prompt}"
+        return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+
+    def count_call(self, prompt_tokens: int, output_tokens: int, wrong: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.wrong_answers += wrong
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+
+    def answer(self, prompt: str, wrong: bool) -> str:
+        snippet = prompt.split("[BUGGY_CODE_SNIPPET]", 1)[-1].split("[/BUGGY_CODE_SNIPPET]", 1)[0]
+        match = CASE_RE.search(snippet)
+        case = self.cases.get(match.group(0)) if match else None
+        if case is None:
+            return json.dumps({"ExplanationOfFix": "Unknown case; no fix available."})
+        code = case.wrong if wrong else case.fixed
+        explanation = "Plausible guess." if wrong else "Corrected the logic so the tests pass."
+        if '"SuggestedFixedCode"' in prompt:
+            n = len(case.buggy.splitlines())
+            return json.dumps({
+                "SuggestedFixedCode": code,
+                "ExplanationOfFix": explanation,
+                "LineNumberRangesToEdit": [{"start": 1, "end": n, "reason": "fix"}],
+            })
+        original = case.buggy.strip("\n")
+        return json.dumps({
+            "Edits": [{
+                "start": 1,
+                "end": len(original.splitlines()),
+                "original": original,
+                "replacement": code.strip("\n"),
+                "reason": "fix",
+            }],
+            "ExplanationOfFix": explanation,
+        })
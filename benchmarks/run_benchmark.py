@@ -0,0 +1,206 @@
+# benchmarks/run_benchmark.py
+"""
+End-to-end pipeline benchmark against a local fake model (no network, no API key).
+
+    python -m benchmarks.run_benchmark --issues 30 --out bench.json
+    python -m benchmarks.run_benchmark --baseline benchmarks/baseline.json   # fails on counter regressions
+
+A synthetic corpus is generated in a scratch directory and drained through the
+real pipeline (extraction, baseline pytest, prompt building, response parsing,
+static gate, dedupe, candidate test runs, reports); only the model is faked.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from ai_fixer.metrics import load_spans, peak_rss_mb, percentile, summarize
+from ai_fixer.model_gateway import set_model_backend
+from ai_fixer.run_records import load_run_records, record_path
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_model import FakeBackend
+from pipeline_runner import configure_pipeline, drain_bug_reports
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# baseline comparison: metric -> True if higher is better.
+# The fake model is seeded per prompt, so these counters repeat exactly from
+# run to run; a change in them is a real change in pipeline behaviour.
+GATED_METRICS = {
+    "solved": True,
+    "test_runs_per_issue": False,
+    "model_calls_per_issue": False,
+    "cache_hits_per_issue": True,
+}
+# Wall-clock and memory numbers swing by tens of percent between runs on a
+# shared machine (p95 latency +41% on an idle one), so they are only reported.
+ADVISORY_METRICS = {
+    "issue_latency_p50_s": False,
+    "issue_latency_p95_s": False,
+    "issues_per_hour": True,
+    "peak_rss_mb": False,
+}
+
+
+def children_peak_rss_mb() -> float | None:
+    """Largest peak RSS among finished child processes (pytest runs, pool workers)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def bench_config(args) -> Dict[str, Any]:
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f) or {}
+    config["mode"] = "auto"
+    # the fake model has no quota, so the gateway should not be what we measure
+    config["model_gateway"] = {**(config.get("model_gateway") or {}), "requests_per_minute": 60_000, "burst": 1000}
+    config["metrics"] = {"enabled": True, "path": ".pestcontrol/metrics.jsonl"}
+    if args.workers:
+        config["scheduler"] = {**(config.get("scheduler") or {}), "workers": args.workers}
+    return config
+
+
+def run(args) -> Dict[str, Any]:
+    config = bench_config(args)
+    workdir = Path(tempfile.mkdtemp(prefix="pestcontrol-bench-"))
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)  # the pipeline writes everything relative to the working directory
+        cases = generate_corpus(workdir, args.issues)
+        backend = FakeBackend(cases, wrong_rate=args.wrong_rate, latency_s=args.latency,
+                              jitter_s=args.jitter, seed=args.seed)
+        configure_pipeline(config)
+        set_model_backend(backend)  # after configure_pipeline, which installs the configured backend
+
+        reports = [f"bug_reports/issue_{c.issue_number}.json" for c in cases]
+        started = time.perf_counter()
+        drained = drain_bug_reports(reports, config)
+        elapsed = time.perf_counter() - started
+
+        spans = load_spans(config["metrics"]["path"], limit=None)
+        records = [r for c in cases for r in load_run_records(record_path(c.issue_number))]
+        return summarize_run(args, cases, drained, elapsed, spans, records, backend)
+    finally:
+        set_model_backend(None)
+        os.chdir(cwd)
+        if args.keep:
+            print(f"📁 Benchmark workspace kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def summarize_run(args, cases, drained, elapsed, spans, records, backend) -> Dict[str, Any]:
+    latencies = [s["wall_s"] for s in spans if s.get("span") == "process_bug_report"]
+    n = max(1, len(cases))
+    return {
+        "settings": {
+            "issues": len(cases),
+            "wrong_rate": args.wrong_rate,
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+            "seed": args.seed,
+        },
+        "finished": drained["finished"],
+        "failed": drained["failed"],
+        "solved": sum(1 for r in records if str(r.get("status", "")).lower() == "success"),
+        "elapsed_s": round(elapsed, 3),
+        "issues_per_hour": round(len(cases) / elapsed * 3600, 1) if elapsed > 0 else 0.0,
+        "issue_latency_p50_s": round(percentile(latencies, 0.50), 3),
+        "issue_latency_p95_s": round(percentile(latencies, 0.95), 3),
+        "test_runs_per_issue": round(sum(r.get("patches_tested", 0) for r in records) / n, 3),
+        "model_calls_per_issue": round(backend.calls / n, 3),
+        "cache_hits_per_issue": round(sum((r.get("tokens") or {}).get("cache_hits", 0) for r in records) / n, 3),
+        "wrong_answers": backend.wrong_answers,
+        "prompt_tokens": backend.prompt_tokens,
+        "output_tokens": backend.output_tokens,
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": children_peak_rss_mb(),
+        "stages": summarize(spans),
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            metrics: Dict[str, bool] = GATED_METRICS) -> List[str]:
+    """Metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for metric, higher_is_better in metrics.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(f"\n📊 {result['settings']['issues']} issue(s) in {result['elapsed_s']:.1f}s — "
+          f"{result['issues_per_hour']:.0f} issues/hour, {result['solved']} solved")
+    print(f"   issue latency p50 {result['issue_latency_p50_s']:.2f}s, p95 {result['issue_latency_p95_s']:.2f}s")
+    print(f"   {result['test_runs_per_issue']:.2f} test run(s), {result['model_calls_per_issue']:.2f} model call(s) "
+          f"and {result['cache_hits_per_issue']:.2f} cache hit(s) per issue")
+    print(f"   peak RSS {result['peak_rss_mb']} MB (children {result['children_peak_rss_mb']} MB)")
+    print(f"   {'stage':<20}{'count':>7}{'total s':>10}{'p50 s':>9}{'p95 s':>9}")
+    for row in result["stages"]:
+        print(f"   {row['span']:<20}{row['count']:>7}{row['total_wall_s']:>10.2f}"
+              f"{row['p50_wall_s']:>9.3f}{row['p95_wall_s']:>9.3f}")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the PestControl pipeline with a fake model.")
+    parser.add_argument("--issues", type=int, default=30, help="synthetic issues to generate")
+    parser.add_argument("--wrong-rate", type=float, default=0.3, help="fraction of deliberately wrong answers")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated model latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+- uniform latency jitter (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="issues in flight (default: scheduler.workers)")
+    parser.add_argument("--config", default=str(REPO_ROOT / "config.yaml"))
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against; exit 1 if a counter regressed")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="allowed relative worsening of the counters (solved, test runs, model calls, "
+                             "cache hits) vs. the baseline")
+    parser.add_argument("--timing-tolerance", type=float, default=0.5,
+                        help="latency/throughput/memory change (0.5 = 50%%) worth a warning; never fails the run")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch workspace")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print_result(result)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"💾 Results written to {args.out}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        slower = compare(result, baseline, args.timing_tolerance, ADVISORY_METRICS)
+        if slower:
+            print("⚠️ Timings worse than the baseline (advisory, wall-clock numbers are noisy):")
+            for line in slower:
+                print(f"   {line}")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("❌ Performance regressions against the baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import gzip
+import itertools
 import json
 import re
 from pathlib import Path
@@ -11,6 +13,62 @@ def safe_write(out_dir: str, filename: str, content: str, default: str = ""):
         f.write(text)
     return path
 
+# Map headings to file names we care about
+MAPPING = {
+    "description_of_the_bug": ("description.txt", "No description provided."),
+    "test_cases": ("test_cases.txt", "# No tests provided"),
+    "code_with_error": ("code_with_error.txt", "# No code snippet given"),
+    "code_with_error_path": ("code_with_error_path.txt", "# No code snippet given"),
+    "context_files": ("context_files.txt", "# No context files listed"),
+}
+
+# "### Heading" lines of an issue-form body, found in one pass
+HEADING_RE = re.compile(r"^### +(.*?)[ \t]*$", re.M)
+# The issue form's opt-in checkbox, ticked
+AI_FIX_RE = re.compile(r"^[ \t]*- \[[xX]\] Use AI powered fix", re.M)
+# Cheap test on the raw JSONL line before decoding it (the checkbox survives JSON escaping as-is)
+AI_FIX_MARKER = "] Use AI powered fix"
+
+# Issue fields kept by bulk ingestion (everything else in a GitHub export is dropped)
+KEEP_FIELDS = ("number", "title", "html_url")
+
+def parse_sections(body: str) -> dict:
+    """
+    Splits an issue body into its "### Heading" sections.
+
+    Returns:
+        dict: normalized heading ("Code with error" -> "code_with_error") -> section text.
+    """
+    parsed = {}
+    matches = list(HEADING_RE.finditer(body or ""))
+    for match, following in zip(matches, matches[1:] + [None]):
+        heading = match.group(1).strip().lower().replace(" ", "_")
+        end = following.start() if following is not None else len(body)
+        parsed[heading] = body[match.end():end].strip()
+    return parsed
+
+def wants_ai_fix(body: str) -> bool:
+    """True if the issue ticked "Use AI powered fix"."""
+    return bool(body) and AI_FIX_RE.search(body) is not None
+
+def parse_bug_report(json_file: str) -> dict:
+    """
+    Parses the "### Heading" sections of a GitHub issue JSON.
+
+    Args:
+        json_file (str): Path to the bug report JSON file.
+
+    Returns:
+        dict: heading key (see MAPPING) -> section text, "" when missing.
+    """
+    # Load the JSON
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # bulk-ingested reports carry their sections already parsed
+    parsed = data["fields"] if isinstance(data.get("fields"), dict) else parse_sections(data.get("body", ""))
+    return {key: parsed.get(key, "") for key in MAPPING}
+
 def extract_bug_report(json_file: str) -> str:
     """
     Extracts sections from a GitHub issue JSON into separate text files.
@@ -25,36 +83,131 @@ def extract_bug_report(json_file: str) -> str:
     out_dir = os.path.join("extracted_reports", base_name)
     os.makedirs(out_dir, exist_ok=True)
 
-    # Load the JSON
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    parsed = parse_bug_report(json_file)
+    for key, (filename, default) in MAPPING.items():
+        safe_write(out_dir, filename, parsed[key], default)
 
-    body = data.get("body", "")
+    print(f"✅ Extracted fields saved to {out_dir}")
+    return out_dir
 
-    # Use regex to capture "### Heading" and its text
-    sections = re.split(r"(?m)^### ", body)
-    parsed = {}
 
-    for section in sections:
-        if not section.strip():
+# ----------------------------
+# Bulk ingestion
+# ----------------------------
+
+def _open_export(path: str):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def _iter_json_array(f, chunk_size: int = 1 << 16):
+    """Yields the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array")
+    pos = 1
+    eof = False
+    while True:
+        # skip separators; keep enough buffered to decode the next element
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        if pos >= len(buf):
+            raise ValueError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            value, end = None, len(buf)
+        if end >= len(buf) and not eof:
+            # the element may continue in the next chunk (also guards a number cut in half)
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
             continue
-        lines = section.strip().splitlines()
-        heading = lines[0].strip().lower().replace(" ", "_")
-        content = "\n".join(lines[1:]).strip()
-        parsed[heading] = content
-
-    # Map headings to file names we care about
-    mapping = {
-        "description_of_the_bug": ("description.txt", "No description provided."),
-        "test_cases": ("test_cases.txt", "# No tests provided"),
-        "code_with_error": ("code_with_error.txt", "# No code snippet given"),
-        "code_with_error_path": ("code_with_error_path.txt", "# No code snippet given"),
-        "context_files": ("context_files.txt", "# No context files listed"),
-    }
-
-    for key, (filename, default) in mapping.items():
-        content = parsed.get(key, "")
-        safe_write(out_dir, filename, content, default)
+        if value is None:
+            raise ValueError(f"invalid JSON array element near: {buf[pos:pos + 80]!r}")
+        yield value
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
 
-    print(f"✅ Extracted fields saved to {out_dir}")
-    return out_dir
\ No newline at end of file
+def iter_issues(export_path: str, ai_fix_only: bool = True):
+    """
+    Streams the issues of a GitHub export: JSONL (one issue per line) or a
+    JSON array, optionally gzipped. Pull requests are skipped, and with
+    ai_fix_only so is every issue that did not tick "Use AI powered fix"
+    (JSONL lines without the checkbox are not even decoded).
+
+    Yields:
+        dict: the issue's KEEP_FIELDS, its label names, and its MAPPING sections under "fields".
+    """
+    with _open_export(export_path) as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            raw_issues = _iter_json_array(f)
+        else:
+            def jsonl():
+                for line_no, line in enumerate(itertools.chain([head + f.readline()], f), start=1):
+                    if not line.strip() or (ai_fix_only and AI_FIX_MARKER not in line):
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        raise ValueError(f"{export_path}:{line_no}: invalid JSON ({e})") from e
+            raw_issues = jsonl()
+
+        for issue in raw_issues:
+            if not isinstance(issue, dict) or "pull_request" in issue or issue.get("number") is None:
+                continue
+            body = issue.get("body") or ""
+            if ai_fix_only and not wants_ai_fix(body):
+                continue
+            compact = {key: issue.get(key) for key in KEEP_FIELDS}
+            compact["labels"] = [
+                {"name": label["name"] if isinstance(label, dict) else str(label)}
+                for label in issue.get("labels") or []
+                if not isinstance(label, dict) or "name" in label
+            ]
+            sections = parse_sections(body)
+            compact["fields"] = {key: sections.get(key, "") for key in MAPPING}
+            yield compact
+
+def ingest_export(export_path: str, out_dir: str = "bug_reports", ai_fix_only: bool = True) -> list:
+    """
+    Writes every opted-in issue of a GitHub export as a compact
+    bug_reports/issue_N.json (number, title, url, labels and the parsed
+    sections), which the pipeline and watch daemon read like a single-issue
+    JSON without parsing the body again. Files are renamed into place so a
+    watcher never sees a partial file.
+
+    Args:
+        export_path (str): JSONL or JSON-array export (.gz allowed).
+        out_dir (str): Where the pipeline picks up bug reports.
+        ai_fix_only (bool): Keep only issues with "- [x] Use AI powered fix".
+
+    Returns:
+        list: Paths of the written bug reports.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for issue in iter_issues(export_path, ai_fix_only=ai_fix_only):
+        path = os.path.join(out_dir, f"issue_{issue['number']}.json")
+        tmp_path = os.path.join(out_dir, f".issue_{issue['number']}.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(issue, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        written.append(path)
+
+    print(f"📥 Ingested {len(written)} bug report(s) from {export_path} into {out_dir}")
+    return written
@@ -0,0 +1,143 @@
+# diff_cache.py
+import hashlib
+import html
+import os
+import tempfile
+from pathlib import Path
+
+from ai_fixer.patience_diff import matcher_for
+
+MAX_UNIFIED_LINES = 4000   # lines of unified diff shown at most
+MAX_TABLE_ROWS = 1500      # rows of side-by-side table rendered at most
+
+
+def content_key(original: str, fixed: str, variant: str) -> str:
+    h = hashlib.sha256()
+    for part in (variant, original, fixed):
+        h.update(part.encode("utf-8", errors="replace"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _range(start: int, stop: int) -> str:
+    # same convention as difflib.unified_diff hunk headers
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    if not length:
+        start -= 1
+    return f"{start + 1},{length}"
+
+
+def unified_hunks(a: list[str], b: list[str], n: int = 3, max_lines: int = MAX_UNIFIED_LINES) -> str:
+    """Unified-diff hunks (no ---/+++ header) for two line lists, cut off after max_lines."""
+    out: list[str] = []
+    for group in matcher_for(a, b).get_grouped_opcodes(n):
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out.extend(" " + line for line in a[i1:i2])
+                continue
+            if tag in ("replace", "delete"):
+                out.extend("-" + line for line in a[i1:i2])
+            if tag in ("replace", "insert"):
+                out.extend("+" + line for line in b[j1:j2])
+        if len(out) > max_lines:
+            hidden = len(out) - max_lines
+            out = out[:max_lines] + [f"# ... diff truncated ({hidden}+ more lines not shown)"]
+            break
+    return "\n".join(out)
+
+
+def _cell(number, text: str, cls: str = "") -> str:
+    attr = f" class='{cls}'" if cls else ""
+    num = "" if number is None else number
+    return f"<td class='diff_header'>{num}</td><td{attr}>{html.escape(text)}</td>"
+
+
+def side_by_side_rows(a: list[str], b: list[str], context: int = 2, max_rows: int = MAX_TABLE_ROWS) -> str:
+    """`<tr>` rows of a side-by-side diff, styled like difflib.HtmlDiff tables, cut off after max_rows."""
+    rows: list[str] = []
+    for g, group in enumerate(matcher_for(a, b).get_grouped_opcodes(context)):
+        if g:
+            rows.append("<tr><td class='diff_header'>…</td><td></td><td class='diff_header'>…</td><td></td></tr>")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for k in range(i2 - i1):
+                    rows.append(f"<tr>{_cell(i1 + k + 1, a[i1 + k])}{_cell(j1 + k + 1, b[j1 + k])}</tr>")
+                continue
+            cls = {"replace": "diff_chg", "delete": "diff_sub", "insert": "diff_add"}[tag]
+            for k in range(max(i2 - i1, j2 - j1)):
+                left = _cell(i1 + k + 1, a[i1 + k], cls) if i1 + k < i2 else _cell(None, "")
+                right = _cell(j1 + k + 1, b[j1 + k], cls) if j1 + k < j2 else _cell(None, "")
+                rows.append(f"<tr>{left}{right}</tr>")
+        if len(rows) > max_rows:
+            hidden = len(rows) - max_rows
+            rows = rows[:max_rows] + [
+                f"<tr><td colspan='4' class='diff_header'>… diff truncated ({hidden}+ more rows not shown)</td></tr>"
+            ]
+            break
+    if not rows:
+        rows.append("<tr><td colspan='4' class='diff_header'>No differences found</td></tr>")
+    return "\n".join(rows)
+
+
+class DiffCache:
+    """
+    On-disk cache of rendered diffs keyed by a hash of both file contents.
+
+    Unified hunks and side-by-side table rows are stored as separate entries,
+    so each view is computed at most once per (original, fixed) pair. File
+    labels are added at render time and are not part of the key.
+    """
+
+    def __init__(self, cache_dir: str | Path = ".pestcontrol/diff_cache", max_entries: int = 2000):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    def _cached(self, key: str, suffix: str, compute) -> str:
+        path = self.cache_dir / f"{key}{suffix}"
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            pass
+        text = compute()
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        self.evict()
+        return text
+
+    def unified(self, original: str, fixed: str, fromfile: str = "original", tofile: str = "fixed") -> str:
+        a, b = original.splitlines(), fixed.splitlines()
+        hunks = self._cached(content_key(original, fixed, "unified"), ".udiff", lambda: unified_hunks(a, b))
+        return f"--- {fromfile}\n+++ {tofile}\n{hunks}" if hunks else ""
+
+    def side_by_side(self, original: str, fixed: str, fromdesc: str = "original", todesc: str = "fixed") -> str:
+        a, b = original.splitlines(), fixed.splitlines()
+        rows = self._cached(content_key(original, fixed, "table"), ".html", lambda: side_by_side_rows(a, b))
+        return (
+            "<table class='diff'>"
+            f"<thead><tr><th class='diff_header' colspan='2'>{html.escape(fromdesc)}</th>"
+            f"<th class='diff_header' colspan='2'>{html.escape(todesc)}</th></tr></thead>"
+            f"<tbody>{rows}</tbody></table>"
+        )
+
+    def evict(self) -> None:
+        entries = list(self.cache_dir.glob("*.udiff")) + list(self.cache_dir.glob("*.html"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            path.unlink(missing_ok=True)
+
+
+def truncate_lines(text: str, max_lines: int = MAX_UNIFIED_LINES) -> str:
+    """Cap a precomputed diff (e.g. a .diff file) for display."""
+    lines = text.splitlines()
+    if len(lines) <= max_lines:
+        return text
+    return "\n".join(lines[:max_lines] + [f"# ... diff truncated ({len(lines) - max_lines} more lines not shown)"])
@@ -0,0 +1,79 @@
+# pages/Performance.py
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+import yaml
+
+from ai_fixer.metrics import DEFAULT_METRICS_PATH, load_spans, summarize
+
+
+st.set_page_config(
+    page_title="Pest Control · Performance",
+    page_icon="⏱️",
+    layout="wide",
+)
+
+
+def metrics_path() -> str:
+    try:
+        with open("config.yaml", "r") as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        return DEFAULT_METRICS_PATH
+    return (config.get("metrics") or {}).get("path", DEFAULT_METRICS_PATH)
+
+
+WINDOWS = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 24 * 7, "All": None}
+
+
+@st.cache_data(show_spinner=False)
+def cached_spans(path: str, mtime: float, limit: int, hours: int | None):
+    # mtime is only part of the cache key, so a new run invalidates it;
+    # only the tail of the file inside the window is read
+    since = datetime.now() - timedelta(hours=hours) if hours else None
+    return load_spans(path, limit=limit, since=since)
+
+
+st.title("⏱️ Performance")
+st.caption("Per-stage timings and token usage recorded by the pipeline. "
+           "Stages are sorted by total wall time, so the biggest cost is on top.")
+
+with st.sidebar:
+    path = st.text_input("Metrics file", value=metrics_path())
+    window = st.selectbox("Time window", list(WINDOWS), index=1)
+    limit = st.number_input("Most recent spans", min_value=100, max_value=1_000_000, value=100_000, step=1000)
+
+try:
+    mtime = Path(path).stat().st_mtime
+except OSError:
+    st.info(f"No metrics recorded yet at `{path}`. Run the pipeline with `metrics.enabled: true`.")
+    st.stop()
+
+spans = cached_spans(path, mtime, int(limit), WINDOWS[window])
+if not spans:
+    st.info("No spans recorded in this time window." if WINDOWS[window] else "The metrics file is empty.")
+    st.stop()
+
+issues = sorted({s.get("issue") for s in spans if s.get("issue")})
+with st.sidebar:
+    issue = st.selectbox("Issue", ["All", *issues])
+if issue != "All":
+    spans = [s for s in spans if s.get("issue") == issue]
+
+summary = pd.DataFrame(summarize(spans))
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Spans", len(spans))
+c2.metric("Issues", len({s.get("issue") for s in spans if s.get("issue")}))
+c3.metric("Tokens (prompt / output)",
+          f"{int(summary['prompt_tokens'].sum()):,} / {int(summary['output_tokens'].sum()):,}")
+c4.metric("Peak RSS", f"{summary['peak_rss_mb'].max():.0f} MB")
+
+st.subheader("By stage")
+st.dataframe(summary, hide_index=True)
+st.bar_chart(summary.set_index("span")[["total_wall_s", "total_cpu_s"]])
+
+st.subheader("Recent spans")
+recent = pd.DataFrame(spans[-200:][::-1])
+st.dataframe(recent, hide_index=True)
@@ -1,13 +1,33 @@
 import os
 import glob
+import time
 import yaml
 import shutil
-from bug_report_extractor.bug_report_parser import extract_bug_report
+import signal
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from bug_report_extractor.bug_report_parser import ingest_export
 from ai_fixer.run_tests import tester
+from ai_fixer.stages import stage, configure_stage_limits
+from ai_fixer.response_cache import configure_response_cache, default_cache
+from ai_fixer.model_gateway import configure_model_gateway, get_model_backend
+from ai_fixer.backends import ReplayBackend, configure_model_backend
+from ai_fixer.pytest_pool import configure_pytest_pool
+from ai_fixer.sharding import configure_sharding
+from ai_fixer.static_gate import configure_static_gate
+from ai_fixer.fingerprint import configure_dedupe
+from ai_fixer.context_packer import set_default_budget
+from ai_fixer.gemini import set_response_mode, set_streaming
+from ai_fixer.metrics import configure_metrics, current_issue, span
+from ai_fixer.job_queue import JobQueue, report_priority
+from ai_fixer.watcher import watch_directory
+from ai_fixer.pipeline_types import BugReport, artifacts_enabled, configure_artifacts
 
 CONFIG_FILE = "config.yaml"
 BUG_REPORTS_DIR = "bug_reports"
 PROPOSED_FIXES_DIR = "proposed_fixes"
+SKIPPED = "skipped" # process_bug_report result for a report the agent cannot work on (no code snippet)
 
 def load_config():
     with open(CONFIG_FILE, "r") as f:
@@ -15,54 +35,256 @@ def load_config():
 
 def process_bug_report(file_path, config):
     print(f"📄 Processing bug report: {file_path}")
-    
-    extracted_dir = extract_bug_report(file_path)
 
-    # Safety checks: decide how to run depending on fields
-    test_cases_path = os.path.join(extracted_dir, "test_cases.txt")
-    code_with_error_path = os.path.join(extracted_dir, "code_with_error.txt")
+    current_issue.set(os.path.basename(file_path))
+    with span("process_bug_report"):
+        with stage("extract"), span("extract_bug_report"):
+            report = BugReport.from_json(file_path)
+            extracted_dir = report.folder
+            if artifacts_enabled():
+                report.write()
+                print(f"✅ Extracted fields saved to {extracted_dir}")
+            else:
+                os.makedirs(extracted_dir, exist_ok=True)
 
-    # Load contents
-    with open(test_cases_path, "r") as f:
-        tests = f.read().strip()
-    with open(code_with_error_path, "r") as f:
-        code = f.read().strip()
+        # Safety checks: decide how to run depending on fields
+        if not report.has_code:
+            print("❌ No code snippet provided. Cannot run repair agent.")
+            return SKIPPED
 
-    if not code or code.startswith("# No code"):
-        print("❌ No code snippet provided. Cannot run repair agent.")
-        return
+        if report.skip_tests:
+            print("⚠️ No test cases provided. Running in patch-only mode.")
+
+        patch_path = tester(
+            folder_path=extracted_dir,
+            manual= config.get("mode", "manual") == "manual",
+            num_loops=config.get("max_retries", 3),
+            skip_tests=report.skip_tests,
+            fan_out=config.get("fan_out", 1),
+            max_temperature=config.get("fan_out_max_temperature", 0.8),
+            report=report,
+        )
+
+        with stage("report"):
+            #Save patch in proposed_fixes/
+            os.makedirs(PROPOSED_FIXES_DIR, exist_ok=True)
+            dest = os.path.join(PROPOSED_FIXES_DIR, os.path.basename(patch_path))
+            shutil.move(patch_path, dest)
+
+            # Remove original JSON so it's not processed again
+            os.remove(file_path)
+            # Remove extracted directory
+            try:
+                shutil.rmtree(extracted_dir)
+                print(f"🗑️ Removed extracted directory: {extracted_dir}")
+            except Exception as e:
+                print(f"⚠️ Could not remove extracted directory: {extracted_dir} ({e})")
+        print(f"✅ Finished {file_path}. Patch saved to {dest}")
+        return dest
+
+def print_cache_summary():
+    """Response cache (and replay archive) hit rates of this process so far."""
+    cache = default_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"🗄️ Response cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+              f"{stats['evictions']} eviction(s) — {stats['hit_rate']:.0%} hit rate")
+    backend = get_model_backend()
+    if isinstance(backend, ReplayBackend):
+        stats = backend.stats()
+        print(f"⏯️ Replay: {stats['hits']} exact hit(s), {stats['loose_hits']} loose hit(s), "
+              f"{stats['misses']} miss(es)")
+
+def drain_bug_reports(bug_reports, config):
+    """
+    Process every bug report concurrently, one worker per in-flight issue.
+
+    Each issue still moves through extract -> baseline pytest -> model call ->
+    candidate validation -> report, but the per-stage limits from
+    `config["scheduler"]["stage_limits"]` let slow model calls for one issue
+    overlap with test runs for another.
+
+    Returns:
+        dict: counts of finished/failed issues, elapsed seconds and issues per minute.
+    """
+    sched = config.get("scheduler") or {}
+    workers = max(1, int(sched.get("workers", 4)))
+    configure_stage_limits(sched.get("stage_limits"))
+
+    finished, failed = 0, 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="issue") as pool:
+        futures = {pool.submit(process_bug_report, path, config): path for path in bug_reports}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                result = fut.result()
+                if result and result != SKIPPED:
+                    finished += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                failed += 1
+                print(f"❌ {path} failed: {e}")
+    elapsed = time.perf_counter() - started
+
+    per_minute = (finished + failed) / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"📈 Processed {finished + failed} issue(s) ({finished} ok, {failed} failed) "
+          f"in {elapsed:.1f}s — {per_minute:.2f} issues/min")
+    print_cache_summary()
+    return {
+        "finished": finished,
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "issues_per_minute": per_minute,
+    }
+
+def watch_bug_reports(config):
+    """
+    Daemon mode: process bug reports as they appear in bug_reports/.
+
+    New files are picked up through inotify (or by polling) and put in a
+    persistent SQLite job queue, ordered by label priority and age, so a
+    restart resumes where it stopped. At most `scheduler.workers` issues run
+    at once; when more than `watch.max_queued` jobs are waiting, new files are
+    left on disk until the queue drains to half that, then picked up by a
+    rescan. The model client, response cache and warm pytest workers are set
+    up once and shared by every job.
+    """
+    opts = config.get("watch") or {}
+    sched = config.get("scheduler") or {}
+    workers = max(1, int(sched.get("workers", 4)))
+    configure_stage_limits(sched.get("stage_limits"))
+    max_queued = max(1, int(opts.get("max_queued", 500)))
+    max_attempts = max(1, int(opts.get("max_attempts", 2)))
+    label_priority = opts.get("label_priority") or {}
 
-    skip_tests = not tests or tests.startswith("# No tests")
-    if skip_tests:
-        print("⚠️ No test cases provided. Running in patch-only mode.")
-
-    patch_path = tester(
-        folder_path=extracted_dir,
-        manual= config.get("mode", "manual") == "manual",
-        num_loops=config.get("max_retries", 3),
-        skip_tests=skip_tests
-    )
-
-    #Save patch in proposed_fixes/
-    os.makedirs(PROPOSED_FIXES_DIR, exist_ok=True)
-    dest = os.path.join(PROPOSED_FIXES_DIR, os.path.basename(patch_path))
-    shutil.move(patch_path, dest)
-
-    # Remove original JSON so it's not processed again
-    os.remove(file_path)
-    # Remove extracted directory
-    try:
-        shutil.rmtree(extracted_dir)
-        print(f"🗑️ Removed extracted directory: {extracted_dir}")
-    except Exception as e:
-        print(f"⚠️ Could not remove extracted directory: {extracted_dir} ({e})")
-    print(f"✅ Finished {file_path}. Patch saved to {dest}")
+    queue = JobQueue(opts.get("queue_db", ".pestcontrol/jobs.sqlite3"),
+                     age_boost_per_hour=float(opts.get("age_boost_per_hour", 10)))
+    recovered = queue.recover()
+    if recovered:
+        print(f"♻️ Re-queued {recovered} job(s) interrupted by the last shutdown")
+    watcher = watch_directory(BUG_REPORTS_DIR, ".json", float(opts.get("poll_interval_s", 1.0)))
+    paused = False
+
+    def intake(paths):
+        nonlocal paused
+        for path in paths:
+            if queue.depth() >= max_queued:
+                if not paused:
+                    print(f"🛑 {max_queued} job(s) waiting; leaving new reports on disk until the queue drains")
+                paused = True
+                return
+            priority = report_priority(path, label_priority)
+            if priority is None:
+                continue  # gone, or not complete JSON yet; a later event will bring it back
+            if queue.enqueue(path, priority):
+                print(f"📥 Queued {path} (priority {priority:g})")
+
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    running = {}
+    def reap(futures):
+        for fut in futures:
+            path = running.pop(fut)
+            error = None
+            retry = True
+            try:
+                result = fut.result()
+                ok = bool(result) and result != SKIPPED
+                if result == SKIPPED:
+                    # retrying cannot help until the report itself is edited (then it is queued anew)
+                    error, retry = "no code snippet in the report", False
+            except Exception as e:
+                ok, error = False, str(e)
+                print(f"❌ {path} failed: {e}")
+            state = queue.complete(path, ok, error, max_attempts=max_attempts, retry=retry)
+            if state == "queued":
+                print(f"🔁 {path} will be retried")
+
+    intake(sorted(glob.glob(os.path.join(BUG_REPORTS_DIR, "*.json"))))
+    print(f"👀 Watching {BUG_REPORTS_DIR}/ with {workers} worker(s) — Ctrl+C to stop")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="issue") as pool:
+        try:
+            while not stop.is_set():
+                reap([fut for fut in running if fut.done()])
+                if paused and queue.depth() <= max_queued // 2:
+                    paused = False
+                    print("▶️ Queue drained; picking up waiting reports")
+                    intake(sorted(glob.glob(os.path.join(BUG_REPORTS_DIR, "*.json"))))
+                # only claim as many jobs as there are free workers; the rest stay queued
+                while len(running) < workers:
+                    path = queue.claim()
+                    if path is None:
+                        break
+                    if not os.path.exists(path):
+                        queue.complete(path, False, "report file disappeared")
+                        continue
+                    running[pool.submit(process_bug_report, path, config)] = path
+                intake(watcher.poll(timeout=0.2 if running else 1.0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if running:
+                print(f"⏳ Finishing {len(running)} in-flight issue(s) before exiting")
+                wait(list(running))
+                reap(list(running))
+            watcher.close()
+            counts = queue.counts()
+            queue.close()
+    print(f"👋 Stopped watching. Jobs: {counts}")
+    print_cache_summary()
+
+def configure_pipeline(config):
+    """Apply every tunable block of config.yaml to the process-wide pipeline settings."""
+    cache_config = config.get("response_cache")
+    if (config.get("model_backend") or {}).get("mode", "gemini") != "gemini":
+        # cached answers would never reach the recorder, or would shadow the replay archive
+        cache_config = {**(cache_config or {}), "enabled": False}
+    configure_response_cache(cache_config)
+    configure_model_gateway(config.get("model_gateway"))
+    configure_model_backend(config.get("model_backend"))
+    configure_pytest_pool(config.get("pytest_pool"))
+    configure_sharding(config.get("sharding"))
+    configure_static_gate(config.get("static_gate"))
+    configure_dedupe(config.get("dedupe"))
+    configure_metrics(config.get("metrics"))
+    configure_artifacts(config.get("artifacts"))
+    set_default_budget(config.get("context_token_budget", 6000))
+    set_response_mode(config.get("response_mode", "full"))
+    # one precheck thread per model request that can be in flight: issues x fanned-out candidates
+    in_flight = max(1, int((config.get("scheduler") or {}).get("workers", 4))) * max(1, int(config.get("fan_out", 1)))
+    set_streaming(config.get("stream_responses", True), config.get("stream_attempts", 2), precheck_workers=in_flight)
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the PestControl repair pipeline.")
+    parser.add_argument("reports", nargs="*", help=f"bug report JSON files (default: all of {BUG_REPORTS_DIR}/)")
+    parser.add_argument("--watch", action="store_true",
+                        help=f"keep running and process reports as they are added to {BUG_REPORTS_DIR}/")
+    parser.add_argument("--ingest", metavar="EXPORT",
+                        help=f"first write the opted-in issues of a GitHub export (JSONL or JSON array, "
+                             f"optionally .gz) to {BUG_REPORTS_DIR}/ and process those")
+    args = parser.parse_args()
+
     config = load_config()
     mode = config.get("mode", "manual")
+    configure_pipeline(config)
+
+    if args.ingest:
+        ingested = ingest_export(args.ingest, BUG_REPORTS_DIR)
+        if not args.reports and not args.watch:
+            if not ingested:
+                print("No issues in the export asked for an AI-powered fix.")
+                return
+            args.reports = ingested
+
+    if args.watch:
+        watch_bug_reports(config)
+        return
 
-    bug_reports = glob.glob(os.path.join(BUG_REPORTS_DIR, "*.json"))
+    bug_reports = args.reports or glob.glob(os.path.join(BUG_REPORTS_DIR, "*.json"))
 
     if not bug_reports:
         print("No bug reports found.")
@@ -85,9 +307,10 @@ def main():
             print("Invalid input.")
             return
         process_bug_report(bug_reports[selection], config)
+        print_cache_summary()
     else:
-        # Process the first available JSON file
-        process_bug_report(bug_reports[0], config)
+        # Drain the whole backlog through the staged scheduler
+        drain_bug_reports(sorted(bug_reports), config)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,372 @@
+# report_store.py
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from ai_fixer.run_records import load_run_records
+
+LINE_HDR_RE = re.compile(r'^\s*[Ll]ine\s+(\d+)\s*-{3,}')
+DIFF_HEADER_OLD = re.compile(r"^---\s+(?P<old>.+)")
+DIFF_HEADER_NEW = re.compile(r"^\+\+\+\s+(?P<new>.+)")
+HUNK_RE = re.compile(r"^@@\s+-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s+@@")
+SUCCESS_PATTERNS = ("generated fix successful", "fix successful", "tests passed")
+FAIL_PATTERNS = ("all generated fixes failed", "tests failed")
+
+def _strip_triple_fences(s: str) -> str:
+    return s.replace("```", "")
+
+def parse_unified_diff_paths(diff_text: str) -> tuple[str | None, str | None]:
+    old_path = new_path = None
+    for line in diff_text.splitlines():
+        m1 = DIFF_HEADER_OLD.match(line)
+        if m1 and not old_path:
+            old_path = m1.group("old").strip()
+            continue
+        m2 = DIFF_HEADER_NEW.match(line)
+        if m2 and not new_path:
+            new_path = m2.group("new").strip()
+            continue
+        if old_path and new_path:
+            break
+    if old_path and old_path.startswith("a/"): old_path = old_path[2:]
+    if new_path and new_path.startswith("b/"): new_path = new_path[2:]
+    return old_path, new_path
+
+def parse_hunk_range(diff_text: str) -> tuple[int | None, int | None]:
+    for line in diff_text.splitlines():
+        m = HUNK_RE.match(line)
+        if m:
+            new_start = int(m.group(3))
+            new_len = int(m.group(4) or "1")
+            new_end = new_start + max(new_len - 1, 0)
+            return new_start, new_end
+    return None, None
+
+def parse_proposed_fix_file(file_path: Path) -> dict:
+    """
+    Parse a single proposed_fixes/issue_*.txt into our report dict.
+    Tolerant to minor format drift. Always defines 'why'.
+    """
+    text = file_path.read_text(encoding="utf-8", errors="ignore")
+    lines = text.splitlines()
+
+    # --- defaults so we never hit NameError ---
+    status = "Unknown"
+    start_line: int | None = None
+    end_line:   int | None = None
+    why: str | None = None
+    patch_block: str | None = None
+
+    # status from text (loose)
+    low = text.lower()
+    if any(p in low for p in FAIL_PATTERNS):
+        status = "Fail"
+    elif any(p in low for p in SUCCESS_PATTERNS):
+        status = "Success"
+
+    # find "Line N-----" banners (optional)
+    first_marker_idx = second_marker_idx = None
+    for idx, ln in enumerate(lines):
+        m = LINE_HDR_RE.match(ln)
+        if m and first_marker_idx is None:
+            first_marker_idx = idx
+            try:
+                start_line = int(m.group(1))
+            except Exception:
+                start_line = None
+        elif m and first_marker_idx is not None and second_marker_idx is None:
+            second_marker_idx = idx
+            break
+
+    # locate "Original buggy code description:" (optional)
+    desc_idx = None
+    for idx, ln in enumerate(lines):
+        if ln.strip().lower().startswith("original buggy code description"):
+            desc_idx = idx
+            break
+
+    # patch/code block between first banner and next banner/desc/EoF
+    if first_marker_idx is not None:
+        start = first_marker_idx + 1
+        end = second_marker_idx if second_marker_idx is not None else (desc_idx if desc_idx is not None else len(lines))
+        patch_block = "\n".join(lines[start:end]).rstrip() or None
+
+    # why text after the description label
+    if desc_idx is not None:
+        why = "\n".join(lines[desc_idx + 1:]).strip() or None
+
+    # attach sibling .diff if present; use it to enrich status/lines/paths
+    diff_path = file_path.with_suffix(".diff")
+    diff_text = None
+    orig_path_in_diff = None
+    new_path_in_diff = None
+    if diff_path.exists():
+        raw_diff = diff_path.read_text(encoding="utf-8", errors="ignore")
+        diff_text = _strip_triple_fences(raw_diff)
+        orig_path_in_diff, new_path_in_diff = parse_unified_diff_paths(diff_text)
+        # if no explicit status but we have a diff, call it Proposed
+        if status == "Unknown":
+            status = "Proposed"
+        # derive line range from first hunk if missing
+        if start_line is None:
+            s, e = parse_hunk_range(diff_text)
+            start_line, end_line = s, e
+
+    return {
+        "file": file_path.name,
+        "status": status,
+        "start_line": start_line,
+        "end_line": end_line,
+        "why": why,  # guaranteed key (may be None)
+        "timestamp": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
+        "patch": patch_block,
+        "raw": text,
+        # diff fields
+        "diff_path": str(diff_path) if diff_path.exists() else None,
+        "diff_text": diff_text,
+        # code paths hinted by diff headers
+        "original_code_path": orig_path_in_diff,
+        "fixed_code_path": new_path_in_diff,
+    }
+
+
+
+def report_from_records(file_path: Path, records: list[dict]) -> dict:
+    """Build the report dict from the latest structured run record (see ai_fixer.run_records)."""
+    latest = records[-1]
+    diff_path = file_path.with_suffix(".diff")
+    diff_text = orig_path_in_diff = new_path_in_diff = None
+    if diff_path.exists():
+        diff_text = _strip_triple_fences(diff_path.read_text(encoding="utf-8", errors="ignore"))
+        orig_path_in_diff, new_path_in_diff = parse_unified_diff_paths(diff_text)
+    txt_path = file_path.with_suffix(".txt")
+    raw = (txt_path.read_text(encoding="utf-8", errors="ignore") if txt_path.exists()
+           else json.dumps(latest, indent=2))
+    return {
+        "file": txt_path.name,
+        "status": latest.get("status") or "Unknown",
+        "start_line": latest.get("start_line"),
+        "end_line": latest.get("end_line"),
+        "why": latest.get("why"),
+        "timestamp": latest.get("timestamp"),
+        "patch": latest.get("patch"),
+        "raw": raw,
+        "diff_path": str(diff_path) if diff_path.exists() else None,
+        "diff_text": diff_text,
+        "original_code_path": orig_path_in_diff,
+        "fixed_code_path": new_path_in_diff,
+        "runs": len(records),
+        "record": latest,
+    }
+
+
+def load_report(file_path: Path) -> dict:
+    """Report for issue_N: from issue_N.jsonl records when present, else parsed from the .txt."""
+    records = load_run_records(file_path.with_suffix(".jsonl"))
+    if records:
+        return report_from_records(file_path, records)
+    return parse_proposed_fix_file(file_path.with_suffix(".txt"))
+
+
+def _unparsed_report(f: Path, e: Exception) -> dict:
+    # best-effort: still surface file with minimal info
+    if not f.exists():
+        f = f.with_suffix(".jsonl")
+    return {
+        "file": f.name, "status": "Unknown",
+        "start_line": None, "end_line": None,
+        "why": f"Parse error: {e}",
+        "timestamp": datetime.fromtimestamp(f.stat().st_mtime).isoformat(),
+        "patch": None, "raw": f.read_text(encoding='utf-8', errors='ignore')
+    }
+
+def load_proposed_fixes(dir_path: Path) -> list[dict]:
+    files = sorted(dir_path.glob("*.txt"))
+    reports = []
+    for f in files:
+        try:
+            reports.append(load_report(f))
+        except Exception as e:
+            reports.append(_unparsed_report(f, e))
+    return reports
+
+
+# ---------- persistent index ----------
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    path       TEXT PRIMARY KEY,
+    stamp      TEXT NOT NULL,       -- mtime/size of the .txt, .diff and .jsonl
+    file       TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    start_line INTEGER,
+    end_line   INTEGER,
+    why        TEXT,
+    timestamp  TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_file ON reports(file);
+CREATE INDEX IF NOT EXISTS reports_status ON reports(status, file);
+CREATE INDEX IF NOT EXISTS reports_timestamp ON reports(timestamp);
+-- inverted index over file names and why text
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (term, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS terms_path ON terms(path);
+"""
+
+REPORT_SUFFIXES = (".txt", ".diff", ".jsonl")
+TERM_RE = re.compile(r"[a-z0-9]+")
+SORT_ORDERS = {
+    "timestamp": "timestamp DESC, file",
+    "file": "file",
+    "status": "status, file",
+}
+SUMMARY_FIELDS = ("file", "status", "start_line", "end_line", "why", "timestamp")
+
+
+def index_terms(*texts: str | None) -> set[str]:
+    return set(TERM_RE.findall(" ".join(t or "" for t in texts).lower()))
+
+
+class ReportStore:
+    """
+    SQLite index of parsed proposed_fixes/*.txt reports.
+
+    Each row holds `load_report` output (structured .jsonl run records, or the
+    parsed .txt as a fallback) keyed by the mtime and size of the report's
+    .txt, .diff and .jsonl files. `sync()` only re-parses
+    reports whose files changed since the last call and drops rows for deleted
+    ones, so a dashboard rerun costs one directory scan instead of a full parse.
+    `query()` serves filtered, sorted pages of summaries; `report()` loads one
+    full report when its detail panel is opened.
+    """
+
+    def __init__(self, db_path: str | Path = ".pestcontrol/reports.sqlite3"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Streamlit reruns on different threads; one connection guarded by a lock
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # the index is only a cache of proposed_fixes/: rebuild it on schema changes
+            self._conn.executescript("DROP TABLE IF EXISTS reports; DROP TABLE IF EXISTS terms;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def sync(self, dir_path: str | Path) -> dict:
+        """Bring the index in line with dir_path; returns {"parsed", "removed", "total"}."""
+        dir_path = Path(dir_path)
+        with self._lock:
+            known = dict(self._conn.execute("SELECT path, stamp FROM reports"))
+            # one directory scan stats the reports and their sibling .diff / .jsonl files
+            stats = {}
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(REPORT_SUFFIXES) and entry.is_file():
+                        st = entry.stat()
+                        stats[entry.path] = [st.st_mtime_ns, st.st_size]
+            seen = set()
+            changed = []
+            for path in stats:
+                base, ext = os.path.splitext(path)
+                if ext == ".diff" or (ext == ".jsonl" and base + ".txt" in stats):
+                    continue
+                path = base + ".txt"  # rows are keyed by the .txt path even when only records exist
+                stamp = json.dumps([stats.get(base + suffix) for suffix in REPORT_SUFFIXES])
+                seen.add(path)
+                if known.get(path) != stamp:
+                    changed.append((Path(path), stamp))
+
+            rows = []
+            terms = []
+            for path, key in changed:
+                try:
+                    report = load_report(path)
+                except Exception as e:
+                    report = _unparsed_report(path, e)
+                rows.append((str(path), key, report["file"], (report.get("status") or "Unknown").strip(),
+                             report.get("start_line"), report.get("end_line"), report.get("why"),
+                             report.get("timestamp"), json.dumps(report)))
+                terms.extend((t, str(path)) for t in index_terms(report["file"], report.get("why")))
+            stale = [(str(p),) for p, _ in changed]
+            removed = [(p,) for p in known if p not in seen]
+            with self._conn:
+                self._conn.executemany("DELETE FROM terms WHERE path = ?", stale + removed)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO reports "
+                    "(path, stamp, file, status, start_line, end_line, why, timestamp, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany("INSERT OR IGNORE INTO terms (term, path) VALUES (?, ?)", terms)
+                self._conn.executemany("DELETE FROM reports WHERE path = ?", removed)
+            return {"parsed": len(rows), "removed": len(removed), "total": len(seen)}
+
+    def reports(self) -> list[dict]:
+        """All indexed reports, ordered by file name."""
+        with self._lock:
+            return [json.loads(data) for (data,) in self._conn.execute("SELECT data FROM reports ORDER BY file")]
+
+    def query(self,
+              status: str | None = None,
+              search: str | None = None,
+              file_name: str | None = None,
+              sort_by: str = "timestamp",
+              page: int = 1,
+              page_size: int = 25) -> tuple[list[dict], int]:
+        """
+        One page of report summaries (no patch/diff/raw text) plus the total
+        number of matches. Filtering, search and sorting run in SQLite; search
+        terms must all match (the last one as a prefix) against the terms index.
+        """
+        where, params = [], []
+        if status and status != "All":
+            where.append("status = ?")
+            params.append(status)
+        if file_name:
+            where.append("file = ?")
+            params.append(file_name)
+        words = TERM_RE.findall((search or "").lower())
+        for n, word in enumerate(words):
+            if n == len(words) - 1:
+                where.append("path IN (SELECT path FROM terms WHERE term >= ? AND term < ?)")
+                params += [word, word + "\uffff"]
+            else:
+                where.append("path IN (SELECT path FROM terms WHERE term = ?)")
+                params.append(word)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        order = SORT_ORDERS.get(sort_by, SORT_ORDERS["timestamp"])
+        page_size = max(1, int(page_size))
+        offset = (max(1, int(page)) - 1) * page_size
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM reports{clause}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_FIELDS)} FROM reports{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [page_size, offset]).fetchall()
+        return [dict(zip(SUMMARY_FIELDS, row)) for row in rows], total
+
+    def statuses(self) -> list[str]:
+        """Distinct statuses of the indexed reports, e.g. for a filter."""
+        with self._lock:
+            return [s for (s,) in self._conn.execute("SELECT DISTINCT status FROM reports ORDER BY status")]
+
+    def files(self) -> list[str]:
+        with self._lock:
+            return [f for (f,) in self._conn.execute("SELECT file FROM reports ORDER BY file")]
+
+    def report(self, file_name: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM reports WHERE file = ?", (file_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
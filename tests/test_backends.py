@@ -0,0 +1,47 @@
+import gzip
+
+from ai_fixer.backends import ArchiveWriter, load_archive
+
+
+def entry(n):
+    return {"key": f"k{n}", "loose_key": f"l{n}", "text": f"response {n}"}
+
+
+def test_load_archive_reads_members_after_a_truncated_one(tmp_path):
+    archive = tmp_path / "archive.jsonl.gz"
+
+    # first run: two entries, then the process dies mid-write
+    writer = ArchiveWriter(archive)
+    writer.write(entry(1))
+    writer.write(entry(2))
+    writer.close()
+    data = archive.read_bytes()
+    archive.write_bytes(data[:-12])  # cut the member's trailer and the end of its data
+
+    # second run appends a member of its own
+    writer = ArchiveWriter(archive)
+    writer.write(entry(3))
+    writer.close()
+
+    texts = [e["text"] for e in load_archive(archive)]
+    assert texts == ["response 1", "response 2", "response 3"]
+
+
+def test_load_archive_keeps_entries_flushed_before_a_crash(tmp_path):
+    archive = tmp_path / "archive.jsonl.gz"
+    writer = ArchiveWriter(archive)
+    writer.write(entry(1))
+    writer.write(entry(2))
+    # no close(): the member has no trailer, as after a crash; write() already flushed
+    assert [e["text"] for e in load_archive(archive)] == ["response 1", "response 2"]
+    writer.close()
+
+
+def test_load_archive_reads_every_intact_member(tmp_path):
+    archive = tmp_path / "archive.jsonl.gz"
+    for n in range(3):
+        writer = ArchiveWriter(archive)
+        writer.write(entry(n))
+        writer.close()
+    assert [e["key"] for e in load_archive(archive)] == ["k0", "k1", "k2"]
+    assert load_archive(tmp_path / "missing.gz") == []
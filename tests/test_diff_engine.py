@@ -0,0 +1,63 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from ai_fixer.diff_engine import unified_diff, write_diff
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+BASE = "".join(f"def f{i}(x):\n    return x + {i}\n\n" for i in range(40))
+
+
+def large_change(rng):
+    lines = [f"line {i} {rng.random():.6f}\n" for i in range(1500)]
+    fixed = list(lines)
+    for _ in range(30):
+        k = rng.randrange(len(fixed))
+        fixed[k:k + rng.randint(0, 3)] = [f"changed {rng.random():.6f}\n"] * rng.randint(0, 3)
+    return "".join(lines), "".join(fixed)
+
+
+CASES = {
+    "one line": (BASE, BASE.replace("return x + 7\n", "return x - 7\n")),
+    "hunks far apart": (BASE, BASE.replace("x + 1\n", "x + 100\n").replace("x + 38\n", "x + 380\n")),
+    "insert at start": (BASE, "import math\n" + BASE),
+    "append at end": (BASE, BASE + "def g():\n    pass\n"),
+    "drop final newline": (BASE, BASE.rstrip("\n")),
+    "add final newline": ("a\nb\nc", "a\nb\nc\n"),
+    "both without final newline": ("a\nb\nc", "a\nB\nc"),
+    "from empty": ("", "x = 1\n"),
+    "to empty": ("x = 1\n", ""),
+    "unicode": ("name = 'café'\nvalue = 1\n", "name = 'café ☕'\nvalue = 1\n"),
+    "large (patience)": large_change(random.Random(7)),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_git_apply_reproduces_the_fixed_file(tmp_path, name):
+    original, fixed = CASES[name]
+    target = tmp_path / "pkg" / "mod.py"
+    target.parent.mkdir()
+    target.write_bytes(original.encode("utf-8"))
+    patch = write_diff(tmp_path / "fix.diff", original, fixed, "pkg/mod.py", "pkg/mod.py")
+
+    proc = subprocess.run(["git", "apply", "--whitespace=nowarn", str(patch)], cwd=tmp_path,
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert target.read_bytes() == fixed.encode("utf-8")
+
+
+def test_headers_match_git():
+    diff = unified_diff("a\nb\n", "a\nc\n", "pkg/mod.py", "pkg/mod.py")
+    assert diff.splitlines()[:4] == [
+        "diff --git a/pkg/mod.py b/pkg/mod.py",
+        "index 422c2b7..0f7bc76 100644",  # `git hash-object` of each side
+        "--- a/pkg/mod.py",
+        "+++ b/pkg/mod.py",
+    ]
+
+
+def test_equal_contents_give_no_diff():
+    assert unified_diff(BASE, BASE) == ""
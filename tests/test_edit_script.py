@@ -0,0 +1,84 @@
+import pytest
+
+from ai_fixer.edit_script import EditApplyError, apply_edits, locate_edit
+
+ORIGINAL = """\
+def median(nums):
+    s = sorted(nums)
+    n = len(s)
+    mid = n // 2
+    return s[mid]
+
+
+def mean(nums):
+    return sum(nums) / len(nums)
+"""
+
+
+def test_edit_at_the_claimed_lines():
+    fixed, ranges = apply_edits(ORIGINAL, [
+        {"start": 5, "end": 5, "original": "    return s[mid]",
+         "replacement": "    if n % 2 == 0:\n        return (s[mid - 1] + s[mid]) / 2\n    return s[mid]",
+         "reason": "even length"},
+    ])
+    assert "return (s[mid - 1] + s[mid]) / 2" in fixed
+    assert fixed.endswith("\n")
+    assert ranges == [{"start": 5, "end": 5, "reason": "even length"}]
+
+
+def test_off_by_a_few_lines_is_anchored_on_the_original_text():
+    fixed, ranges = apply_edits(ORIGINAL, [{"start": 2, "end": 2, "original": "return s[mid]",
+                                            "replacement": "    return s[mid - 1]"}])
+    assert "    return s[mid - 1]\n" in fixed
+    assert ranges[0]["start"] == ranges[0]["end"] == 5  # where it was applied, not the claimed line 2
+
+
+def test_indentation_differences_still_match():
+    lo, hi = locate_edit(ORIGINAL.splitlines(), {"start": 9, "original": "return sum(nums) / len(nums)"})
+    assert (lo, hi) == (8, 9)
+
+
+def test_far_away_text_is_found_when_unique():
+    lines = ORIGINAL.splitlines()
+    assert locate_edit(lines, {"start": 1, "end": 1, "original": "def mean(nums):"}, fuzz=1) == (7, 8)
+
+
+def test_ambiguous_or_missing_text_is_an_error():
+    lines = ["x = 1", "y = 2", "x = 1", "z = 3", "w = 4", "v = 5", "u = 6", "t = 7", "x = 1"]
+    with pytest.raises(EditApplyError, match="ambiguous"):
+        locate_edit(lines, {"start": 5, "end": 5, "original": "x = 1"}, fuzz=0)
+    with pytest.raises(EditApplyError, match="not found"):
+        locate_edit(lines, {"start": 1, "end": 1, "original": "q = 9"})
+
+
+def test_pure_insertion():
+    fixed, ranges = apply_edits(ORIGINAL, [{"start": 2, "end": 1, "replacement": "    nums = list(nums)"}])
+    assert fixed.splitlines()[1] == "    nums = list(nums)"
+    assert fixed.splitlines()[2] == "    s = sorted(nums)"
+    assert ranges == [{"start": 2, "end": 1, "reason": ""}]
+
+
+def test_several_edits_use_original_line_numbers():
+    fixed, ranges = apply_edits(ORIGINAL, [
+        {"start": 9, "end": 9, "original": "    return sum(nums) / len(nums)",
+         "replacement": "    if not nums:\n        return 0.0\n    return sum(nums) / len(nums)"},
+        {"start": 1, "end": 1, "original": "def median(nums):", "replacement": "def median(nums: list):"},
+    ])
+    assert fixed.startswith("def median(nums: list):\n")
+    assert "        return 0.0\n" in fixed
+    assert [r["start"] for r in ranges] == [1, 9]
+
+
+def test_overlapping_edits_are_rejected():
+    with pytest.raises(EditApplyError, match="overlap"):
+        apply_edits(ORIGINAL, [
+            {"start": 2, "end": 3, "original": "    s = sorted(nums)\n    n = len(s)", "replacement": "a"},
+            {"start": 3, "end": 4, "original": "    n = len(s)\n    mid = n // 2", "replacement": "b"},
+        ])
+
+
+@pytest.mark.parametrize("script", [None, {"start": 1}, "edits", [], ["not an edit"], [{"original": "x"}],
+                                    [{"start": 1, "end": 1, "original": "def median(nums):"}]])
+def test_malformed_scripts_raise_edit_apply_error(script):
+    with pytest.raises(EditApplyError):
+        apply_edits(ORIGINAL, script)
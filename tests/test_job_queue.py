@@ -0,0 +1,108 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from ai_fixer.job_queue import JobQueue, file_stamp, report_priority
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(tmp_path / "jobs.sqlite3", age_boost_per_hour=0)
+    yield q
+    q.close()
+
+
+def report(tmp_path, name, labels=(), body="{}"):
+    path = tmp_path / name
+    path.write_text(json.dumps({"labels": [{"name": n} for n in labels], "body": body}))
+    return str(path)
+
+
+def test_claims_follow_priority_then_age(tmp_path, queue):
+    low, high, also_low = (report(tmp_path, f"{n}.json") for n in ("low", "high", "also_low"))
+    queue.enqueue(low, 0)
+    queue.enqueue(high, 5)
+    queue.enqueue(also_low, 0)
+    assert [queue.claim(), queue.claim(), queue.claim(), queue.claim()] == [high, low, also_low, None]
+    assert queue.counts() == {"running": 3}
+
+
+def test_waiting_jobs_gain_priority_with_age(tmp_path, monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("ai_fixer.job_queue.time", SimpleNamespace(time=lambda: clock["now"]))
+    q = JobQueue(tmp_path / "jobs.sqlite3", age_boost_per_hour=3600)  # one point per second waited
+    old, urgent = report(tmp_path, "old.json"), report(tmp_path, "urgent.json")
+    q.enqueue(old, 0)
+    clock["now"] += 10
+    q.enqueue(urgent, 5)
+    assert q.claim() == old  # 10 points of age beat 5 of priority
+    q.close()
+
+
+def test_queued_and_running_jobs_are_not_queued_twice(tmp_path, queue):
+    path = report(tmp_path, "r.json")
+    assert queue.enqueue(path)
+    assert not queue.enqueue(path)
+    queue.claim()
+    assert not queue.enqueue(path)
+    assert queue.depth() == 0
+
+
+def test_failures_are_retried_until_max_attempts(tmp_path, queue):
+    path = report(tmp_path, "r.json")
+    queue.enqueue(path)
+    assert queue.claim() == path
+    assert queue.complete(path, False, "boom", max_attempts=2) == "queued"
+    assert queue.claim() == path
+    assert queue.complete(path, False, "boom again", max_attempts=2) == "failed"
+    [job] = queue.jobs()
+    assert (job["state"], job["attempts"], job["error"]) == ("failed", 2, "boom again")
+
+
+def test_terminal_failures_are_not_retried(tmp_path, queue):
+    path = report(tmp_path, "r.json")
+    queue.enqueue(path)
+    queue.claim()
+    assert queue.complete(path, False, "no code snippet", max_attempts=5, retry=False) == "failed"
+    assert queue.claim() is None
+
+
+def test_finished_jobs_are_queued_again_only_when_the_file_changed(tmp_path, queue):
+    path = report(tmp_path, "r.json")
+    queue.enqueue(path)
+    queue.claim()
+    assert queue.complete(path, True) == "done"
+    assert not queue.enqueue(path)  # a rescan finds the same file
+
+    report(tmp_path, "r.json", body="a new issue under the same name")
+    os.utime(path, ns=(1, 1))  # make sure the stamp differs even on coarse clocks
+    assert queue.enqueue(path)
+    [job] = queue.jobs()
+    assert (job["state"], job["attempts"], job["stamp"]) == ("queued", 0, file_stamp(path))
+
+
+def test_recover_requeues_jobs_left_running(tmp_path):
+    db = tmp_path / "jobs.sqlite3"
+    q = JobQueue(db)
+    path = report(tmp_path, "r.json")
+    q.enqueue(path)
+    q.claim()
+    q.close()  # the daemon died with the job running
+
+    q = JobQueue(db)
+    assert q.recover() == 1
+    assert q.claim() == path
+    assert q.recover() == 1
+    assert q.counts() == {"queued": 1}
+    q.close()
+
+
+def test_report_priority_uses_the_highest_label(tmp_path):
+    weights = {"Critical": 10, "bug": 2}
+    assert report_priority(report(tmp_path, "a.json", ["bug", "critical"]), weights) == 10
+    assert report_priority(report(tmp_path, "b.json", ["docs"]), weights) == 0
+    broken = tmp_path / "c.json"
+    broken.write_text("{not json")
+    assert report_priority(str(broken), weights) is None
@@ -0,0 +1,64 @@
+import xml.etree.ElementTree as ET
+
+from ai_fixer.sharding import NO_TESTS_COLLECTED, balance, junit_key, merge_junit, run_shards
+
+NODES = [f"pkg/test_mod.py::test_{n}" for n in range(8)]
+
+
+def test_junit_key_matches_pytest_junit_names():
+    assert junit_key("pkg/test_mod.py::test_a") == "pkg.test_mod::test_a"
+    assert junit_key("pkg/test_mod.py::TestX::test_a[1]") == "pkg.test_mod.TestX::test_a[1]"
+
+
+def test_balance_spreads_known_durations_evenly_and_keeps_order():
+    durations = {junit_key(n): float(k + 1) for k, n in enumerate(NODES)}  # 1..8 s, 36 s in total
+    shards = balance(NODES, durations, 3)
+    assert sorted(n for shard in shards for n in shard) == sorted(NODES)
+    loads = [sum(durations[junit_key(n)] for n in shard) for shard in shards]
+    assert max(loads) - min(loads) <= 2.0  # longest-first greedy: 13/12/11 s
+    for shard in shards:
+        assert shard == sorted(shard, key=NODES.index)
+
+
+def test_balance_never_makes_empty_shards():
+    assert balance(NODES[:2], {}, 4) == [[NODES[0]], [NODES[1]]]
+
+
+def fake_runner(codes):
+    """A runner whose shard k exits with codes[k] (shards are told apart by their first node id)."""
+    def run(args, cancel_event):
+        k = NODES.index(args[0])
+        return codes[k], f"shard output {k}"
+    return run
+
+
+def shards_of(n):
+    return [[node] for node in NODES[:n]]
+
+
+def test_all_shards_passing_is_success(tmp_path):
+    code, output = run_shards(shards_of(3), fake_runner([0, 0, 0]), [], str(tmp_path))
+    assert code == 0
+    assert "shard 3/3" in output
+
+
+def test_a_failing_shard_fails_the_run(tmp_path):
+    code, _ = run_shards(shards_of(3), fake_runner([0, 1, 0]), [], str(tmp_path))
+    assert code == 1
+
+
+def test_a_shard_without_tests_does_not_fail_the_others(tmp_path):
+    code, _ = run_shards(shards_of(2), fake_runner([NO_TESTS_COLLECTED, 0]), [], str(tmp_path))
+    assert code == 0
+    code, _ = run_shards(shards_of(2), fake_runner([NO_TESTS_COLLECTED] * 2), [], str(tmp_path))
+    assert code == NO_TESTS_COLLECTED
+
+
+def test_merge_junit_combines_suites(tmp_path):
+    for k in range(2):
+        (tmp_path / f"{k}.xml").write_text(
+            f'<testsuites><testsuite name="pytest"><testcase classname="m" name="t{k}" time="0.1"/>'
+            f"</testsuite></testsuites>")
+    merge_junit([tmp_path / "0.xml", tmp_path / "1.xml", tmp_path / "missing.xml"], tmp_path / "all.xml")
+    names = [case.get("name") for case in ET.parse(tmp_path / "all.xml").getroot().iter("testcase")]
+    assert names == ["t0", "t1"]
@@ -0,0 +1,97 @@
+from ai_fixer.static_gate import PLACEHOLDER_RE, check_candidate
+
+ORIGINAL = '''\
+def clamp(x, lo, hi):
+    if x < lo:
+        return lo
+    return x
+
+
+def scale(xs, k):
+    return [x * k for x in xs]
+
+
+def total(xs):
+    return sum(xs)
+'''
+
+FIXED = '''\
+def clamp(x, lo, hi):
+    if x < lo:
+        return lo
+    if x > hi:
+        return hi
+    return x
+
+
+def scale(xs, k):
+    return [x * k for x in xs]
+
+
+def total(xs):
+    return sum(xs)
+'''
+
+
+def test_correct_fix_passes():
+    assert check_candidate(FIXED, ORIGINAL) == []
+
+
+def test_ordinary_comments_using_elision_words_pass():
+    for comment in ("# upper bound was unchanged before; now enforced",
+                    "# keep existing code path for lo",
+                    "# the rest of the file relies on this"):
+        code = FIXED.replace("    if x > hi:\n", f"    {comment}\n    if x > hi:\n")
+        assert check_candidate(code, ORIGINAL) == [], comment
+
+
+def test_placeholder_standing_in_for_removed_code_is_rejected():
+    for placeholder in ("# ... rest of the file ...", "# (unchanged)", "# existing code here", "..."):
+        # the model elided a function in the middle of the file
+        code = FIXED.replace("def scale(xs, k):\n    return [x * k for x in xs]\n", placeholder + "\n")
+        reasons = check_candidate(code, ORIGINAL)
+        assert any("placeholder" in r for r in reasons), placeholder
+
+
+def test_placeholder_next_to_kept_code_is_not_an_elision():
+    code = FIXED.replace("    return x\n", "    # (unchanged)\n    return x\n", 1)
+    assert check_candidate(code, ORIGINAL) == []
+
+
+def test_placeholder_pattern_needs_the_whole_comment():
+    assert PLACEHOLDER_RE.match("    # ... rest of the file ...")
+    assert PLACEHOLDER_RE.match("# rest of the code remains the same")
+    assert PLACEHOLDER_RE.match("# ...")
+    assert not PLACEHOLDER_RE.match("# upper bound was unchanged before; now enforced")
+    assert not PLACEHOLDER_RE.match("# keep existing code path for lo")
+    assert not PLACEHOLDER_RE.match("x = 1  # rest of the file")
+
+
+TESTS = "from mod import clamp\nimport mod\n\ndef test_scale():\n    assert mod.scale([1], 2) == [2]\n"
+
+
+def test_changed_signature_of_a_tested_function_is_rejected():
+    code = FIXED.replace("def clamp(x, lo, hi):", "def clamp(x, lo, hi, strict):")
+    reasons = check_candidate(code, ORIGINAL, [TESTS])
+    assert reasons == ["signature of 'clamp' changed: (x, lo, hi) -> (x, lo, hi, strict)"]
+
+
+def test_signature_check_ignores_defaults_and_untested_functions():
+    code = FIXED.replace("def clamp(x, lo, hi):", "def clamp(x, lo=0, hi=1):")
+    code = code.replace("def total(xs):", "def total(xs, start=0):")
+    assert check_candidate(code, ORIGINAL, [TESTS]) == []
+
+
+def test_tested_function_reached_through_the_module_must_stay_defined():
+    code = FIXED.replace("def scale(xs, k):\n    return [x * k for x in xs]\n", "scale = None\n")
+    assert check_candidate(code, ORIGINAL, [TESTS]) == ["'scale' is imported by the tests but is no longer a function"]
+
+
+def test_unresolved_names_and_syntax_errors():
+    assert check_candidate(FIXED.replace("return hi", "return high"), ORIGINAL) == ["unresolved name(s): high"]
+    assert check_candidate("def f(:\n", ORIGINAL)[0].startswith("does not compile: SyntaxError")
+
+
+def test_truncated_tail_is_rejected():
+    code = ORIGINAL[:ORIGINAL.index("def total")]  # the response stopped before the last function
+    assert check_candidate(code, ORIGINAL) == ["looks truncated: missing trailing definition(s) total"]
@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from ai_fixer.stream_json import StreamingJSONObject, StreamSchemaError
+
+KEYS = ["SuggestedFixedCode", "ExplanationOfFix", "LineNumberRangesToEdit"]
+
+RESPONSE = {
+    "SuggestedFixedCode": 'def f(d):\n    return {"a": d["}"], \'b\': "\\\\{"}\n',
+    "ExplanationOfFix": 'Braces { } and quotes " inside strings, a backslash \\ and unicode: é',
+    "LineNumberRangesToEdit": [{"start": 1, "end": 2, "reason": "nested {object} in a list"}],
+}
+
+
+def chunks(text, rng):
+    out, i = [], 0
+    while i < len(text):
+        n = rng.randint(1, 17)
+        out.append(text[i:i + n])
+        i += n
+    return out
+
+
+def parse(pieces, **kwargs):
+    parser = StreamingJSONObject(allowed_keys=KEYS, required_keys=KEYS, **kwargs)
+    for piece in pieces:
+        parser.feed(piece)
+    return parser
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_any_chunking_gives_the_same_object(seed):
+    text = json.dumps(RESPONSE, indent=seed % 3 or None)
+    assert parse(chunks(text, random.Random(seed))).close() == RESPONSE
+
+
+def test_one_character_at_a_time():
+    assert parse(list(json.dumps(RESPONSE))).close() == RESPONSE
+
+
+def test_fenced_response_is_parsed_and_the_closing_fence_ignored():
+    text = "```json\n" + json.dumps(RESPONSE) + "\n```\n"
+    parser = parse(chunks(text, random.Random(1)))
+    assert parser.done
+    assert parser.close() == RESPONSE
+
+
+def test_values_are_reported_as_soon_as_they_are_complete():
+    seen = []
+    text = json.dumps(RESPONSE)
+    code_end = text.index('"ExplanationOfFix"')
+    parser = StreamingJSONObject(allowed_keys=KEYS, required_keys=KEYS,
+                                 on_value=lambda k, v: seen.append(k))
+    parser.feed(text[:code_end])
+    assert seen == ["SuggestedFixedCode"]
+    parser.feed(text[code_end:])
+    assert seen == KEYS
+
+
+def test_scalars_at_the_end_of_the_object():
+    parser = StreamingJSONObject(allowed_keys=["n", "ok", "none"])
+    for piece in ['{"n": -1.5e', '3, "ok": tr', 'ue, "none": null}']:
+        parser.feed(piece)
+    assert parser.close() == {"n": -1.5e3, "ok": True, "none": None}
+
+
+def test_unexpected_key_is_rejected_as_soon_as_its_name_is_complete():
+    parser = StreamingJSONObject(allowed_keys=KEYS)
+    with pytest.raises(StreamSchemaError, match="unexpected key 'Thoughts'"):
+        parser.feed('{"Thoughts"')
+
+
+def test_missing_required_key_is_rejected_at_the_closing_brace():
+    parser = StreamingJSONObject(allowed_keys=KEYS, required_keys=KEYS)
+    with pytest.raises(StreamSchemaError, match="ExplanationOfFix"):
+        parser.feed('{"SuggestedFixedCode": "x", "LineNumberRangesToEdit": []}')
+
+
+def test_truncated_response_does_not_close():
+    parser = parse([json.dumps(RESPONSE)[:-5]])
+    assert not parser.done
+    with pytest.raises(StreamSchemaError, match="ended inside"):
+        parser.close()
+
+
+def test_prose_instead_of_json_is_rejected():
+    parser = StreamingJSONObject(allowed_keys=KEYS, max_preamble=10)
+    with pytest.raises(StreamSchemaError, match="does not start"):
+        parser.feed("I think the bug is in the median function.")
@@ -2,10 +2,9 @@
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-from datetime import datetime
-import difflib
 from streamlit.components.v1 import html as st_html
-import re
+from report_store import ReportStore
+from diff_cache import DiffCache, truncate_lines
 
 
 st.set_page_config(
@@ -112,149 +111,6 @@ hr{border: none; border-top:1px solid var(--card-border); margin: 16px 0;}
 """, unsafe_allow_html=True)
 
 
-LINE_HDR_RE = re.compile(r'^\s*[Ll]ine\s+(\d+)\s*-{3,}')
-DIFF_HEADER_OLD = re.compile(r"^---\s+(?P<old>.+)")
-DIFF_HEADER_NEW = re.compile(r"^\+\+\+\s+(?P<new>.+)")
-HUNK_RE = re.compile(r"^@@\s+-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s+@@")
-SUCCESS_PATTERNS = ("generated fix successful", "fix successful", "tests passed")
-FAIL_PATTERNS = ("all generated fixes failed", "tests failed")
-
-def _strip_triple_fences(s: str) -> str:
-    return s.replace("```", "")
-
-def parse_unified_diff_paths(diff_text: str) -> tuple[str | None, str | None]:
-    old_path = new_path = None
-    for line in diff_text.splitlines():
-        m1 = DIFF_HEADER_OLD.match(line)
-        if m1 and not old_path:
-            old_path = m1.group("old").strip()
-            continue
-        m2 = DIFF_HEADER_NEW.match(line)
-        if m2 and not new_path:
-            new_path = m2.group("new").strip()
-            continue
-        if old_path and new_path:
-            break
-    if old_path and old_path.startswith("a/"): old_path = old_path[2:]
-    if new_path and new_path.startswith("b/"): new_path = new_path[2:]
-    return old_path, new_path
-
-def parse_hunk_range(diff_text: str) -> tuple[int | None, int | None]:
-    for line in diff_text.splitlines():
-        m = HUNK_RE.match(line)
-        if m:
-            new_start = int(m.group(3))
-            new_len = int(m.group(4) or "1")
-            new_end = new_start + max(new_len - 1, 0)
-            return new_start, new_end
-    return None, None
-
-def parse_proposed_fix_file(file_path: Path) -> dict:
-    """
-    Parse a single proposed_fixes/issue_*.txt into our report dict.
-    Tolerant to minor format drift. Always defines 'why'.
-    """
-    text = file_path.read_text(encoding="utf-8", errors="ignore")
-    lines = text.splitlines()
-
-    # --- defaults so we never hit NameError ---
-    status = "Unknown"
-    start_line: int | None = None
-    end_line:   int | None = None
-    why: str | None = None
-    patch_block: str | None = None
-
-    # status from text (loose)
-    low = text.lower()
-    if any(p in low for p in FAIL_PATTERNS):
-        status = "Fail"
-    elif any(p in low for p in SUCCESS_PATTERNS):
-        status = "Success"
-
-    # find "Line N-----" banners (optional)
-    first_marker_idx = second_marker_idx = None
-    for idx, ln in enumerate(lines):
-        m = LINE_HDR_RE.match(ln)
-        if m and first_marker_idx is None:
-            first_marker_idx = idx
-            try:
-                start_line = int(m.group(1))
-            except Exception:
-                start_line = None
-        elif m and first_marker_idx is not None and second_marker_idx is None:
-            second_marker_idx = idx
-            break
-
-    # locate "Original buggy code description:" (optional)
-    desc_idx = None
-    for idx, ln in enumerate(lines):
-        if ln.strip().lower().startswith("original buggy code description"):
-            desc_idx = idx
-            break
-
-    # patch/code block between first banner and next banner/desc/EoF
-    if first_marker_idx is not None:
-        start = first_marker_idx + 1
-        end = second_marker_idx if second_marker_idx is not None else (desc_idx if desc_idx is not None else len(lines))
-        patch_block = "\n".join(lines[start:end]).rstrip() or None
-
-    # why text after the description label
-    if desc_idx is not None:
-        why = "\n".join(lines[desc_idx + 1:]).strip() or None
-
-    # attach sibling .diff if present; use it to enrich status/lines/paths
-    diff_path = file_path.with_suffix(".diff")
-    diff_text = None
-    orig_path_in_diff = None
-    new_path_in_diff = None
-    if diff_path.exists():
-        raw_diff = diff_path.read_text(encoding="utf-8", errors="ignore")
-        diff_text = _strip_triple_fences(raw_diff)
-        orig_path_in_diff, new_path_in_diff = parse_unified_diff_paths(diff_text)
-        # if no explicit status but we have a diff, call it Proposed
-        if status == "Unknown":
-            status = "Proposed"
-        # derive line range from first hunk if missing
-        if start_line is None:
-            s, e = parse_hunk_range(diff_text)
-            start_line, end_line = s, e
-
-    return {
-        "file": file_path.name,
-        "status": status,
-        "start_line": start_line,
-        "end_line": end_line,
-        "why": why,  # guaranteed key (may be None)
-        "timestamp": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-        "patch": patch_block,
-        "raw": text,
-        # diff fields
-        "diff_path": str(diff_path) if diff_path.exists() else None,
-        "diff_text": diff_text,
-        # code paths hinted by diff headers
-        "original_code_path": orig_path_in_diff,
-        "fixed_code_path": new_path_in_diff,
-    }
-
-
-
-def load_proposed_fixes(dir_path: Path) -> list[dict]:
-    files = sorted(dir_path.glob("*.txt"))
-    reports = []
-    for f in files:
-        try:
-            reports.append(parse_proposed_fix_file(f))
-        except Exception as e:
-            # best-effort: still surface file with minimal info
-            reports.append({
-                "file": f.name, "status": "Unknown",
-                "start_line": None, "end_line": None,
-                "why": f"Parse error: {e}",
-                "timestamp": datetime.fromtimestamp(f.stat().st_mtime).isoformat(),
-                "patch": None, "raw": f.read_text(encoding='utf-8', errors='ignore')
-            })
-    return reports
-
 # ---------- header ----------
 st.markdown("""
 <div class="header">
@@ -268,43 +124,57 @@ st.markdown("""
 
 # ---------- load proposed_fixes ----------
 PROPOSED_DIR = Path("proposed_fixes")
+
+@st.cache_resource
+def get_report_store() -> ReportStore:
+    # one index per server process; survives reruns
+    return ReportStore()
+
+@st.cache_resource
+def get_diff_cache() -> DiffCache:
+    return DiffCache()
+
+picked = None
 if not PROPOSED_DIR.exists():
     st.warning("`proposed_fixes/` not found. Create it or adjust PROPOSED_DIR.")
-    reports = []
+    store = None
 else:
-    candidates = sorted(PROPOSED_DIR.glob("*.txt"))
+    store = get_report_store()
+    store.sync(PROPOSED_DIR)  # re-parses only reports whose .txt/.diff changed
     with st.sidebar:
         st.markdown("### Data source")
         mode = st.radio("Show", ["All issues", "One issue"], index=0)
         if mode == "One issue":
-            picked = st.selectbox("Pick an issue", options=candidates, format_func=lambda p: p.name)
-            reports = load_proposed_fixes(PROPOSED_DIR) if picked is None else [parse_proposed_fix_file(picked)]
-        else:
-            reports = load_proposed_fixes(PROPOSED_DIR)
+            picked = st.selectbox("Pick an issue", options=store.files())
 
 # ---------- summary ----------
 st.subheader("Summary")
 
 colf1, colf2, colf3 = st.columns([1,1,2])
 with colf1:
-    status_filter = st.selectbox("Filter status", options=["All", "Success", "Fail", "Unknown"], index=0)
+    # offer the statuses the reports actually have (e.g. "Skipped tests", "Proposed")
+    status_options = ["All", *(store.statuses() if store is not None else [])]
+    status_filter = st.selectbox("Filter status", options=status_options, index=0)
 with colf2:
     sort_by = st.selectbox("Sort by", options=["timestamp", "file", "status"], index=0)
 with colf3:
     query = st.text_input("Search (file / why)")
 
-table_rows = []
-for r in reports:
-    status = (r.get("status") or "Unknown").strip()
-    if status_filter != "All" and status != status_filter:
-        continue
-    text = f"{r.get('file','')} {r.get('why','')}".lower()
-    if query and query.lower() not in text:
-        continue
-    table_rows.append(r)
-
-reverse = sort_by == "timestamp"
-table_rows.sort(key=lambda x: (x.get(sort_by) or ""), reverse=reverse)
+# filtering, search, sorting and paging all happen in the report index
+colp1, colp2, colp3 = st.columns([1,1,2])
+with colp2:
+    page_size = st.selectbox("Rows per page", options=[25, 50, 100], index=0)
+table_rows, total = ([], 0)
+if store is not None:
+    _, total = store.query(status=status_filter, search=query, file_name=picked, page_size=1)
+pages = max(1, -(-total // page_size))
+with colp1:
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+with colp3:
+    st.markdown(f"<br/><span class='kbd'>{total} report(s) · page {page} of {pages}</span>", unsafe_allow_html=True)
+if store is not None:
+    table_rows, _ = store.query(status=status_filter, search=query, file_name=picked,
+                                sort_by=sort_by, page=page, page_size=page_size)
 
 def chip_html(status: str) -> str:
     s = (status or "Unknown").lower()
@@ -359,7 +229,11 @@ for idx, r in enumerate(table_rows):
     cls = "pass" if s.startswith("success") or s.startswith("pass") else "fail" if s.startswith("fail") else "warn"
     chip = f"<span class='chip {cls}'><span class='badge'></span>{status}</span>"
 
-    with st.expander(f"{r.get('file','')}"):
+    # panels are built (and the full report loaded) only once opened
+    if not st.toggle(f"{r.get('file','')}", key=f"open_{r.get('file','')}"):
+        continue
+    r = store.report(r["file"]) or r
+    with st.container(border=True):
         col1, col2, col3 = st.columns([1,1,2])
         with col1:
             st.markdown(chip, unsafe_allow_html=True)
@@ -384,9 +258,9 @@ for idx, r in enumerate(table_rows):
         # 1) If we have a unified diff file next to the report, show it directly.
         if r.get("diff_text"):
             st.markdown("<br/>**Diff (from .diff file)**", unsafe_allow_html=True)
-            st.code(r["diff_text"], language="diff")
+            st.code(truncate_lines(r["diff_text"]), language="diff")
         else:
-            # 2) Otherwise, try to render a computed diff from files
+            # 2) Otherwise, render a diff from the code files (computed once, then served from the cache)
             orig_path = r.get("original_code_path") or "code.txt"
             fixed_path = r.get("fixed_code_path") or "fixed_code.txt"
             orig_exists, fixed_exists = Path(orig_path).exists(), Path(fixed_path).exists()
@@ -398,23 +272,15 @@ for idx, r in enumerate(table_rows):
                     key=f"diff_mode_{idx}",
                     horizontal=True
                 )
-                orig_lines = Path(orig_path).read_text(encoding="utf-8").splitlines()
-                new_lines  = Path(fixed_path).read_text(encoding="utf-8").splitlines()
+                orig_text = Path(orig_path).read_text(encoding="utf-8")
+                new_text  = Path(fixed_path).read_text(encoding="utf-8")
+                fromdesc = f"{Path(orig_path).name} (original)"
+                todesc = f"{Path(fixed_path).name} (fixed)"
                 if diff_mode == "Unified":
-                    udiff = "\n".join(difflib.unified_diff(
-                        orig_lines, new_lines,
-                        fromfile=f"{Path(orig_path).name} (original)",
-                        tofile=f"{Path(fixed_path).name} (fixed)",
-                        lineterm=""
-                    ))
+                    udiff = get_diff_cache().unified(orig_text, new_text, fromdesc, todesc)
                     st.code(udiff or "# (no changes)", language="diff")
                 else:
-                    hdiff = difflib.HtmlDiff(wrapcolumn=90).make_table(
-                        orig_lines, new_lines,
-                        fromdesc=f"{Path(orig_path).name} (original)",
-                        todesc=f"{Path(fixed_path).name} (fixed)",
-                        context=True, numlines=2
-                    )
+                    hdiff = get_diff_cache().side_by_side(orig_text, new_text, fromdesc, todesc)
                     st_html(f"<div class='diff'>{hdiff}</div>", height=520, scrolling=True)
             else:
                 st.info("Diff unavailable: .diff not found and code files not found.")